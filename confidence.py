@@ -6,24 +6,29 @@ Created on Wed May 18 11:55:27 2016
 """
 
 
+import argparse
 import sys
 sys.path.append('/home/nzhou/git')
+import io
 import os
 from os import walk
-from CAFAAssess.precRec import GOPred,PrecREC,read_benchmark
-from Ontology.IO import OboIO
-import gzip
-import zipfile
-import tarfile
+from CAFAAssess.precRec import PrecREC,read_benchmark
+from CAFAAssess.precrec.GOPred import GOPred
+from functools import partial
+from CAFAAssess.precrec.ingest import TextHandle, map_members, prefetch
 
 
 pred_folder = "/home/nzhou/old computer/Documents/CAFA2/CAFA2_submissions/"  
+#'text' writes the <stem>_confdata.txt files read by R
+#'binary' (--binary) writes <stem>_confdata.bin, read back with precrec.confdata.read_confidence
+CONFDATA_FORMAT = 'text'
+CONFDATA_SUFFIX = {'binary': '_confdata.bin', 'text': '_confdata.txt'}
 
 #pred_path = open('/home/nzhou/git/CAFAAssess/precrec/M1HS.74.Homo_sapiens_BPO.txt')
 #pred_path_ori = open('/home/nzhou/git/CAFAAssess/precrec/M1HS.74.Homo_sapiens.txt')
 
 
-def prediction_ontology_split_write(pred_path, obo_path):
+def prediction_ontology_split_write(pred_path, obo_path, write=False):
     """
     Separate the prediction file into the different ontologies
     pred_path should be a handle!!!!!!!!!!
@@ -32,32 +37,29 @@ def prediction_ontology_split_write(pred_path, obo_path):
     
     This is edited to change the output file directory! 05/23/2016
     This function is different from the one in precRec.py!!
+    The split is now kept in memory, see GOPred.split()
+    returns (file stem, {'bpo':GOPred,'mfo':GOPred,'cco':GOPred})
+    the _BPO/_MFO/_CCO files are only written if write is True
     """
     
     all_pred = GOPred()
     #pred_path = open('/home/nzhou/git/CAFAAssess/precrec/M1HS.74.Homo_sapiens.txt')
     all_pred.read(pred_path)
     #obo_path = '/home/nzhou/git/Ontology/go-basic.obo'
-    go_graph = OboIO.OboReader(open(obo_path)).read()
-    mfo_out = open("%s_MFO.txt" % pred_path.name.split('/')[-1].split('.')[-2],"w")
-    bpo_out = open("%s_BPO.txt" % pred_path.name.split('/')[-1].split('.')[-2],"w")
-    cco_out = open("%s_CCO.txt" % pred_path.name.split('/')[-1].split('.')[-2],"w")
-    for protein in all_pred.data.items():
-        for u in protein[1]:
-            if go_graph.get_namespace(u['term']) == 'molecular_function': 
-                mfo_out.write("%s\t%s\t%.2f\n" % (protein[0], u['term'], u['confidence']))
-            elif go_graph.get_namespace(u['term']) == 'biological_process': 
-                bpo_out.write("%s\t%s\t%.2f\n" % (protein[0], u['term'], u['confidence']))
-            elif go_graph.get_namespace(u['term']) == 'cellular_component': 
-                cco_out.write("%s\t%s\t%.2f\n" % (protein[0], u['term'], u['confidence']))
-            else:
-                raise ValueError ("Term %s not found in any ontology" % u['term'])
-    mfo_out.close()
-    bpo_out.close()
-    cco_out.close()
+    partitions = all_pred.split(obo_path)
+    stem = pred_path.name.split('/')[-1].split('.')[-2]
+    if write:
+        for onto in partitions:
+            partitions[onto].write("%s_%s.txt" % (stem, onto.upper()))
+    return stem, partitions
+
 
 
 
+def read_file(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
 
 def getFileNames(pred_folder):
     filenames = []
@@ -66,39 +68,29 @@ def getFileNames(pred_folder):
         break
     return filenames 
 
-def pred_split(predfile,submission_folder):
-    #sys.path.append(submission_folder)
-    if predfile.split('.')[-1]=="zip" :
-        obj = zipfile.ZipFile(submission_folder+predfile,'r')
-        #obj = zipfile.ZipFile('/home/nzhou/old computer/Documents/CAFA2/CAFA2_submissions/83/M2HS.83.bonneauLab_2_9606.txt.zip')
-        for filename in obj.namelist():
-            if 'hpo' not in filename and filename.split('.')[-1]=='txt':
-                 handle = obj.open(filename,'r')
-                 print filename
-                 prediction_ontology_split_write(handle,obo_path)
-                 handle.close()
-        obj.close()
-    elif predfile.split('.')[-1]=='tgz' or ''.join(predfile.split('.')[-2:])=='targz':
-        obj = tarfile.open(submission_folder+predfile,'r')
-        for filename in obj.getnames():
-            if 'hpo' not in filename and filename.split('.')[-1]=='txt':
-                handle = obj.extractfile(filename)
-                prediction_ontology_split_write(handle,obo_path)
-                handle.close()
-        obj.close() 
-    elif predfile.split('.')[-1]=="gz":
-        handle = gzip.open(submission_folder+predfile,'r')
-        prediction_ontology_split_write(handle,obo_path)
-        handle.close()
-    elif predfile.split('.')[-1]=="txt":
-        handle = open(submission_folder+predfile,'r')
-        prediction_ontology_split_write(handle,obo_path)
-        handle.close()
+def prediction_member(name):
+    '''
+    prediction files of a submission: text or gzipped text, no hpo predictions
+    '''
+    return 'hpo' not in name.split('/')[-1] and name.split('.')[-1] in ('txt', 'gz')
+
+def pred_split(predfile,submission_folder,jobs=1):
+    '''
+    generates (file stem, partitions) for every prediction file in predfile,
+    see prediction_ontology_split_write()
+    predfile can be a text file, or a zip, tar(.gz) or gz archive, see precrec.ingest
+    with jobs > 1 the members are read and split in parallel
+    '''
+    split = partial(prediction_ontology_split_write, obo_path=obo_path)
+    for member, result in map_members(submission_folder+predfile, split, jobs, prediction_member):
+        print(member.name)
+        yield result
        
-def files_split(teamNumber,human):
+def files_split(teamNumber,human,jobs=1):
     '''
     human is boolean
     if true, only work on human prediction file
+    generates (file stem, partitions) for every prediction file of the team
     '''
     submission_folder = '/home/nzhou/old computer/Documents/CAFA2/CAFA2_submissions/'+str(teamNumber)+'/'
     filelist = getFileNames(submission_folder)
@@ -110,13 +102,15 @@ def files_split(teamNumber,human):
     for i in filelist:
         if human:
             if '9606' in i or 'sapien' in i:
-                print i
-                pred_split(i,submission_folder)
+                print(i)
+                for split in pred_split(i,submission_folder,jobs):
+                    yield split
                 continue
             else:
                 continue
         else:
-            pred_split(i,submission_folder)
+            for split in pred_split(i,submission_folder,jobs):
+                yield split
 
 def get_namespace_index(namespace):
     num = None
@@ -128,7 +122,7 @@ def get_namespace_index(namespace):
         num =2
     else:
         raise ValueError("name space name not found, check prediction files")
-        print namespace
+        print(namespace)
     return num
             
 
@@ -139,6 +133,11 @@ main
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Confidence data of the CAFA2 team submissions.', )
+    parser.add_argument('--binary', dest='binary', action='store_true', help='Write the confidence data as typed arrays (_confdata.bin) instead of the text files read by R')
+    args = parser.parse_args()
+    if args.binary:
+        CONFDATA_FORMAT = 'binary'
     obo_path = '/home/nzhou/git/CAFAAssess/precrec/gene_ontology_edit.obo.2014-06-01'
     #teamNums = [117,85,129,127,94,83,75]
     #teamNums = [85,129,127,94,83,75]
@@ -149,19 +148,27 @@ if __name__ == '__main__':
     #For team 115, prediction file is bad, with "GO:GO:", So the orginal file was untarred in the submission folder
     for num in teamNums:   
         if num!=115:
-            files_split(num,True)
+            #split in memory and score straight away
+            for stem, partitions in files_split(num,True,os.cpu_count()):
+                for namespace in partitions:
+                    if len(partitions[namespace]) == 0:
+                        continue
+                    b = bench[get_namespace_index(namespace)]
+                    pr = PrecREC(b,partitions[namespace])
+                    pr.printConfidence(os.getcwd()+'/'+stem+'_'+namespace.upper()+CONFDATA_SUFFIX[CONFDATA_FORMAT],CONFDATA_FORMAT)
+            continue
         os.chdir('/home/nzhou/git/CAFAAssess/confidence/'+str(num)+'/')
-        files = getFileNames(os.getcwd())
-        for f in files:
-            if 'confdata' not in f and f.split('.')[-1]=='txt' and os.path.getsize(f)!=0:
-                print f
-                pred = GOPred()
-                pred.read(open(f))
-                namespace = f.split('.')[-2][-3:]
-                b = bench[get_namespace_index(namespace)]
-                pr = PrecREC(b,pred)
-                print os.getcwd() 
-                pr.printConfidence(os.getcwd()+'/'+f.split('.')[0]+'_confdata.txt')
+        files = [f for f in getFileNames(os.getcwd()) if 'confdata' not in f and f.split('.')[-1]=='txt' and os.path.getsize(f)!=0]
+        #the next files are read while this one is scored
+        for f, data in prefetch(files, read_file):
+            print(f)
+            pred = GOPred()
+            pred.read(TextHandle(io.BytesIO(data), f))
+            namespace = f.split('.')[-2][-3:]
+            b = bench[get_namespace_index(namespace)]
+            pr = PrecREC(b,pred)
+            print(os.getcwd())
+            pr.printConfidence(os.getcwd()+'/'+f.split('.')[0]+CONFDATA_SUFFIX[CONFDATA_FORMAT],CONFDATA_FORMAT)
 '''
     baseline = ["BLAST","Naive"]
     for name in baseline:
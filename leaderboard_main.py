@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line interface for resumable batch evaluation of CAFA team submissions
+Every finished (team, model, taxon, ontology) job is checkpointed,
+rerunning the same command skips them and only evaluates what is left
+With -scores, every job is evaluated again on each run, but only the proteins
+whose predictions or benchmark annotations changed are scored again
+"""
+
+import argparse
+import os
+from precrec.precRec import PrecREC,read_benchmark
+from precrec.GOPred import CAFA_MAX_TERMS, GOPred
+from precrec.annotations import CompiledLoader
+from precrec.cache import BenchmarkCache
+from precrec.batch import ResultStore, read_manifest, run, write_leaderboard
+from precrec.fmax import INTERVAL, threshold_grid
+from precrec.incremental import score_incremental
+from precrec_main import mkdir_p, taxon_name_converter
+
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Batch precision-recall assessment and leaderboard for CAFA team submissions.', )
+    parser.add_argument('manifest', help='Manifest file, one "team <tab> submission folder or archive" per line')
+    parser.add_argument('-t','--t',dest='type',help = 'Input evaluation type: No Knowledge or Limited Knowledge', choices=['type1','type2','all'],required=True)    
+    parser.add_argument('-o','--o', dest= 'obo_path',help = 'Input the obo file path',default = './precrec/go_20130615-termdb.obo')
+    parser.add_argument('-m','--m',dest='mode', help = 'Input the evaluation mode: full or partial', choices = ['full','partial'],required = True)
+    parser.add_argument('-b','--b',dest='bfolder', help = 'Input the path to the benchmark folder, default CAFA2 benchmarks provided', default = './precrec/benchmark/')
+    parser.add_argument('-store', dest='store', help='Checkpoint file of finished jobs. Default is ./results/leaderboard_<type>_<mode>.jsonl')
+    parser.add_argument('-out', dest='out', help='Leaderboard table. Default is ./results/leaderboard_<type>_<mode>.txt')
+    parser.add_argument('-retry', dest='retry', help='Option to evaluate again the jobs that failed in an earlier run. Enter "Y" or "N". Default is "N"', default='N', choices=['Y','N'])
+    parser.add_argument('-cache', dest = 'cache_size', type=int, help='Number of propagated benchmarks kept in memory. Default is 6', default = 6)
+    parser.add_argument('-scores', dest='scores', help='Folder of the per-protein scores of every job. With it, every job is evaluated again, and only the proteins whose predictions or benchmark annotations changed since the last run are propagated and scored, e.g. for a nightly refresh. Default is none', default=None)
+    parser.add_argument('-max-terms', dest='max_terms', type=int, nargs='?', const=CAFA_MAX_TERMS, help='Keep only the most confident predictions of every protein, dropping the others while reading; the number dropped is stored with every job. -max-terms alone keeps %s, the CAFA limit. Default is no limit' % CAFA_MAX_TERMS, default=None)
+    args = parser.parse_args()
+    if args.max_terms is not None and args.max_terms < 1:
+        parser.error('-max-terms should be at least 1')
+    mkdir_p('./results/')
+    if args.store is None:
+        args.store = './results/leaderboard_%s_%s.jsonl' % (args.type, args.mode)
+    if args.out is None:
+        args.out = './results/leaderboard_%s_%s.txt' % (args.type, args.mode)
+    if args.scores is not None:
+        mkdir_p(args.scores)
+
+    benchmarks = BenchmarkCache(CompiledLoader(read_benchmark), args.cache_size)
+
+    def evaluate(team, handle, ontologies):
+        all_pred = GOPred(args.max_terms)
+        split_pred = all_pred.read_and_split(args.obo_path, handle)
+        records = []
+        for onto in ontologies:
+            b = benchmarks.get(onto, taxon_name_converter(all_pred.taxon),args.type,args.bfolder,args.obo_path)
+            if args.scores is None:
+                c = PrecREC(b,split_pred[onto])
+            else:
+                #one file per job and benchmark type, the rows serve both modes
+                path = os.path.join(args.scores, '%s_%s_%s_%s_%s.scores' % (team, all_pred.model, all_pred.taxon, onto, args.type))
+                c = score_incremental(path, split_pred[onto], b, threshold_grid(INTERVAL))
+            record = {'ontology': onto, 'author': all_pred.author, 'status': 'ok', 'exist': c.exist,
+                      'fmax': None, 'threshold': None, 'coverage': None}
+            if args.scores is not None:
+                record['rescored'] = c.rescored
+            if args.max_terms is not None:
+                record['dropped'] = all_pred.dropped
+            if c.exist:
+                fm = c.Fmax_output(args.mode)
+                record.update({'fmax': fm[2], 'threshold': fm[3], 'coverage': fm[4]})
+            records.append(record)
+        return records
+
+    store = ResultStore(args.store, args.type, args.mode)
+    print('%s jobs already done in %s\n' % (len(store.records), args.store))
+    run(read_manifest(args.manifest), store, evaluate, args.retry=='Y', args.scores is not None)
+    if args.scores is not None:
+        #every run appends a record per job, keep the last ones
+        store.compact()
+    rows = write_leaderboard(store, args.out)
+    print('leaderboard with %s entries written to %s\n' % (rows, os.path.abspath(args.out)))
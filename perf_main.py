@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Performance suite of the evaluation pipeline on synthetic inputs
+
+Generates a GO-like ontology, benchmarks and a CAFA submission of the
+requested size (see precrec.synthetic), times every stage of the pipeline
+(ontology compilation and loading, benchmark propagation, reading,
+splitting, propagation, the threshold sweep and streaming evaluation) and
+compares the timings with a stored baseline. --check compares the fast
+engines with the reference implementations on the same inputs instead:
+the term-by-term propagation, the per-threshold precision_recall loop and
+the in-memory evaluation for the streaming one, and the propagated benchmark
+for its compiled artifact.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from precrec.precRec import PrecREC, benchmark
+from precrec.annotations import benchmark_artifact_path, load_compiled
+from precrec.GOPred import GOPred
+from precrec.fmax import INTERVAL, threshold_grid
+from precrec.ontology import ONTOLOGIES, compile_ontology, file_checksum, load_ontology
+from precrec.profiling import Profiler
+from precrec.stream import stream_evaluate
+from precrec.synthetic import make_inputs
+
+BASELINE_VERSION = 1
+#slowdowns smaller than this, in seconds, are timer noise and never flagged
+NOISE = 0.005
+
+
+def read_benchmarks(ontology, benchmark_paths):
+    benchmarks = {}
+    for onto in ONTOLOGIES:
+        benchmarks[onto] = benchmark(ontology, benchmark_paths[onto])
+        benchmarks[onto].propagate()
+    return benchmarks
+
+
+def read_submission(pred_path):
+    pred = GOPred()
+    with open(pred_path) as handle:
+        pred.read(handle)
+    return pred
+
+
+def stream_submission(pred_path, obo_path, benchmarks):
+    with open(pred_path) as handle:
+        return stream_evaluate(handle, obo_path, benchmarks, threshold_grid(INTERVAL))[1]
+
+
+def time_stages(profiler, inputs, work, repeat, mode):
+    '''
+    runs every stage repeat times under the profiler
+    returns {stage: (best wall time, best cpu time)}
+    '''
+    obo_path, benchmark_paths, pred_path = inputs
+    #compile once outside the timings, so load_ontology finds the artifact
+    load_ontology(obo_path)
+
+    def run(name, func, *args):
+        for _ in range(repeat):
+            with profiler.stage(name):
+                value = func(*args)
+        return value
+
+    run('compile', compile_ontology, obo_path, os.path.join(work, 'timed.ontology'))
+    ontology = run('load_ontology', lambda: load_ontology(obo_path, reuse=False))
+    benchmarks = run('benchmark', read_benchmarks, ontology, benchmark_paths)
+    pred = run('read', read_submission, pred_path)
+    parts = run('split', pred.split, ontology)
+    scores = run('propagate', lambda: dict((onto, PrecREC(benchmarks[onto], parts[onto])) for onto in ONTOLOGIES))
+    run('fmax', lambda: [scores[onto].Fmax_output(mode) for onto in ONTOLOGIES if scores[onto].exist])
+    run('stream', stream_submission, pred_path, obo_path, benchmarks)
+    profiler.count('predictions', len(pred))
+    profiler.count('proteins', len(pred.proteins))
+    profiler.count('propagated_terms', sum(len(terms) for c in scores.values() for terms in c.predicted.values() if terms))
+    best = {}
+    for record in profiler.records:
+        if record['type'] == 'stage':
+            wall, cpu = best.get(record['stage'], (float('inf'), float('inf')))
+            best[record['stage']] = (min(wall, record['wall']), min(cpu, record['cpu']))
+    return best
+
+
+def compare_baseline(best, baseline, config, tolerance):
+    '''
+    prints every stage with its baseline time
+    returns the stages slower than the baseline by more than tolerance (a fraction),
+    and by more than NOISE seconds
+    '''
+    if baseline['config'] != config:
+        sys.stderr.write('baseline was measured on other inputs, timings may not be comparable\n')
+    regressions = []
+    print('%-14s\t%s\t%s\t%s\t%s' % ('stage', 'wall', 'cpu', 'baseline', 'change'))
+    for stage in best:
+        wall, cpu = best[stage]
+        before = baseline['stages'].get(stage)
+        if before is None:
+            print('%-14s\t%.4f\t%.4f\t%s\t%s' % (stage, wall, cpu, '-', '-'))
+            continue
+        change = (wall - before) / before if before > 0 else 0.0
+        flag = ''
+        if change > tolerance and wall - before > NOISE:
+            regressions.append(stage)
+            flag = '\tREGRESSION'
+        print('%-14s\t%.4f\t%.4f\t%.4f\t%+.1f%%%s' % (stage, wall, cpu, before, 100 * change, flag))
+    return regressions
+
+
+def same(a, b):
+    return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def check(inputs, mode):
+    '''
+    compares the fast engines with the reference implementations
+    returns a list of mismatch descriptions, empty if everything agrees
+    '''
+    obo_path, benchmark_paths, pred_path = inputs
+    ontology = load_ontology(obo_path)
+    benchmarks = read_benchmarks(ontology, benchmark_paths)
+    parts = read_submission(pred_path).split(ontology)
+    streamed = stream_submission(pred_path, obo_path, benchmarks)
+    thresholds = threshold_grid(INTERVAL)
+    errors = []
+    for onto in ONTOLOGIES:
+        fast = PrecREC(benchmarks[onto], parts[onto])
+        reference = PrecREC(benchmarks[onto], parts[onto], engine='loop')
+        #propagation: same proteins, terms, confidences and truth, in the same order
+        if fast.countb != reference.countb or fast.obsolete != reference.obsolete:
+            errors.append('%s: countb or obsolete terms differ from the loop engine' % onto)
+        if list(fast.predicted) != list(reference.predicted):
+            errors.append('%s: predicted proteins differ from the loop engine' % onto)
+        for prot in reference.predicted:
+            terms = fast.predicted.get(prot)
+            expected = reference.predicted[prot]
+            if (terms is None) != (expected is None) or (terms is not None and list(terms.items()) != list(expected.items())):
+                errors.append('%s: propagated terms of %s differ from the loop engine' % (onto, prot))
+                break
+        if not fast.exist:
+            continue
+        #threshold sweep: every threshold against precision_recall(threshold), partial mode
+        precision, recall = fast.Fmax_output('partial')[:2]
+        for i, t in enumerate(thresholds):
+            try:
+                expected = reference.precision_recall(t)
+            except ZeroDivisionError:
+                expected = (float('nan'), recall[i])
+            if not (same(precision[i], expected[0]) and same(recall[i], expected[1])):
+                errors.append('%s: precision/recall at threshold %s differ from precision_recall()' % (onto, t))
+                break
+        #streaming evaluation against the in-memory one
+        fm = fast.Fmax_output(mode)
+        sm = streamed[onto].Fmax_output(mode)
+        if not all(same(a, b) for a, b in zip(list(fm[0]) + list(fm[1]) + list(fm[2:]), list(sm[0]) + list(sm[1]) + list(sm[2:]))):
+            errors.append('%s: streaming evaluation differs from the in-memory one' % onto)
+        #compiled benchmark artifact against the propagated dictionary: same scores, to the bit
+        meta = {'ontology': ontology.checksum, 'benchmark': file_checksum(benchmark_paths[onto])}
+        path = benchmark_artifact_path(obo_path, onto, meta['benchmark'])
+        compiled = load_compiled(path, meta, ontology, lambda: benchmarks[onto])
+        if list(compiled.true_terms) != list(benchmarks[onto].true_terms) or any(
+                compiled.true_terms[p] != benchmarks[onto].true_terms[p] for p in benchmarks[onto].true_terms):
+            errors.append('%s: compiled benchmark differs from the propagated one' % onto)
+        elif PrecREC(compiled, parts[onto]).Fmax_output(mode) != fm:
+            errors.append('%s: scores on the compiled benchmark differ' % onto)
+    return errors
+
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Performance suite of the CAFA precision-recall assessment on synthetic inputs.', )
+    parser.add_argument('-proteins', dest='proteins', type=int, help='Number of predicted proteins. Default is 1000', default=1000)
+    parser.add_argument('-terms', dest='terms', type=int, help='Number of predicted terms per protein and ontology. Default is 20', default=20)
+    parser.add_argument('-true', dest='true', type=int, help='Number of benchmark terms per benchmark protein. Default is 5', default=5)
+    parser.add_argument('-depth', dest='depth', type=int, help='Number of levels of the synthetic ontology. Default is 8', default=8)
+    parser.add_argument('-width', dest='width', type=int, help='Number of terms per level and ontology. Default is 100', default=100)
+    parser.add_argument('-obsolete', dest='obsolete', type=int, help='Number of obsolete terms per ontology, some of them predicted. Default is 5', default=5)
+    parser.add_argument('-seed', dest='seed', type=int, help='Random seed of the synthetic inputs. Default is 0', default=0)
+    parser.add_argument('-m','--m',dest='mode', help = 'Evaluation mode: full or partial. Default is partial', choices = ['full','partial'], default='partial')
+    parser.add_argument('-repeat', dest='repeat', type=int, help='Runs of every stage, the fastest is reported. Default is 3', default=3)
+    parser.add_argument('-dir', dest='work', help='Folder of the synthetic inputs. Default is ./perf/', default='./perf/')
+    parser.add_argument('-baseline', dest='baseline', help='Baseline timings to compare with, a JSON file written by --save-baseline', default=None)
+    parser.add_argument('--save-baseline', dest='save_baseline', action='store_true', help='Write the timings of this run to the -baseline file instead of comparing')
+    parser.add_argument('-tolerance', dest='tolerance', type=float, help='Slowdown of a stage over its baseline flagged as a regression, as a fraction. Default is 0.25', default=0.25)
+    parser.add_argument('-profile', dest='profile', help='Write the profiling report of every run of every stage to this JSON file', default=None)
+    parser.add_argument('--check', dest='check', action='store_true', help='Compare the fast engines with the reference implementations instead of timing them')
+    args = parser.parse_args()
+
+    config = {'proteins': args.proteins, 'terms': args.terms, 'true': args.true,
+              'depth': args.depth, 'width': args.width, 'obsolete': args.obsolete, 'seed': args.seed, 'mode': args.mode}
+    inputs = make_inputs(args.work, args.proteins, args.terms, args.true, args.depth, args.width, seed=args.seed,
+                         n_obsolete=args.obsolete)
+    if args.check:
+        errors = check(inputs, args.mode)
+        for error in errors:
+            print(error)
+        print('%s mismatches' % len(errors))
+        sys.exit(1 if errors else 0)
+
+    profiler = Profiler()
+    best = time_stages(profiler, inputs, args.work, args.repeat, args.mode)
+    if args.profile is not None:
+        profiler.write(args.profile, {'argv': sys.argv, 'config': config})
+    if args.baseline is not None and args.save_baseline:
+        with open(args.baseline, 'w') as out:
+            json.dump({'version': BASELINE_VERSION, 'config': config,
+                       'stages': dict((stage, best[stage][0]) for stage in best)}, out, indent=1)
+            out.write('\n')
+        print('baseline written to %s' % args.baseline)
+    regressions = []
+    if args.baseline is not None and not args.save_baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        regressions = compare_baseline(best, baseline, config, args.tolerance)
+        if regressions:
+            print('regressions: %s' % ', '.join(regressions))
+    else:
+        print('%-14s\t%s\t%s' % ('stage', 'wall', 'cpu'))
+        for stage in best:
+            print('%-14s\t%.4f\t%.4f' % (stage, best[stage][0], best[stage][1]))
+    sys.exit(1 if regressions else 0)
@@ -15,8 +15,11 @@
 
 import re
 import os
+from array import array
 from collections import defaultdict
-from Ontology.IO import OboIO
+from itertools import islice
+import numpy
+from precrec.ontology import ONTOLOGIES, Ontology, load_ontology
 
 pr_field = re.compile("^PR=[0,1]\.[0-9][0-9];$")
 rc_field = re.compile("^RC=[0,1]\.[0-9][0-9]$")
@@ -25,6 +28,14 @@ go_field = re.compile("^(GO|HP):[0-9]{5,7}$")
 # Fix to add EFI targets 2014-1-9
 target_field = re.compile("^(T|EFI)[0-9]{5,20}$")
 confidence_field = re.compile("^[0,1]\.[0-9][0-9]$")
+# Fast path: one regex validating and decoding a whole block of prediction lines
+# A line it accepts is also accepted by _go_prediction_check, anything else
+# (header records, END, errors) makes the block fall back to the line-by-line checks
+prediction_lines = re.compile("^[ \t]*((?:T|EFI)[0-9]{5,20})[ \t]+((?:GO|HP):[0-9]{5,7})[ \t]+([01]\.[0-9][0-9])[ \t\r]*$", re.M)
+# Number of lines validated together by the fast path
+BLOCK_LINES = 10000
+# Most GO terms a CAFA submission may predict for one target
+CAFA_MAX_TERMS = 1500
 
 # Legal states: the CAFA prediction records fields, and their order. KEYWORDS and ACCURACY are
 # optional
@@ -45,19 +56,84 @@ legal_keywords = [
 "operon", "ortholog", "paralog", "homolog", "hidden markov model", "clinical data", "genetic data", 
 "natural language processing", "other functional information"
 ]
+
+def record_state(field1):
+    '''
+    the record type (state) of a line, from its first field
+    '''
+    if field1 == "AUTHOR":
+        return "author"
+    elif field1 == "MODEL":
+        return "model"
+    elif field1 == "KEYWORDS":
+        return "keywords"
+    elif field1 == "ACCURACY":
+        return "accuracy"
+    elif field1 == "END":
+        return "end"
+    #default to prediction state
+    return "go_prediction"
+
+
+def prediction_check(inrec):
+    '''
+    checks one GO prediction line
+    returns (correct, errmsg, fields)
+    '''
+    correct = True
+    errmsg = None
+    fields = [i.strip() for i in inrec.split()]
+    if len(fields) != 3:
+        correct = False
+        errmsg = "GO prediction: wrong number of fields. Should be 3"
+    elif not target_field.match(fields[0]):
+        correct = False
+        errmsg = "GO prediction: error in first (Target ID) field"
+    elif not go_field.match(fields[1]):
+        correct = False
+        errmsg = "GO prediction: error in second (GO ID) field"
+    elif not confidence_field.match(fields[2]):
+        correct = False
+        errmsg = "GO prediction: error in third (confidence) field"
+    elif float(fields[2]) > 1.0:
+        correct = False
+        errmsg = "GO prediction: error in third (confidence) field. Cannot be > 1.0"
+    return correct, errmsg, fields
+
+
+class _ReadStatus:
+    """
+    State of GOPred.read() carried from one block of lines to the next
+    """
+    def __init__(self):
+        self.filenamefields = None
+        self.visited_states = []
+        self.n_accuracy = 0
+        self.first_prediction = True
+        self.first_accuracy = True
+        self.first_keywords = True
+        self.n_models = 0
+
 class GOPred:
     """
     A class for reading and storing CAFA GO predictions
-    self.data is a dictionary
+    Predictions are stored column-wise:
+       self.proteins: protein IDs, self.terms: GO terms, interned in order of appearance
+       self.protein_ids, self.term_ids: int32 arrays indexing into them
+       self.confidences: uint8 array of confidences in hundredths (the format allows two decimals)
+    self.data is the equivalent dictionary, built on first access
        key: protein ID
-       value: [{'term':go_term_1, 'threshold': threshold_1},...,{'term':go_term_n, 'threshold': threshold_n}]
+       value: [{'term':go_term_1, 'confidence': confidence_1},...,{'term':go_term_n, 'confidence': confidence_n}]
     in self.read(pred_path) , pred_path should be a handle
+    max_terms: if set, only the max_terms most confident predictions of every protein
+       are kept, the first ones read among equal confidences; the others are dropped
+       while reading, and counted in self.dropped
     Edited by Ashley: 05/26/2016
     The read function should read in from a RAW prediction file submitted by a CAFA participanting team (post format check though)
     The split function will perform spliting the prediction by ontology, which used to be a separate function in preprocess.py
     updated by Ashley: 12/29/2016
     """
-    def __init__(self):
+    def __init__(self, max_terms=None):
         #get author (teamID) and model from both header and filename
         self.author = None
         self.model = None
@@ -66,7 +142,98 @@ class GOPred:
         #split by ontology
         #get taxon from filename
         self.taxon = None
-        self.data = defaultdict(list)
+        #'bpo', 'mfo' or 'cco' once split by ontology
+        self.ontology = None
+        self.proteins = []
+        self.terms = []
+        self._protein_index = {}
+        self._term_index = {}
+        self.protein_ids = array('i')
+        self.term_ids = array('i')
+        self.confidences = array('B')
+        self._data = None
+        #(ontology, namespace code of every interned term), see split()
+        self._codes = None
+        #protein indices whose predictions have all been read, see read_split_blocks()
+        self._finished = set()
+        self.max_terms = max_terms
+        #number of predictions left out by the max_terms cap
+        self.dropped = 0
+        #predictions read of every protein index, kept when max_terms is set, see _cap()
+        self._term_counts = numpy.zeros(0, dtype=numpy.int64)
+
+    def __len__(self):
+        '''
+        number of predictions
+        '''
+        return len(self.confidences)
+
+    def _add(self, protein, term, confidence):
+        '''
+        confidence is in hundredths
+        '''
+        p = self._protein_index.get(protein)
+        if p is None:
+            p = self._protein_index[protein] = len(self.proteins)
+            self.proteins.append(protein)
+        t = self._term_index.get(term)
+        if t is None:
+            t = self._term_index[term] = len(self.terms)
+            self.terms.append(term)
+        self.protein_ids.append(p)
+        self.term_ids.append(t)
+        self.confidences.append(confidence)
+        self._data = None
+
+    def _add_records(self, records):
+        '''
+        records: list of (protein, term, confidence string) already validated
+        '''
+        proteins, terms, confidences = zip(*records)
+        #new keys get the next index, the index dictionaries keep insertion order
+        protein_index = self._protein_index
+        term_index = self._term_index
+        self.protein_ids.extend([protein_index.setdefault(p, len(protein_index)) for p in proteins])
+        self.term_ids.extend([term_index.setdefault(t, len(term_index)) for t in terms])
+        #the keys added above are the last ones in the index dictionaries
+        self.proteins.extend(reversed(list(islice(reversed(protein_index), len(protein_index) - len(self.proteins)))))
+        self.terms.extend(reversed(list(islice(reversed(term_index), len(term_index) - len(self.terms)))))
+        #'0.57' -> 57
+        self.confidences.extend([int(c[0] + c[2:]) for c in confidences])
+        self._data = None
+
+    def columns(self):
+        '''
+        (protein_ids, term_ids, confidences) as numpy arrays sharing the column memory
+        '''
+        return (numpy.frombuffer(self.protein_ids, dtype=numpy.int32) if len(self) else numpy.zeros(0, numpy.int32),
+                numpy.frombuffer(self.term_ids, dtype=numpy.int32) if len(self) else numpy.zeros(0, numpy.int32),
+                numpy.frombuffer(self.confidences, dtype=numpy.uint8) if len(self) else numpy.zeros(0, numpy.uint8))
+
+    def by_protein(self):
+        '''
+        generates (protein, [terms], [confidences]) in order of first appearance of the protein
+        confidences are floats
+        '''
+        if len(self) == 0:
+            return
+        protein_ids, term_ids, confidences = self.columns()
+        order = numpy.argsort(protein_ids, kind='stable')
+        grouped = protein_ids[order]
+        starts = numpy.flatnonzero(numpy.r_[True, grouped[1:] != grouped[:-1]])
+        ends = numpy.r_[starts[1:], len(order)].tolist()
+        terms = [self.terms[t] for t in term_ids[order].tolist()]
+        values = (confidences[order] / 100.0).tolist()
+        for start, end, p in zip(starts.tolist(), ends, grouped[starts].tolist()):
+            yield self.proteins[p], terms[start:end], values[start:end]
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = defaultdict(list)
+            for protein, terms, confidences in self.by_protein():
+                self._data[protein] = [{'term': t, 'confidence': c} for t, c in zip(terms, confidences)]
+        return self._data
 
 
     def _author_check(self,inrec):
@@ -143,26 +310,9 @@ class GOPred:
 
 
     def _go_prediction_check(self,inrec):
-        correct = True
-        errmsg = None
-        fields = [i.strip() for i in inrec.split()]
-        if len(fields) != 3:
-            correct = False
-            errmsg = "GO prediction: wrong number of fields. Should be 3"
-        elif not target_field.match(fields[0]):
-            correct = False
-            errmsg = "GO prediction: error in first (Target ID) field"
-        elif not go_field.match(fields[1]):
-            correct = False
-            errmsg = "GO prediction: error in second (GO ID) field"
-        elif not confidence_field.match(fields[2]):
-            correct = False
-            errmsg = "GO prediction: error in third (confidence) field"
-        elif float(fields[2]) > 1.0:
-            correct = False
-            errmsg = "GO prediction: error in third (confidence) field. Cannot be > 1.0"
-        else:
-            self.data[fields[0]].append({'term': fields[1], 'confidence': float(fields[2])})
+        correct, errmsg, fields = prediction_check(inrec)
+        if correct:
+            self._add(fields[0], fields[1], int(round(float(fields[2]) * 100)))
         return correct, errmsg
 
     def _end_check(self,inrec):
@@ -184,82 +334,36 @@ class GOPred:
 
 
     def read(self, pred_path):
-        visited_states = []
-        n_accuracy = 0
-        first_prediction = True
-        first_accuracy = True
-        first_keywords = True
-        n_models = 0
+        for _ in self._read(pred_path):
+            pass
+
+    def _read(self, pred_path):
+        '''
+        reads pred_path, yielding after every block of lines added to the columns
+        the record order is checked once the whole file has been read
+        '''
+        st = _ReadStatus()
         filename = pred_path.name.split('/')[-1]
-        filenamefields = filename.split('.')[0].split('_')
-        self.taxon = filenamefields[2]
+        st.filenamefields = filename.split('.')[0].split('_')
+        self.taxon = st.filenamefields[2]
         #inline = open(pred_path)
+        block = []
         for inline in pred_path: 
-            # gzipped files are in bytes. Need to convert to utf-8
-            if type(inline) is bytes:
-                inline = inline.decode("utf-8")
-            inrec = [i.strip() for i in inline.split()]
-            field1 = inrec[0]
-            # Check which field type (state) we are in
-            if field1 == "AUTHOR":
-                state = "author"
-            elif field1 == "MODEL":
-                state = "model"
-            elif field1 == "KEYWORDS":
-                state = "keywords"
-            elif field1 == "ACCURACY":
-                state = "accuracy"
-            elif field1 == "END":
-                state = "end"
-            else: #default to prediction state
-                state = "go_prediction"
-            # Check for errors according to state
-            if state == "author":
-                correct,errmsg = self._author_check(inline)
-                if correct and self.author!=filenamefields[0]:
-                    correct=False
-                    errmsg = "AUTHOR: author name different from teamID in filename"
-                self._handle_error(correct, errmsg,inline)
-                visited_states.append(state)
-                    
-            elif state == "model":
-                n_models += 1
-                n_accuracy = 0
-                if n_models > 3:
-                    raise ValueError("Too many models. Only up to 3 allowed")
-                correct,errmsg = self._model_check(inline)
-                if correct and self.model!=int(filenamefields[1]):
-                    correct=False
-                    errmsg = 'MODEL: model number in file different from filename'
-                self._handle_error(correct, errmsg,inline)
-                if n_models == 1:
-                    visited_states.append(state)
-            elif state == "keywords":
-                if first_keywords:
-                    visited_states.append(state)
-                    first_keywords = False
-                correct, errmsg = self._keywords_check(inline)
-                self._handle_error(correct, errmsg,inline)
-            elif state == "accuracy":
-                if first_accuracy:
-                    visited_states.append(state)
-                    first_accuracy = False
-                n_accuracy += 1
-                if n_accuracy > 3:
-                    self._handle_error(False, "ACCURACY: too many ACCURACY records")
-                else:
-                    correct, errmsg = self._accuracy_check(inline)
-            elif state == "go_prediction":
-                correct, errmsg = self._go_prediction_check(inline)
-                self._handle_error(correct, errmsg,inline)
-                if first_prediction:
-                    visited_states.append(state)
-                    first_prediction = False
-            elif state == "end":
-                correct, errmsg = self._end_check(inline)
-                self._handle_error(correct, errmsg,inline)
-                visited_states.append(state)
-            # End file forloop
+            block.append(inline)
+            if len(block) == BLOCK_LINES:
+                start = len(self)
+                self._read_block(block, st)
+                self._cap(start, False)
+                block = []
+                yield
+        if block:
+            start = len(self)
+            self._read_block(block, st)
+            self._cap(start, True)
+            yield
+        else:
+            self._cap(len(self), True)
+        visited_states = st.visited_states
         if (visited_states != legal_states1 and
             visited_states != legal_states2 and
             visited_states != legal_states3 and
@@ -270,42 +374,304 @@ class GOPred:
             print ("Check whether all these record types are in your file in the correct order")
             print ("AUTHOR, MODEL, KEYWORDS, ACCURACY (optional), predictions, END")
             raise ValueError
+
+    def _read_block(self, block, st):
+        '''
+        Fast path: if every line of the block is a valid prediction,
+        validate and decode them all with one regex
+        otherwise check the block line by line
+        '''
+        # gzipped files are in bytes. Need to convert to utf-8
+        if type(block[0]) is bytes:
+            text = b''.join(block).decode("utf-8")
+        else:
+            text = ''.join(block)
+        records = prediction_lines.findall(text)
+        if len(records) == len(block) and max(r[2] for r in records) <= '1.00':
+            self._add_records(records)
+            if st.first_prediction:
+                st.visited_states.append("go_prediction")
+                st.first_prediction = False
+            return
+        #header records, END or an error somewhere in the block:
+        #lines that pass the fast path regex on their own are still decoded directly
+        for inline in block:
+            if type(inline) is bytes:
+                inline = inline.decode("utf-8")
+            record = prediction_lines.match(inline)
+            if record is not None and record.group(3) <= '1.00':
+                protein, term, confidence = record.groups()
+                self._add(protein, term, int(confidence[0] + confidence[2:]))
+                if st.first_prediction:
+                    st.visited_states.append("go_prediction")
+                    st.first_prediction = False
+            else:
+                self._read_line(inline, st)
+
+    def _cap(self, start, final):
+        '''
+        the max_terms cap, after a block of predictions was added from row start
+        The block is first cut down to the max_terms most confident predictions of every
+        protein in it, as the others cannot be among the max_terms best of the file.
+        The columns are then cut down to the max_terms most confident predictions of every
+        protein as soon as a protein has max_terms predictions beyond the cap, once the
+        predictions beyond the cap add up to a block, and at the end of the file.
+        So between blocks, whatever the block size, a protein holds fewer than 2 * max_terms
+        predictions and the predictions beyond the cap add up to less than a block.
+        The block being read is only bounded by its size until it is cut down here.
+        Every prune of the columns drops at least max_terms predictions or a block of them
+        '''
+        if self.max_terms is None:
+            return
+        self._prune(start)
+        counts = self._term_counts
+        if len(counts) < len(self.proteins):
+            counts = self._term_counts = numpy.concatenate([counts, numpy.zeros(len(self.proteins) - len(counts), dtype=numpy.int64)])
+        counts += numpy.bincount(self.columns()[0][start:], minlength=len(counts))
+        excess = numpy.maximum(counts - self.max_terms, 0)
+        if excess.any() and (final or excess.max() >= self.max_terms or excess.sum() >= BLOCK_LINES):
+            self._prune()
+
+    def _prune(self, start=None):
+        '''
+        drops the predictions of every protein beyond its max_terms most confident ones
+        start: only look at the block of predictions from row start on
+        Ties at the cutoff go to the predictions read first: the kept rows stay in reading
+        order, so the outcome is the same however often the columns are pruned
+        '''
+        protein_ids, term_ids, confidences = self.columns()
+        if start is None:
+            counts = self._term_counts
+            rows = numpy.flatnonzero(counts[protein_ids] > self.max_terms)
+        else:
+            counts = numpy.bincount(protein_ids[start:], minlength=len(self.proteins))
+            rows = start + numpy.flatnonzero(counts[protein_ids[start:]] > self.max_terms)
+        if len(rows) == 0:
+            return
+        #by protein, most confident first, then in reading order
+        order = rows[numpy.lexsort((rows, -confidences[rows].astype(numpy.int16), protein_ids[rows]))]
+        grouped = protein_ids[order]
+        starts = numpy.flatnonzero(numpy.r_[True, grouped[1:] != grouped[:-1]])
+        rank = numpy.arange(len(order)) - numpy.repeat(starts, numpy.diff(numpy.r_[starts, len(order)]))
+        keep = numpy.ones(len(protein_ids), dtype=bool)
+        keep[order[rank >= self.max_terms]] = False
+        self.dropped += len(keep) - int(keep.sum())
+        self.protein_ids = array('i', protein_ids[keep].tobytes())
+        self.term_ids = array('i', term_ids[keep].tobytes())
+        self.confidences = array('B', confidences[keep].tobytes())
+        if start is None:
+            numpy.minimum(counts, self.max_terms, out=counts)
+        self._data = None
+
+    def _read_line(self, inline, st):
+        # gzipped files are in bytes. Need to convert to utf-8
+        if type(inline) is bytes:
+            inline = inline.decode("utf-8")
+        filenamefields = st.filenamefields
+        visited_states = st.visited_states
+        inrec = [i.strip() for i in inline.split()]
+        field1 = inrec[0]
+        # Check which field type (state) we are in
+        state = record_state(field1)
+        # Check for errors according to state
+        if state == "author":
+            correct,errmsg = self._author_check(inline)
+            if correct and self.author!=filenamefields[0]:
+                correct=False
+                errmsg = "AUTHOR: author name different from teamID in filename"
+            self._handle_error(correct, errmsg,inline)
+            visited_states.append(state)
+                
+        elif state == "model":
+            st.n_models += 1
+            st.n_accuracy = 0
+            if st.n_models > 3:
+                raise ValueError("Too many models. Only up to 3 allowed")
+            correct,errmsg = self._model_check(inline)
+            if correct and self.model!=int(filenamefields[1]):
+                correct=False
+                errmsg = 'MODEL: model number in file different from filename'
+            self._handle_error(correct, errmsg,inline)
+            if st.n_models == 1:
+                visited_states.append(state)
+        elif state == "keywords":
+            if st.first_keywords:
+                visited_states.append(state)
+                st.first_keywords = False
+            correct, errmsg = self._keywords_check(inline)
+            self._handle_error(correct, errmsg,inline)
+        elif state == "accuracy":
+            if st.first_accuracy:
+                visited_states.append(state)
+                st.first_accuracy = False
+            st.n_accuracy += 1
+            if st.n_accuracy > 3:
+                self._handle_error(False, "ACCURACY: too many ACCURACY records")
+            else:
+                correct, errmsg = self._accuracy_check(inline)
+        elif state == "go_prediction":
+            correct, errmsg = self._go_prediction_check(inline)
+            self._handle_error(correct, errmsg,inline)
+            if st.first_prediction:
+                visited_states.append(state)
+                st.first_prediction = False
+        elif state == "end":
+            correct, errmsg = self._end_check(inline)
+            self._handle_error(correct, errmsg,inline)
+            visited_states.append(state)
      
             
+    def _partition(self, ontology, rows):
+        '''
+        a GOPred for one ontology, with the header information of this one
+        and the predictions in rows (a boolean mask over the columns)
+        the protein and term tables are shared with this one,
+        the namespace codes are not: a partition is pickled with the results
+        of a worker and must not carry the ontology they point to
+        '''
+        part = GOPred()
+        part.author = self.author
+        part.model = self.model
+        part.keywords = self.keywords
+        part.taxon = self.taxon
+        part.ontology = ontology
+        part.proteins = self.proteins
+        part.terms = self.terms
+        part._protein_index = self._protein_index
+        part._term_index = self._term_index
+        protein_ids, term_ids, confidences = self.columns()
+        part.protein_ids.frombytes(protein_ids[rows].tobytes())
+        part.term_ids.frombytes(term_ids[rows].tobytes())
+        part.confidences.frombytes(confidences[rows].tobytes())
+        return part
+
+    def _term_codes(self, go_graph):
+        '''
+        one namespace code per interned term, 255 for terms not in the obo file
+        codes of terms seen by an earlier call are kept
+        '''
+        codes = self._codes
+        if codes is None or codes[0] is not go_graph:
+            codes = self._codes = (go_graph, numpy.empty(0, dtype=numpy.uint8))
+        known = len(codes[1])
+        if known == len(self.terms):
+            return codes[1]
+        new = numpy.empty(len(self.terms) - known, dtype=numpy.uint8)
+        for t, term in enumerate(self.terms[known:]):
+            namespace = go_graph.namespace(term)
+            if namespace is None and term in go_graph:
+                raise ValueError ("Term %s not found in any ontology" % term)
+            new[t] = 255 if namespace is None else ONTOLOGIES.index(namespace)
+        self._codes = (go_graph, numpy.concatenate([codes[1], new]))
+        return self._codes[1]
+
+    def split(self, obo_path):
+        '''
+        Split the predictions by ontology in memory
+        returns a dictionary
+           key: 'bpo', 'mfo' or 'cco'
+           value: GOPred holding only the predictions in that ontology
+        Terms not found in the obo file are left out of every partition
+        obo_path can also be an already loaded Ontology
+        '''
+        #namespaces come from the compiled ontology artifact,
+        #the obo file is only parsed again when it changes
+        if isinstance(obo_path, Ontology):
+            go_graph = obo_path
+        else:
+            go_graph = load_ontology(obo_path)
+        term_codes = self._term_codes(go_graph)[self.columns()[1]]
+        parts = {}
+        for code, ontology in enumerate(ONTOLOGIES):
+            parts[ontology] = self._partition(ontology, term_codes == code)
+        return parts
+
+    def _take_complete(self, final):
+        '''
+        moves the predictions of every protein whose block is complete
+        (all but the last protein read, or all of them if final) out of the columns
+        returns them as a GOPred sharing the protein and term tables, None if there are none
+        '''
+        if self.max_terms is not None:
+            #the predictions of complete proteins leave the columns already capped
+            self._prune()
+        protein_ids = self.columns()[0]
+        if final:
+            cut = len(protein_ids)
+        else:
+            others = numpy.flatnonzero(protein_ids != protein_ids[-1]) if len(protein_ids) else []
+            cut = others[-1] + 1 if len(others) else 0
+        if cut == 0:
+            return None
+        done = protein_ids[:cut]
+        runs = done[numpy.r_[True, done[1:] != done[:-1]]]
+        if len(runs) != len(set(runs.tolist())) or not self._finished.isdisjoint(runs.tolist()):
+            seen = set(self._finished)
+            for p in runs.tolist():
+                if p in seen:
+                    raise ValueError("Predictions of target %s are not grouped together" % self.proteins[p])
+                seen.add(p)
+        self._finished.update(runs.tolist())
+        chunk = self._partition(None, slice(0, cut))
+        protein_ids, term_ids, confidences = [c[cut:].tobytes() for c in self.columns()]
+        self.protein_ids = array('i', protein_ids)
+        self.term_ids = array('i', term_ids)
+        self.confidences = array('B', confidences)
+        self._data = None
+        return chunk
+
+    def read_split_blocks(self, obo_path, pred_path):
+        '''
+        Streaming read_and_split(): generates {ontology: GOPred} for the
+        predictions read so far whose protein block is complete, then forgets them
+        CAFA files are grouped by target, a target whose predictions are not
+        contiguous raises ValueError
+        Only the protein being read stays in the columns; the header information,
+        the interned protein and term tables and the set of finished targets are kept
+        '''
+        go_graph = load_ontology(obo_path)
+        self._finished = set()
+        for _ in self._read(pred_path):
+            chunk = self._take_complete(False)
+            if chunk is not None:
+                yield self._split_chunk(chunk, go_graph)
+        chunk = self._take_complete(True)
+        if chunk is not None:
+            yield self._split_chunk(chunk, go_graph)
+
+    def _split_chunk(self, chunk, go_graph):
+        #keep the namespace codes of the terms seen so far for the next chunk
+        chunk._codes = self._codes
+        parts = chunk.split(go_graph)
+        self._codes = chunk._codes
+        return parts
+
+    def write(self, out_path):
+        '''
+        write the predictions without header, one "protein <tab> term <tab> confidence" per line
+        '''
+        with open(out_path, "w") as out:
+            for protein, terms, confidences in self.by_protein():
+                for term, confidence in zip(terms, confidences):
+                    out.write("%s\t%s\t%.2f\n" % (protein, term, confidence))
+
+    def read_and_split(self, obo_path, pred_path, write=False):
+        '''
+        read a raw prediction file and split it by ontology in memory, see split()
+        pred_path should be a handle
+        if write is True, the partitions are also written to
+        <prediction file>_BPO.txt, _MFO.txt and _CCO.txt
+        '''
+        self.read(pred_path)
+        parts = self.split(obo_path)
+        if write:
+            for ontology in parts:
+                parts[ontology].write("%s_%s.txt" % (os.path.splitext(pred_path.name)[0], ontology.upper()))
+        return parts
+
     def read_and_split_and_write(self,obo_path,pred_path):
         #This function has self.read() included
         #pred_path should be a handle
         #split both writes to the predictions to three separate files
-        #also saves the data in memory?
-        self.read(pred_path)
-        go_graph = OboIO.OboReader(open(obo_path)).read()
-        mfo_out = open("%s_MFO.txt" % os.path.splitext(pred_path.name)[0],"w")
-        bpo_out = open("%s_BPO.txt" % os.path.splitext(pred_path.name)[0],"w")
-        cco_out = open("%s_CCO.txt" % os.path.splitext(pred_path.name)[0],"w")
-        for protein in self.data.items():
-            for u in protein[1]:
-                try:
-                    namespace = go_graph.get_namespace(u['term'])
-                except KeyError:
-                    #print("Term %s not included in obo file.\n" % str(e))
-                    namespace = None
-                    #This excludes a term that's not found in the obo file 
-                    #to be entered into any of the ontology-specific files
-                if namespace == 'molecular_function': 
-                    mfo_out.write("%s\t%s\t%.2f\n" % (protein[0], u['term'], u['confidence']))
-                elif namespace == 'biological_process': 
-                    bpo_out.write("%s\t%s\t%.2f\n" % (protein[0], u['term'], u['confidence']))
-                elif namespace == 'cellular_component': 
-                    cco_out.write("%s\t%s\t%.2f\n" % (protein[0], u['term'], u['confidence']))
-                elif namespace==None:
-                    #print("Some terms are not included in obo file\n")
-                    continue
-                else:
-                    raise ValueError ("Term %s not found in any ontology" % u['term'])
-        mfo_out.close()
-        bpo_out.close()
-        cco_out.close()
-        #self.data = None
-        #the ontology-specific files will be re-read from PrecREC
-        #12/31/2016
-            
+        #and returns the partitions held in memory, see read_and_split()
+        return self.read_and_split(obo_path, pred_path, write=True)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled benchmark annotations, memory-mapped by every process
+
+A propagated benchmark is a dictionary of sets of term indices, rebuilt by
+reading and propagating the benchmark files in every run. The artifact
+written here holds the same annotations as arrays: the benchmark proteins,
+the sorted propagated term indices of every protein in CSR form and the
+number of true terms of every protein. It is written next to the compiled
+ontology (see precrec.ontology), or to the user cache if that folder cannot
+be written, and memory-mapped, so later runs and every
+worker process share it without reading or propagating anything.
+
+TrueTerms reads like the dictionary of sets; term_array() and true_sizes()
+give the scoring code the sorted term arrays directly, a whole protein at
+a time, for either representation.
+"""
+
+import hashlib
+import os
+import sys
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import numpy
+from precrec.arrayfile import cached_paths, read_arrays, read_meta, write_cached
+from precrec.ontology import load_ontology
+
+ANNOTATIONS_VERSION = 1
+
+
+class TrueTerms(Mapping):
+    '''
+    Read-only {protein: frozenset of propagated term indices} over the artifact arrays
+    proteins: benchmark proteins, in the order of the benchmark they were compiled from
+    offsets: int64 array, the terms of proteins[i] are terms[offsets[i]:offsets[i+1]]
+    terms: int32 array of the sorted term indices of every protein
+    ntrue: int32 array, number of true terms of every protein
+    A protein outside the benchmark has no true terms, as with a defaultdict(set)
+    '''
+    def __init__(self, proteins, offsets, terms, ntrue):
+        self.proteins = proteins
+        self.index = dict((p, i) for i, p in enumerate(proteins))
+        self.offsets = offsets
+        self.terms = terms
+        self.ntrue = ntrue
+
+    def __getitem__(self, protein):
+        return frozenset(self.array(protein).tolist())
+
+    def __contains__(self, protein):
+        return protein in self.index
+
+    def __iter__(self):
+        return iter(self.proteins)
+
+    def __len__(self):
+        return len(self.proteins)
+
+    def array(self, protein):
+        '''
+        sorted term indices of the protein, as an int64 array
+        '''
+        i = self.index.get(protein)
+        if i is None:
+            return numpy.zeros(0, dtype=numpy.int64)
+        return self.terms[self.offsets[i]:self.offsets[i+1]].astype(numpy.int64)
+
+    def sizes(self, proteins):
+        rows = numpy.array([self.index.get(p, -1) for p in proteins], dtype=numpy.int64)
+        sizes = numpy.zeros(len(rows), dtype=numpy.int64)
+        sizes[rows >= 0] = self.ntrue[rows[rows >= 0]]
+        return sizes
+
+
+def term_array(true_terms, protein):
+    '''
+    true term indices of the protein as an int64 array, from a TrueTerms or a dictionary of sets
+    '''
+    if isinstance(true_terms, TrueTerms):
+        return true_terms.array(protein)
+    return numpy.fromiter(true_terms.get(protein, ()), dtype=numpy.int64)
+
+
+def true_sizes(true_terms, proteins):
+    '''
+    number of true terms of every protein, 0 for proteins outside the benchmark
+    '''
+    if isinstance(true_terms, TrueTerms):
+        return true_terms.sizes(proteins)
+    return numpy.array([len(true_terms.get(p, ())) for p in proteins], dtype=numpy.int64)
+
+
+def annotated_proteins(true_terms):
+    '''
+    benchmark proteins with at least one true term, in benchmark order
+    '''
+    if isinstance(true_terms, TrueTerms):
+        return [p for p, n in zip(true_terms.proteins, true_terms.ntrue.tolist()) if n]
+    return [p for p in true_terms if true_terms[p]]
+
+
+class CompiledBenchmark:
+    '''
+    a propagated benchmark read from its artifact, usable wherever precRec.benchmark is
+    ontology: the precrec.ontology.Ontology it was propagated with
+    true_terms: TrueTerms
+    '''
+    def __init__(self, ontology, true_terms):
+        self.ontology = ontology
+        self.true_terms = true_terms
+
+    def propagate(self):
+        #already propagated when compiled
+        pass
+
+
+def write_compiled(path, true_terms, meta):
+    '''
+    compiles the true terms of a propagated benchmark to an artifact
+    returns the path written, see precrec.arrayfile.write_cached
+    '''
+    proteins = list(true_terms)
+    arrays = [numpy.sort(term_array(true_terms, p)).astype(numpy.int32) for p in proteins]
+    ntrue = numpy.array([len(a) for a in arrays], dtype=numpy.int32)
+    offsets = numpy.zeros(len(proteins) + 1, dtype=numpy.int64)
+    numpy.cumsum(ntrue, out=offsets[1:])
+    terms = numpy.concatenate(arrays) if arrays else numpy.zeros(0, dtype=numpy.int32)
+    width = max([len(p) for p in proteins] + [1])
+    meta = dict(meta, version=ANNOTATIONS_VERSION)
+    return write_cached(path, [('proteins', numpy.array(proteins, dtype='S%d' % width)),
+                               ('offsets', offsets), ('terms', terms), ('ntrue', ntrue)], meta)
+
+
+def read_compiled(path, ontology):
+    arrays = read_arrays(path)[1]
+    return CompiledBenchmark(ontology, TrueTerms(arrays['proteins'].astype(str).tolist(), arrays['offsets'],
+                                                 arrays['terms'], arrays['ntrue']))
+
+
+def _current(path, meta):
+    if not os.path.isfile(path):
+        return False
+    try:
+        stored = read_meta(path)
+    except ValueError:
+        return False
+    return stored.get('version') == ANNOTATIONS_VERSION and all(stored.get(key) == meta[key] for key in meta)
+
+
+def load_compiled(path, meta, ontology, build):
+    '''
+    the benchmark compiled at path if it was compiled from what meta describes,
+    else build(), a propagated benchmark, compiled to path first
+    (to the user cache if path cannot be written, and not at all if neither can)
+    meta['ontology'] is the checksum of the OBO file ontology was compiled from
+    '''
+    for cached in cached_paths(path):
+        if _current(cached, meta):
+            return read_compiled(cached, ontology)
+    bench = build()
+    if getattr(bench.ontology, 'checksum', None) != meta['ontology']:
+        #propagated with an ancestors file, its term indices are not those of the compiled ontology
+        return bench
+    sys.stderr.write("compiling benchmark into %s\n" % path)
+    written = write_compiled(path, bench.true_terms, meta)
+    if written is None:
+        return bench
+    return read_compiled(written, ontology)
+
+
+def benchmark_artifact_path(obo_path, name, key, cache_dir=None):
+    '''
+    next to the compiled ontology, see precrec.ontology.artifact_path
+    '''
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(obo_path))
+    return os.path.join(cache_dir, '%s.%s.%s.benchmark' % (os.path.basename(obo_path), name, key[:16]))
+
+
+def folder_stamp(folder):
+    '''
+    digest of the names, sizes and modification times of every file under folder
+    '''
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(('%s %s %s\n' % (os.path.relpath(os.path.join(root, name), folder),
+                                           stat.st_size, stat.st_mtime)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CompiledLoader:
+    '''
+    wraps a benchmark loader called as loader(ontology, taxon, type, folder, obo_path),
+    e.g. read_benchmark, for precrec.cache.BenchmarkCache
+    The first call for a benchmark compiles what the loader returns; later calls, in
+    this run or the next ones, map the artifact instead of reading and propagating again.
+    The artifact is rebuilt when the OBO file or any file of the benchmark folder changes
+    '''
+    def __init__(self, loader, cache_dir=None):
+        self.loader = loader
+        self.cache_dir = cache_dir
+
+    def __call__(self, onto, taxon, TYPE, folder, obo_path):
+        #the ontology of this process is reused while the OBO file is unchanged, so is its checksum
+        ontology = load_ontology(obo_path)
+        meta = {'ontology': ontology.checksum, 'benchmark': folder_stamp(folder),
+                'key': [onto.lower(), taxon, TYPE, os.path.abspath(folder)]}
+        key = hashlib.sha1(repr(sorted(meta.items())).encode('utf-8')).hexdigest()
+        path = benchmark_artifact_path(obo_path, '%s_%s_%s' % (onto.lower(), taxon, TYPE), key, self.cache_dir)
+        return load_compiled(path, meta, ontology,
+                             lambda: self.loader(onto, taxon, TYPE, folder, obo_path))
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Single-file container for named numpy arrays, readable through mmap
+
+Layout:
+    8 bytes magic, 8 bytes little-endian header length,
+    JSON header {'meta': {...}, 'arrays': [[name, dtype, shape, offset], ...]},
+    then the raw array data, every array aligned to 64 bytes.
+A compressed file stores every array zlib-compressed, its header entries
+carry the compressed size as a fifth field. Only uncompressed arrays can be
+memory-mapped, compressed ones are inflated into memory when read.
+
+Artifacts cached next to their input fall back to the user cache folder
+when that folder cannot be written, see write_cached.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+import numpy
+
+MAGIC = b'PRECREC1'
+ALIGN = 64
+#zlib level of compressed files, favouring speed
+COMPRESS_LEVEL = 1
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_arrays(path, arrays, meta=None, compress=False):
+    '''
+    arrays: list of (name, array) pairs
+    meta: any JSON-serializable dictionary
+    compress: zlib-compress every array, the file can then no longer be memory-mapped
+    The file is written to a temporary name and moved into place,
+    so concurrent readers never see a partial file
+    '''
+    arrays = [(name, numpy.ascontiguousarray(arr)) for name, arr in arrays]
+    entries = []
+    offset = 0
+    data = []
+    for name, arr in arrays:
+        if compress:
+            raw = zlib.compress(arr.tobytes(), COMPRESS_LEVEL)
+            entries.append([name, arr.dtype.str, list(arr.shape), offset, len(raw)])
+        else:
+            raw = arr
+            entries.append([name, arr.dtype.str, list(arr.shape), offset])
+        data.append(raw)
+        offset = _aligned(offset + (len(raw) if compress else arr.nbytes))
+    header = json.dumps({'meta': meta or {}, 'arrays': entries}).encode('utf-8')
+    start = _aligned(len(MAGIC) + 8 + len(header))
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as out:
+            out.write(MAGIC)
+            out.write(struct.pack('<Q', len(header)))
+            out.write(header)
+            for raw, entry in zip(data, entries):
+                out.seek(start + entry[3])
+                out.write(raw)
+            #pad the last array so every offset stays inside the file
+            out.truncate(start + offset)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def user_cache_dir():
+    '''
+    $PRECREC_CACHE, else precrec in $XDG_CACHE_HOME or ~/.cache
+    '''
+    if os.environ.get('PRECREC_CACHE'):
+        return os.environ['PRECREC_CACHE']
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'precrec')
+
+
+def cached_paths(path):
+    '''
+    where the artifact meant for path may be: path itself,
+    then the file of the same name in user_cache_dir()
+    '''
+    return [path, os.path.join(user_cache_dir(), os.path.basename(path))]
+
+
+def write_cached(path, arrays, meta=None):
+    '''
+    write_arrays to path, or to user_cache_dir() if path cannot be written,
+    e.g. next to an input in a read-only folder
+    returns the path written, None if neither could be written
+    '''
+    for target in cached_paths(path):
+        try:
+            folder = os.path.dirname(target)
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            write_arrays(target, arrays, meta)
+            return target
+        except OSError as e:
+            sys.stderr.write("cannot write %s: %s\n" % (target, e))
+    return None
+
+
+def read_meta(path):
+    '''
+    returns the meta dictionary without mapping any array
+    '''
+    with open(path, 'rb') as handle:
+        return _read_header(handle)[0]['meta']
+
+
+def _read_header(handle):
+    if handle.read(len(MAGIC)) != MAGIC:
+        raise ValueError('%s is not an array file' % handle.name)
+    size = struct.unpack('<Q', handle.read(8))[0]
+    header = json.loads(handle.read(size).decode('utf-8'))
+    return header, _aligned(len(MAGIC) + 8 + size)
+
+
+def read_arrays(path):
+    '''
+    returns (meta, arrays), arrays is a dictionary of read-only numpy arrays
+    backed by a shared memory map of the file
+    (compressed arrays are inflated into memory instead)
+    '''
+    with open(path, 'rb') as handle:
+        header, start = _read_header(handle)
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    arrays = {}
+    for entry in header['arrays']:
+        name, dtype, shape, offset = entry[:4]
+        dtype = numpy.dtype(dtype)
+        count = int(numpy.prod(shape))
+        if len(entry) > 4:
+            raw = zlib.decompress(mapped[start + offset:start + offset + entry[4]])
+            arrays[name] = numpy.frombuffer(raw, dtype=dtype, count=count).reshape(shape)
+        else:
+            arrays[name] = numpy.frombuffer(mapped, dtype=dtype, count=count, offset=start + offset).reshape(shape)
+    return header['meta'], arrays
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Resumable batch evaluation of many team submissions
+
+A manifest lists team submission folders or archives. Every
+(team, model, taxon, ontology) job found in them is evaluated once, and each
+finished job is appended to a checkpoint file, so a restarted run skips the
+work already done. A job that fails is checkpointed with its error and the
+batch goes on. At the end one leaderboard table is written.
+"""
+
+import json
+import os
+import sys
+import zipfile
+from precrec.ingest import iter_members
+from precrec.ontology import file_checksum
+
+ONTOLOGIES = ['bpo','cco','mfo']
+
+
+def read_manifest(manifest_path):
+    '''
+    one submission per line: team <tab> folder or archive path
+    a line with only a path uses the basename of the path as team
+    empty lines and lines starting with # are ignored
+    relative paths are relative to the manifest
+    '''
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    entries = []
+    with open(manifest_path) as manifest:
+        for inline in manifest:
+            inline = inline.strip()
+            if inline == '' or inline.startswith('#'):
+                continue
+            fields = inline.split('\t')
+            path = os.path.join(base, fields[-1].strip())
+            if len(fields) == 1:
+                team = os.path.basename(path.rstrip('/')).split('.')[0]
+            else:
+                team = fields[0].strip()
+            entries.append((team, path))
+    return entries
+
+
+def _prediction_name(name):
+    '''
+    model and taxon of a CAFA prediction filename such as Doegroup_1_9606.txt,
+    None for anything else (including hpo predictions)
+    '''
+    filename = os.path.basename(name)
+    fields = filename.split('.')[0].split('_')
+    if len(fields) != 3 or 'hpo' in filename or not fields[1].isdigit():
+        return None
+    if filename.split('.')[-1] not in ('txt', 'gz'):
+        return None
+    return int(fields[1]), fields[2]
+
+
+def member_checksum(member, archives):
+    '''
+    identifies the content of a prediction file, see precrec.ingest.Member:
+    the sha1 of a file or gz file, the CRC-32 and size of a zip member,
+    and the sha1 of the archive for a tar member, which is streamed
+    archives: sha1 of the archives already read, by path
+    '''
+    if member.kind == 'zip':
+        with zipfile.ZipFile(member.path) as obj:
+            info = obj.getinfo(member.name)
+        return 'crc32:%08x:%d' % (info.CRC, info.file_size)
+    if member.path not in archives:
+        archives[member.path] = file_checksum(member.path)
+    return archives[member.path]
+
+
+def submission_files(path):
+    '''
+    generates (name, model, taxon, opener, checksum) for every prediction file
+    of a folder, a zip, tar(.gz) or gz archive, or a single text file
+    opener() returns a handle GOPred.read() accepts, see precrec.ingest
+    the opener of a tar member is only valid until the next file is generated
+    checksum identifies the content of the file, see member_checksum
+    '''
+    archives = {}
+    for member, opener in iter_members(path, lambda name: _prediction_name(name) is not None):
+        yield (member.name,) + _prediction_name(member.name) + (opener, member_checksum(member, archives))
+
+
+class ResultStore:
+    '''
+    Append-only checkpoint file, one JSON record per finished job
+    A job is identified by (team, model, taxon, benchmark type, mode, file checksum, ontology),
+    so a store shared by several types or modes keeps them apart,
+    and a file replaced under the same name is evaluated again
+    TYPE, mode: benchmark type and mode of the jobs run() evaluates
+    '''
+    def __init__(self, path, TYPE=None, mode=None):
+        self.path = path
+        self.TYPE = TYPE
+        self.mode = mode
+        self.records = {}
+        #key: job without the file checksum, value: its last record
+        self.latest = {}
+        if os.path.isfile(path):
+            cut = False
+            with open(path) as store:
+                for inline in store:
+                    cut = not inline.endswith('\n')
+                    try:
+                        record = json.loads(inline)
+                    except ValueError:
+                        #a line cut short by a crash
+                        continue
+                    self._keep(record)
+            if cut:
+                #the next record starts on a line of its own
+                with open(path, 'a') as store:
+                    store.write('\n')
+
+    @staticmethod
+    def key(record):
+        return (record['team'], record['model'], record['taxon'], record.get('type'), record.get('mode'),
+                record.get('checksum'), record['ontology'])
+
+    def job(self, team, model, taxon, checksum, onto):
+        '''
+        the key of a job of this store's benchmark type and mode
+        '''
+        return (team, model, taxon, self.TYPE, self.mode, checksum, onto)
+
+    def _keep(self, record):
+        key = self.key(record)
+        self.records[key] = record
+        self.latest[key[:5] + key[6:]] = record
+
+    def done(self, key, retry_failed=False):
+        record = self.records.get(key)
+        if record is None:
+            return False
+        return not (retry_failed and record['status'] == 'error')
+
+    def add(self, record):
+        '''
+        the record is on disk before add() returns
+        '''
+        with open(self.path, 'a') as store:
+            store.write(json.dumps(record, sort_keys=True) + '\n')
+            store.flush()
+            os.fsync(store.fileno())
+        self._keep(record)
+
+    def current(self):
+        '''
+        the last record of every job of this store's benchmark type and mode,
+        whatever the checksum of the file it was evaluated from
+        '''
+        return [r for r in self.latest.values() if (r.get('type'), r.get('mode')) == (self.TYPE, self.mode)]
+
+    def compact(self):
+        '''
+        rewrites the file with only the last record of every job
+        '''
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as store:
+            for key in sorted(self.latest, key=str):
+                store.write(json.dumps(self.latest[key], sort_keys=True) + '\n')
+            store.flush()
+            os.fsync(store.fileno())
+        os.replace(tmp_path, self.path)
+        self.records = dict((self.key(r), r) for r in self.latest.values())
+
+
+def run(entries, store, evaluate, retry_failed=False, refresh=False):
+    '''
+    entries: (team, path) pairs from read_manifest()
+    evaluate(team, handle, ontologies) evaluates one prediction file
+    on the ontologies still to do, and returns one record per ontology
+    Files whose jobs are all in the store are not read again
+    refresh: evaluate every job again, for an evaluate() that only redoes what changed
+    '''
+    for team, path in entries:
+        for name, model, taxon, opener, checksum in submission_files(path):
+            todo = [onto for onto in ONTOLOGIES
+                    if refresh or not store.done(store.job(team, model, taxon, checksum, onto), retry_failed)]
+            if not todo:
+                continue
+            sys.stdout.write('Evaluating %s %s (%s)\n' % (team, name, ','.join(todo)))
+            try:
+                handle = opener()
+                try:
+                    records = evaluate(team, handle, todo)
+                finally:
+                    handle.close()
+            except Exception as e:
+                #one bad file must not stop the batch, its jobs are checkpointed as failed
+                sys.stderr.write('%s %s failed: %r\n' % (team, name, e))
+                records = [{'status': 'error', 'error': repr(e), 'ontology': onto} for onto in todo]
+            for record in records:
+                record.update({'team': team, 'model': model, 'taxon': taxon, 'file': name, 'checksum': checksum,
+                               'type': store.TYPE, 'mode': store.mode})
+                store.add(record)
+
+
+def write_leaderboard(store, out_path):
+    '''
+    one row per successful job with predictions in its ontology,
+    ranked by Fmax within each (ontology, taxon)
+    '''
+    rows = [r for r in store.current() if r['status'] == 'ok' and r['exist']]
+    rows.sort(key=lambda r: (r['ontology'], r['taxon'], -(r['fmax'] or 0), r['team'], r['model']))
+    with open(out_path, 'w') as out:
+        out.write('%s\n' % '\t'.join(['Ontology','Taxon','Rank','Team','Author','Model','Fmax','Threshold','Coverage']))
+        rank = 0
+        group = None
+        for r in rows:
+            if (r['ontology'], r['taxon']) != group:
+                group = (r['ontology'], r['taxon'])
+                rank = 0
+            rank += 1
+            out.write('%s\t%s\t%d\t%s\t%s\t%s\t%s\t%s\t%s\n' % (r['ontology'], r['taxon'], rank, r['team'],
+                      r['author'], r['model'], r['fmax'], r['threshold'], r['coverage']))
+    return len(rows)
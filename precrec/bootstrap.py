@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Bootstrap confidence intervals and paired team comparisons for Fmax
+
+Benchmark proteins are resampled with replacement. A resample is a vector of
+counts, how many times each benchmark protein was drawn, so the Fmax of a
+resample is a weighted sum of the per-protein arrays kept in
+precrec.fmax.ProteinCounts. Every team scored on the same benchmark uses the
+same resamples, which makes paired comparisons between teams free.
+"""
+
+import numpy
+from precrec.annotations import annotated_proteins
+
+
+def benchmark_proteins(true_terms):
+    '''
+    the resampled universe: benchmark proteins with at least one true term, sorted
+    '''
+    return sorted(annotated_proteins(true_terms))
+
+
+def counted_proteins(GoPred, true_terms):
+    '''
+    the benchmark proteins partial mode averages recall over (countb), sorted:
+    the proteins of GoPred with at least one true term, including those whose
+    predicted terms are all obsolete and so have no row in the per-protein counts
+    '''
+    if len(GoPred) == 0:
+        return []
+    predicted = set(GoPred.proteins[p] for p in numpy.unique(GoPred.columns()[0]).tolist())
+    return [p for p in benchmark_proteins(true_terms) if p in predicted]
+
+
+class Bootstrap:
+    '''
+    proteins: benchmark proteins, see benchmark_proteins()
+    n resamples are drawn from a generator seeded with seed, batch at a time,
+    so the same (proteins, n, seed) always gives the same resamples
+    '''
+    def __init__(self, proteins, n=10000, seed=0, batch=500):
+        self.proteins = list(proteins)
+        self.index = dict((p, i) for i, p in enumerate(self.proteins))
+        self.n = n
+        self.seed = seed
+        self.batch = batch
+
+    def resamples(self):
+        '''
+        generates resample-count matrices of at most batch x len(proteins)
+        '''
+        rng = numpy.random.RandomState(self.seed)
+        size = len(self.proteins)
+        pvals = numpy.full(size, 1.0 / size)
+        done = 0
+        while done < self.n:
+            rows = min(self.batch, self.n - done)
+            yield rng.multinomial(size, pvals, size=rows).astype(float)
+            done += rows
+
+    def contributions(self, counts, counted=None):
+        '''
+        per-protein contributions of one ProteinCounts, aligned to self.proteins
+        counted: the proteins partial mode averages recall over, see counted_proteins(),
+        by default those of counts
+        returns (precision, has_prediction, recall, predicted)
+        precision[p,j]: tp/count of protein p at threshold j, 0 if nothing is predicted
+        has_prediction[p,j]: 1 if protein p has a term above threshold j
+        recall[p,j]: tp/ntrue of protein p at threshold j
+        predicted[p]: 1 if protein p is counted (counts towards countb)
+        '''
+        shape = (len(self.proteins), len(counts.thresholds))
+        precision = numpy.zeros(shape)
+        has_prediction = numpy.zeros(shape)
+        recall = numpy.zeros(shape)
+        predicted = numpy.zeros(len(self.proteins))
+        rows = numpy.array([self.index[p] for p in counts.proteins], dtype=int)
+        if len(rows):
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                precision[rows] = numpy.where(counts.count > 0, counts.tp / counts.count, 0.0)
+            has_prediction[rows] = counts.count > 0
+            recall[rows] = counts.tp / counts.ntrue[:, None]
+            predicted[rows] = 1
+        if counted is not None:
+            #proteins with only obsolete terms count, with a recall of 0
+            predicted[[self.index[p] for p in counted]] = 1
+        return (precision, has_prediction, recall, predicted)
+
+    def fmax(self, counts, full=False, counted=None):
+        '''
+        counts: list of ProteinCounts, one per team, on this benchmark
+        full: average recall over all resampled benchmark proteins (full mode)
+        instead of the counted ones (partial mode)
+        counted: list of the counted proteins of every team, see counted_proteins(),
+        by default the proteins of its counts
+        returns a len(counts) x n array of resampled Fmax values
+        '''
+        if counted is None:
+            counted = [None] * len(counts)
+        contributions = [self.contributions(c, p) for c, p in zip(counts, counted)]
+        samples = numpy.zeros((len(counts), self.n))
+        start = 0
+        for weights in self.resamples():
+            end = start + len(weights)
+            for k, (precision, has_prediction, recall, predicted) in enumerate(contributions):
+                if full:
+                    nbench = weights.sum(axis=1)
+                else:
+                    nbench = weights.dot(predicted)
+                with numpy.errstate(divide='ignore', invalid='ignore'):
+                    pr = weights.dot(precision) / weights.dot(has_prediction)
+                    rc = weights.dot(recall) / nbench[:, None]
+                    f = 2 * pr * rc / (pr + rc)
+                f[~numpy.isfinite(f)] = 0.0
+                samples[k, start:end] = f.max(axis=1)
+            start = end
+        return samples
+
+
+def confidence_interval(samples, alpha=0.05):
+    '''
+    percentile interval holding 1-alpha of the resampled values
+    '''
+    return (float(numpy.percentile(samples, 100 * alpha / 2)),
+            float(numpy.percentile(samples, 100 * (1 - alpha / 2))))
+
+
+def paired_test(a, b, alpha=0.05):
+    '''
+    a, b: resampled Fmax of two teams on the same resamples
+    returns (mean difference a-b, lower, upper, p)
+    p is the fraction of resamples where a does not beat b
+    '''
+    diff = numpy.asarray(a) - numpy.asarray(b)
+    lower, upper = confidence_interval(diff, alpha)
+    return (float(diff.mean()), lower, upper, float((diff <= 0).mean()))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide memoization of propagated benchmarks
+
+Scoring many submissions for the same species reads and propagates the same
+benchmark and ancestor files over and over. BenchmarkCache keeps the most
+recently used benchmarks, keyed by (ontology, taxon, type, folder, obo checksum).
+"""
+
+import os
+from collections import OrderedDict
+from precrec.ontology import file_checksum
+
+
+class BenchmarkCache:
+    '''
+    loader is called as loader(ontology, taxon, type, folder, obo_path)
+    on a cache miss, e.g. read_benchmark
+    At most maxsize benchmarks are kept, the least recently used is evicted first
+    '''
+    def __init__(self, loader, maxsize=6):
+        if maxsize < 1:
+            raise ValueError('benchmark cache size should be at least 1')
+        self.loader = loader
+        self.maxsize = maxsize
+        self.benchmarks = OrderedDict()
+        #key: obo path, value: ((size, mtime), checksum)
+        self.checksums = {}
+        self.hits = 0
+        self.misses = 0
+
+    def checksum(self, obo_path):
+        '''
+        checksum of the obo file, only recomputed when its size or mtime changes
+        '''
+        path = os.path.abspath(obo_path)
+        stat = os.stat(path)
+        stamp = (stat.st_size, stat.st_mtime)
+        cached = self.checksums.get(path)
+        if cached is None or cached[0] != stamp:
+            cached = self.checksums[path] = (stamp, file_checksum(path))
+        return cached[1]
+
+    def key(self, onto, taxon, TYPE, folder, obo_path):
+        return (onto.lower(), taxon, TYPE, os.path.abspath(folder), self.checksum(obo_path))
+
+    def get(self, onto, taxon, TYPE, folder, obo_path):
+        '''
+        returns the propagated benchmark, shared by every caller with the same key
+        callers should treat it as read-only
+        '''
+        key = self.key(onto, taxon, TYPE, folder, obo_path)
+        if key in self.benchmarks:
+            self.hits += 1
+            self.benchmarks.move_to_end(key)
+            return self.benchmarks[key]
+        self.misses += 1
+        bench = self.loader(onto, taxon, TYPE, folder, obo_path)
+        self.benchmarks[key] = bench
+        if len(self.benchmarks) > self.maxsize:
+            self.benchmarks.popitem(last=False)
+        return bench
+
+    def clear(self):
+        self.benchmarks.clear()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar binary export of propagated predictions (PrecREC.printConfidence)
+
+One row per propagated (protein, term) pair, as typed arrays:
+    protein: int32, 1-based index of the protein in PrecREC.predicted,
+             the protindex of the text output
+    term: int32, term index in the ontology the benchmark was propagated with
+    confidence: uint8, confidence in hundredths
+    truth: bool, whether the term is a true term of the protein
+plus the protein IDs, in index order. The file is a precrec.arrayfile
+container, memory-mapped when read unless it was written compressed.
+"""
+
+import numpy
+from precrec.arrayfile import read_arrays, write_arrays
+
+CONFDATA_VERSION = 1
+
+
+def confidence_columns(predicted):
+    '''
+    PrecREC.predicted as (proteins, protein, term, confidence, truth) arrays
+    proteins lists every protein of predicted, including those not in the
+    benchmark, so row indices match the text output
+    '''
+    proteins = list(predicted)
+    sizes = []
+    terms = []
+    values = []
+    for prot in proteins:
+        found = predicted[prot]
+        if found is None:
+            sizes.append(0)
+            continue
+        sizes.append(len(found))
+        terms.extend(found)
+        values.extend(found.values())
+    protein = numpy.repeat(numpy.arange(1, len(proteins) + 1, dtype=numpy.int32), sizes)
+    term = numpy.array(terms, dtype=numpy.int32)
+    if values:
+        conf, truth = zip(*values)
+    else:
+        conf, truth = (), ()
+    confidence = numpy.rint(numpy.array(conf, dtype=float) * 100).astype(numpy.uint8)
+    truth = numpy.array(truth, dtype=bool)
+    return proteins, protein, term, confidence, truth
+
+
+def write_confidence(path, predicted, compress=False, meta=None):
+    '''
+    write PrecREC.predicted to path, see the module docstring
+    meta: extra JSON-serializable information to keep with the data
+    '''
+    proteins, protein, term, confidence, truth = confidence_columns(predicted)
+    width = max([len(p) for p in proteins] + [1])
+    info = {'version': CONFDATA_VERSION}
+    info.update(meta or {})
+    write_arrays(path,
+                 [('proteins', numpy.array(proteins, dtype='S%d' % width)),
+                  ('protein', protein),
+                  ('term', term),
+                  ('confidence', confidence),
+                  ('truth', truth)],
+                 info, compress)
+
+
+def read_confidence(path):
+    '''
+    returns (meta, arrays) of a file written by write_confidence
+    arrays: 'proteins' (bytes IDs), 'protein', 'term', 'confidence' (hundredths), 'truth'
+    '''
+    meta, arrays = read_arrays(path)
+    if meta.get('version') != CONFDATA_VERSION:
+        raise ValueError('%s is not a confidence data file' % path)
+    return meta, arrays
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+JSON requests to a long-running local server, over localhost HTTP or a Unix socket
+
+An address is host:port for HTTP over TCP, or the path of a Unix socket
+(anything with a '/' in it). Both speak the same HTTP: a JSON object is
+POSTed to a path and a JSON object comes back. Jobs name files on the machine
+the server runs on, so by default the server listens on a socket file only
+its owner can connect to. Any local user can connect to a loopback TCP port,
+so over TCP every request must carry the shared token of the server,
+$PRECREC_TOKEN by default.
+"""
+
+import hmac
+import http.client
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from precrec.arrayfile import user_cache_dir
+
+LOOPBACK = ('127.0.0.1', 'localhost', '::1')
+TOKEN_HEADER = 'X-Precrec-Token'
+
+
+def default_address():
+    '''
+    $PRECREC_SERVER, else precrec.sock in the user cache, see precrec.arrayfile.user_cache_dir
+    '''
+    return os.environ.get('PRECREC_SERVER') or os.path.join(user_cache_dir(), 'precrec.sock')
+
+
+def default_token():
+    return os.environ.get('PRECREC_TOKEN') or None
+
+
+def is_unix(address):
+    return '/' in address
+
+
+def tcp_address(address):
+    '''
+    'host:port' or ':port' -> (host, port), the host defaults to 127.0.0.1
+    '''
+    host, _, port = address.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    '''
+    hands every request to server.app(method, path, body), which returns (HTTP status, JSON object)
+    requests without the token of the server, if it has one, are refused
+    '''
+    def _allowed(self):
+        if self.server.token is None:
+            return True
+        sent = self.headers.get(TOKEN_HEADER, '')
+        if hmac.compare_digest(sent.encode('utf-8'), self.server.token.encode('utf-8')):
+            return True
+        self._send(403, {'error': 'missing or wrong token'})
+        return False
+
+    def do_GET(self):
+        if self._allowed():
+            self._send(*self.server.app('GET', self.path, None))
+
+    def do_POST(self):
+        if not self._allowed():
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            self._send(400, {'error': 'request body is not JSON'})
+            return
+        self._send(*self.server.app('POST', self.path, body))
+
+    def _send(self, code, reply):
+        data = json.dumps(reply).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        #Unix socket clients have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'local'
+
+    def log_message(self, format, *args):
+        sys.stderr.write('%s %s\n' % (self.address_string(), format % args))
+
+
+class _TCPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def check_address(address, token=None):
+    '''
+    raises ValueError if a server cannot listen on address, see make_server
+    '''
+    if is_unix(address):
+        if os.path.exists(address) and not stat.S_ISSOCK(os.stat(address).st_mode):
+            raise ValueError('%s exists and is not a socket' % address)
+        return
+    host, port = tcp_address(address)
+    if host not in LOOPBACK:
+        raise ValueError('the server only listens on localhost, not on %s' % host)
+    if not token:
+        raise ValueError('any local user can connect to %s, set $PRECREC_TOKEN or listen on a Unix socket' % address)
+
+
+def make_server(address, app, token=None):
+    '''
+    a threaded HTTP server on address, call serve_forever() on it
+    app(method, path, body) answers every request, see _Handler
+    token: secret every request must send, required over TCP
+    A stale socket file left at address by a server that died is replaced
+    '''
+    check_address(address, token)
+    if is_unix(address):
+        if os.path.exists(address):
+            os.remove(address)
+        folder = os.path.dirname(os.path.abspath(address))
+        if not os.path.isdir(folder):
+            os.makedirs(folder, 0o700)
+        #created 0600, no other user can connect between bind and chmod
+        umask = os.umask(0o177)
+        try:
+            server = _UnixServer(address, _Handler)
+        finally:
+            os.umask(umask)
+        os.chmod(address, 0o600)
+    else:
+        server = _TCPServer(tcp_address(address), _Handler)
+    server.token = token or None
+    server.app = app
+    return server
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        http.client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(address, method, path, body=None, timeout=None, token=None):
+    '''
+    sends one request to the server at address, returns its JSON reply
+    timeout: seconds to wait for the reply, None waits as long as the job takes
+    token: the token of the server, see make_server
+    raises IOError if the server cannot be reached or answers with an error
+    '''
+    if is_unix(address):
+        conn = _UnixConnection(address, timeout)
+    else:
+        host, port = tcp_address(address)
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers[TOKEN_HEADER] = token
+        conn.request(method, path, data, headers)
+        response = conn.getresponse()
+        reply = json.loads(response.read().decode('utf-8'))
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise IOError('server error %s: %s' % (response.status, reply.get('error')))
+    return reply
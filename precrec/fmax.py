@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Single-pass threshold sweep for the precision-recall assessment
+
+The confidences of every propagated (protein, term) pair are read once and
+bucketed against the threshold grid. Cumulative TP and predicted-count arrays
+then give precision, recall and Fmax for every threshold at once, instead of
+rescanning PrecREC.predicted once per threshold. Given an information
+accretion table, the same pass also sums IA weights for weighted Fmax and Smin.
+"""
+
+import numpy
+from precrec.annotations import term_array, true_sizes
+
+#number of thresholds of every sweep, 0.01 to 0.99 by 0.01
+INTERVAL = 99
+
+
+def threshold_grid(interval):
+    '''
+    the thresholds used by PrecREC.Fmax_output
+    interval is the number of threshold values between 0.01 and 0.99
+    '''
+    return numpy.linspace(0.01, 0.99, interval)
+
+
+def _cumulative(rows, bins, nrows, nthres, weights=None):
+    '''
+    rows[i] is the row (protein) of term i
+    bins[i] is the number of thresholds term i passes
+    returns a nrows x nthres matrix, where entry [p,j] counts the terms of
+    protein p with confidence >= thresholds[j], or sums their weights
+    '''
+    width = nthres + 1
+    hist = numpy.bincount(rows * width + bins, weights=weights, minlength=nrows * width)
+    hist = hist.reshape(nrows, width)
+    #a term in bin k passes thresholds 0..k-1
+    #so column j sums bins j+1..nthres
+    return numpy.cumsum(hist[:, :0:-1], axis=1)[:, ::-1]
+
+
+class ProteinCounts:
+    '''
+    Per-protein, per-threshold counts for one prediction file in one ontology
+    proteins: benchmark proteins that have been predicted, in row order
+    thresholds: ascending threshold grid
+    tp[p,j]: number of true terms of protein p predicted with confidence >= thresholds[j]
+    count[p,j]: number of terms of protein p predicted with confidence >= thresholds[j]
+    ntrue[p]: number of propagated benchmark terms of protein p
+    wtp, wcount, wtrue: the same sums weighted by information accretion,
+    None unless an IA table was given to count_predictions
+    '''
+    def __init__(self, proteins, thresholds, tp, count, ntrue, wtp=None, wcount=None, wtrue=None):
+        self.proteins = proteins
+        self.thresholds = thresholds
+        self.tp = tp
+        self.count = count
+        self.ntrue = ntrue
+        self.wtp = wtp
+        self.wcount = wcount
+        self.wtrue = wtrue
+
+    def sums(self):
+        '''
+        the per-threshold sums over the proteins, see ThresholdSums
+        '''
+        return ThresholdSums(self.thresholds).add(self)
+
+    def precision_recall(self, nbench=None):
+        '''
+        returns arrays of precision, recall and counta over the threshold grid
+        counta is the number of proteins with at least one term above threshold
+        precision is averaged over those counta proteins (nan if there are none)
+        recall is averaged over nbench proteins, which defaults to the number
+        of predicted benchmark proteins (countb)
+        '''
+        return self.sums().precision_recall(nbench)
+
+    def fmax(self, nbench=None):
+        '''
+        returns (precision, recall, fmax, threshold, coverage)
+        precision and recall are lists over the threshold grid
+        threshold is the largest threshold giving fmax
+        coverage is the fraction of proteins with at least one term above that threshold
+        '''
+        return self.sums().fmax(nbench)
+
+    def weighted_precision_recall(self, nbench=None):
+        '''
+        precision_recall() with every term weighted by its information accretion
+        proteins whose terms above threshold all have IA 0 do not count towards precision
+        '''
+        return self.sums().weighted_precision_recall(nbench)
+
+    def weighted_fmax(self, nbench=None):
+        '''
+        fmax() over weighted_precision_recall()
+        '''
+        return self.sums().weighted_fmax(nbench)
+
+    def smin(self, nbench=None, missing=0.0):
+        '''
+        returns (ru, mi, smin, threshold)
+        ru: remaining uncertainty, IA of the true terms not predicted, averaged over nbench proteins
+        mi: misinformation, IA of the predicted terms that are not true, averaged over nbench proteins
+        ru and mi are lists over the threshold grid
+        smin is the smallest sqrt(ru^2 + mi^2), threshold the smallest threshold giving it
+        missing is the IA of the true terms of benchmark proteins without predictions,
+        it adds to ru when nbench counts them (full mode)
+        '''
+        return self.sums().smin(nbench, missing)
+
+
+class ThresholdSums:
+    '''
+    Sums over proteins of the per-protein precision, recall, remaining
+    uncertainty and misinformation at every threshold
+    This is all Fmax, weighted Fmax and Smin need, so ProteinCounts of
+    disjoint sets of proteins can be added up and then discarded
+    proteins: number of protein rows added
+    '''
+    def __init__(self, thresholds):
+        self.thresholds = numpy.asarray(thresholds, dtype=float)
+        n = len(self.thresholds)
+        self.proteins = 0
+        self.counta = numpy.zeros(n, dtype=numpy.int64)
+        self.precision = numpy.zeros(n)
+        self.recall = numpy.zeros(n)
+        #weighted by information accretion, None until weighted counts are added
+        self.wcounta = None
+        self.wprecision = None
+        self.wrecall = None
+        self.ru = None
+        self.mi = None
+
+    def add(self, counts):
+        '''
+        add the rows of a ProteinCounts on the same threshold grid
+        returns self
+        '''
+        self.proteins += len(counts.proteins)
+        predicted = counts.count > 0
+        self.counta += predicted.sum(axis=0)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            self.precision += numpy.where(predicted, counts.tp / counts.count, 0.0).sum(axis=0)
+            self.recall += (counts.tp / counts.ntrue[:, None]).sum(axis=0)
+        if counts.wtp is not None:
+            if self.wcounta is None:
+                n = len(self.thresholds)
+                self.wcounta = numpy.zeros(n, dtype=numpy.int64)
+                self.wprecision = numpy.zeros(n)
+                self.wrecall = numpy.zeros(n)
+                self.ru = numpy.zeros(n)
+                self.mi = numpy.zeros(n)
+            predicted = counts.wcount > 0
+            self.wcounta += predicted.sum(axis=0)
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                self.wprecision += numpy.where(predicted, counts.wtp / counts.wcount, 0.0).sum(axis=0)
+                self.wrecall += numpy.where(counts.wtrue[:, None] > 0, counts.wtp / counts.wtrue[:, None], 0.0).sum(axis=0)
+            self.ru += (counts.wtrue[:, None] - counts.wtp).sum(axis=0)
+            self.mi += (counts.wcount - counts.wtp).sum(axis=0)
+        return self
+
+    def precision_recall(self, nbench=None):
+        '''
+        see ProteinCounts.precision_recall
+        '''
+        if nbench is None:
+            nbench = self.proteins
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return (self.precision / self.counta, self.recall / nbench, self.counta)
+
+    def weighted_precision_recall(self, nbench=None):
+        '''
+        see ProteinCounts.weighted_precision_recall
+        '''
+        if nbench is None:
+            nbench = self.proteins
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return (self.wprecision / self.wcounta, self.wrecall / nbench, self.wcounta)
+
+    def fmax(self, nbench=None):
+        if nbench is None:
+            nbench = self.proteins
+        return self._best(self.precision_recall(nbench), nbench)
+
+    def weighted_fmax(self, nbench=None):
+        if nbench is None:
+            nbench = self.proteins
+        return self._best(self.weighted_precision_recall(nbench), nbench)
+
+    def _best(self, curve, nbench):
+        precision, recall, counta = curve
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            f = 2 * precision * recall / (precision + recall)
+        valid = numpy.isfinite(f)
+        if not valid.any():
+            return (precision.tolist(), recall.tolist(), 0.0, None, 0.0)
+        fmax = f[valid].max()
+        best = numpy.flatnonzero(valid & (f == fmax))[-1]
+        coverage = float(counta[best]) / nbench
+        return (precision.tolist(), recall.tolist(), float(fmax), float(self.thresholds[best]), coverage)
+
+    def smin(self, nbench=None, missing=0.0):
+        '''
+        see ProteinCounts.smin
+        '''
+        if nbench is None:
+            nbench = self.proteins
+        if nbench == 0:
+            return ([], [], None, None)
+        ru = (self.ru + missing) / nbench
+        mi = self.mi / nbench
+        s = numpy.sqrt(ru ** 2 + mi ** 2)
+        best = int(numpy.argmin(s))
+        return (ru.tolist(), mi.tolist(), float(s[best]), float(self.thresholds[best]))
+
+
+def count_predictions(predicted, true_terms, thresholds, ia=None):
+    '''
+    Build ProteinCounts from PrecREC.predicted in one pass
+    predicted: key: protein, value: None (not in benchmark) or {term: [confidence, True/False]}
+    true_terms: key: protein, value: set of propagated benchmark terms
+    ia: information accretion of every term index (see precrec.ia),
+    to also fill the weighted sums of the same pass
+    '''
+    thresholds = numpy.asarray(thresholds, dtype=float)
+    proteins = []
+    sizes = []
+    values = []
+    terms_seen = []
+    for prot in predicted:
+        terms = predicted[prot]
+        if terms is None:
+            continue
+        proteins.append(prot)
+        sizes.append(len(terms))
+        values.extend(terms.values())
+        if ia is not None:
+            terms_seen.extend(terms)
+    nrows = len(proteins)
+    rows = numpy.repeat(numpy.arange(nrows), sizes)
+    if values:
+        conf, truth = zip(*values)
+    else:
+        conf, truth = (), ()
+    conf = numpy.array(conf, dtype=float)
+    truth = numpy.array(truth, dtype=bool)
+    bins = numpy.searchsorted(thresholds, conf, side='right')
+    count = _cumulative(rows, bins, nrows, len(thresholds))
+    tp = _cumulative(rows[truth], bins[truth], nrows, len(thresholds))
+    counts = ProteinCounts(proteins, thresholds, tp, count, true_sizes(true_terms, proteins).astype(float))
+    if ia is not None:
+        weights = numpy.asarray(ia)[numpy.array(terms_seen, dtype=numpy.int64)]
+        counts.wcount = _cumulative(rows, bins, nrows, len(thresholds), weights)
+        counts.wtp = _cumulative(rows[truth], bins[truth], nrows, len(thresholds), weights[truth])
+        counts.wtrue = numpy.array([true_ia(term_array(true_terms, prot), ia) for prot in proteins], dtype=float)
+    return counts
+
+
+def true_ia(terms, ia):
+    '''
+    total information accretion of a set or array of term indices
+    summed in index order, so a set and its sorted array give the same float
+    '''
+    if len(terms) == 0:
+        return 0.0
+    return float(numpy.asarray(ia)[numpy.sort(numpy.fromiter(terms, dtype=numpy.int64))].sum())
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Information accretion (IA) of ontology terms, for weighted Fmax and Smin
+
+IA(t) = -log2 P(t | all parents of t), estimated from an annotation corpus
+as the number of proteins annotated with t over the number annotated with
+every parent of t. Annotations are propagated first, so roots get IA 0.
+
+Computing IA walks the whole corpus, so the table is cached next to the
+corpus file and keyed by the checksums of the ontology and the corpus.
+"""
+
+import hashlib
+import os
+import sys
+from collections import defaultdict
+import numpy
+from precrec.arrayfile import cached_paths, read_arrays, read_meta, write_cached
+from precrec.ontology import file_checksum
+
+IA_VERSION = 1
+
+
+def parent_lists(ontology):
+    '''
+    direct parents of every term, as lists of term indices
+    compiled ontologies keep them, for ontologies read from an ancestors file
+    they are the transitive reduction of the ancestor closure:
+    the ancestors that are not an ancestor of another ancestor
+    '''
+    if ontology.parents is not None:
+        offsets = ontology.parent_offsets.tolist()
+        parents = ontology.parents.tolist()
+        return [parents[offsets[i]:offsets[i+1]] for i in range(len(ontology))]
+    result = []
+    for i in range(len(ontology)):
+        ancestors = ontology.get_ancestors(i)
+        if len(ancestors) == 0:
+            result.append([])
+            continue
+        indirect = set()
+        for a in ancestors.tolist():
+            indirect.update(ontology.get_ancestors(a).tolist())
+        result.append([a for a in ancestors.tolist() if a not in indirect and a != i])
+    return result
+
+
+def read_annotations(corpus_path, ontology):
+    '''
+    corpus file format, as the benchmark files: protein <tab> GO term
+    returns the propagated term indices of every protein, as a list of sets
+    terms that are not in the ontology are skipped
+    '''
+    annotations = defaultdict(list)
+    with open(corpus_path) as corpus:
+        for inline in corpus:
+            fields = inline.strip().split('\t')
+            if len(fields) < 2:
+                continue
+            i = ontology.term_id(fields[1])
+            if i is not None:
+                annotations[fields[0]].append(i)
+    return [set(ontology.closure(ids).tolist()) for ids in annotations.values()]
+
+
+def information_accretion(ontology, annotations):
+    '''
+    annotations: propagated term indices of every protein, e.g. from read_annotations()
+    returns a float64 array, IA of every term index of the ontology
+    terms nobody is annotated with get IA 0
+    '''
+    parents = parent_lists(ontology)
+    children = defaultdict(list)
+    for i, ps in enumerate(parents):
+        for p in ps:
+            children[p].append(i)
+    #annotated: number of proteins annotated with the term
+    #context: number of proteins annotated with every parent of the term
+    annotated = numpy.zeros(len(ontology))
+    context = numpy.zeros(len(ontology))
+    for terms in annotations:
+        annotated[list(terms)] += 1
+        candidates = set()
+        for t in terms:
+            candidates.update(children.get(t, ()))
+        for c in candidates:
+            if all(p in terms for p in parents[c]):
+                context[c] += 1
+    ia = numpy.zeros(len(ontology))
+    has = (annotated > 0) & (context > 0)
+    ia[has] = numpy.log2(context[has] / annotated[has])
+    return ia
+
+
+def ontology_checksum(ontology):
+    '''
+    checksum of the OBO file of a compiled ontology,
+    else a digest of the term list and the ancestor closure
+    '''
+    if ontology.checksum is not None:
+        return ontology.checksum
+    digest = hashlib.sha1()
+    digest.update('\n'.join(ontology.terms).encode('utf-8'))
+    digest.update(numpy.ascontiguousarray(ontology.offsets, dtype=numpy.int64).tobytes())
+    digest.update(numpy.ascontiguousarray(ontology.ancestors, dtype=numpy.int32).tobytes())
+    return digest.hexdigest()
+
+
+def ia_path(corpus_path, key, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(corpus_path))
+    return os.path.join(cache_dir, '%s.%s.ia' % (os.path.basename(corpus_path), key[:16]))
+
+
+def load_ia(ontology, corpus_path, cache_dir=None):
+    '''
+    IA table of the ontology estimated from the corpus,
+    read from its cache file, or computed and cached if missing or stale
+    (in the user cache if the folder of the corpus cannot be written)
+    '''
+    onto_checksum = ontology_checksum(ontology)
+    corpus_checksum = file_checksum(corpus_path)
+    key = hashlib.sha1(('%s %s' % (onto_checksum, corpus_checksum)).encode('ascii')).hexdigest()
+    path = ia_path(corpus_path, key, cache_dir)
+    for cached in cached_paths(path):
+        if not os.path.isfile(cached):
+            continue
+        try:
+            meta = read_meta(cached)
+        except ValueError:
+            meta = {}
+        if (meta.get('version') == IA_VERSION and meta.get('ontology') == onto_checksum
+                and meta.get('corpus') == corpus_checksum):
+            return read_arrays(cached)[1]['ia']
+    sys.stderr.write("computing information accretion from %s into %s\n" % (corpus_path, path))
+    ia = information_accretion(ontology, read_annotations(corpus_path, ontology))
+    write_cached(path, [('ia', ia)],
+                 {'version': IA_VERSION, 'ontology': onto_checksum, 'corpus': corpus_checksum,
+                  'terms': len(ontology)})
+    return ia
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental re-evaluation of a submission as it or its benchmark changes
+
+Scoring a submission only needs, for every benchmark protein it predicts,
+the per-threshold counts of precrec.fmax.ProteinCounts. An array file per
+(submission, ontology, benchmark) keeps those rows, each with a digest of the
+protein's predictions and of its benchmark terms at the time it was scored.
+When the submission is resubmitted or new annotations arrive, only the
+proteins whose digests changed (or that are new to the benchmark or the
+submission) are propagated and counted again; the other rows are reused and
+Fmax is recomputed from the stored rows.
+
+Rows are kept in the order a full evaluation gives them, so the scores are
+exactly those of scoring from scratch. The stored rows are discarded when the
+ontology, the threshold grid or the IA table they were counted with changes.
+"""
+
+import hashlib
+import os
+import numpy
+from precrec.annotations import term_array
+from precrec.arrayfile import read_arrays, read_meta, write_arrays
+from precrec.fmax import ProteinCounts, ThresholdSums, count_predictions
+from precrec.ia import ontology_checksum
+from precrec.pooling import unpredicted_ia
+from precrec.propagate import label_predictions, propagate_confidences
+
+INCREMENTAL_VERSION = 1
+
+
+def _mix(x):
+    '''
+    splitmix64 finalizer of a uint64 array, wrapping around
+    '''
+    x = numpy.asarray(x, dtype=numpy.uint64)
+    with numpy.errstate(over='ignore'):
+        x = (x ^ (x >> numpy.uint64(30))) * numpy.uint64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> numpy.uint64(27))) * numpy.uint64(0x94d049bb133111eb)
+    return x ^ (x >> numpy.uint64(31))
+
+
+def _grouped_digests(groups, values):
+    '''
+    groups: group index of every value, values: uint64 digest of every value
+    returns (group indices, digest of the values of each group, in any order)
+    '''
+    if len(values) == 0:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.uint64)
+    order = numpy.argsort(groups, kind='stable')
+    groups = groups[order]
+    starts = numpy.flatnonzero(numpy.r_[True, groups[1:] != groups[:-1]])
+    with numpy.errstate(over='ignore'):
+        sums = numpy.add.reduceat(values[order], starts)
+        sizes = numpy.diff(numpy.r_[starts, len(groups)]).astype(numpy.uint64)
+        return groups[starts], _mix(sums + _mix(sizes))
+
+
+def _term_digest(term):
+    return int.from_bytes(hashlib.sha1(term.encode('utf-8')).digest()[:8], 'little')
+
+
+def prediction_digests(GoPred):
+    '''
+    key: protein, value: digest of its (term, confidence) predictions, in any order
+    '''
+    protein_ids, term_ids, confidences = GoPred.columns()
+    terms = numpy.array([_term_digest(t) for t in GoPred.terms], dtype=numpy.uint64)
+    cells = _mix(terms[term_ids] ^ _mix(confidences.astype(numpy.uint64) + numpy.uint64(1)))
+    proteins, digests = _grouped_digests(protein_ids, cells)
+    return dict(zip([GoPred.proteins[p] for p in proteins.tolist()], digests.tolist()))
+
+
+def truth_digests(true_terms, proteins):
+    '''
+    digest of the propagated benchmark term indices of each protein, as a uint64 array
+    '''
+    if not proteins:
+        return numpy.zeros(0, dtype=numpy.uint64)
+    arrays = [term_array(true_terms, p) for p in proteins]
+    groups = numpy.repeat(numpy.arange(len(proteins)), [len(a) for a in arrays])
+    terms = numpy.concatenate(arrays).astype(numpy.uint64)
+    found, digests = _grouped_digests(groups, _mix(terms + numpy.uint64(1)))
+    result = numpy.zeros(len(proteins), dtype=numpy.uint64)
+    result[found] = digests
+    return result
+
+
+def ia_checksum(ia):
+    if ia is None:
+        return None
+    return hashlib.sha1(numpy.ascontiguousarray(ia, dtype=float).tobytes()).hexdigest()
+
+
+class ProteinRows:
+    '''
+    Stored scoring contributions of one submission in one ontology, on one benchmark
+    proteins: the benchmark proteins the submission predicts, in row order
+    pred, true: uint64 digests of each protein's predictions and benchmark terms when it was scored
+    counted: False for the proteins whose predictions are all obsolete,
+    which only count towards countb
+    tp, count, ntrue, wtp, wcount, wtrue: as in ProteinCounts, zero for the rows not counted
+    '''
+    def __init__(self, proteins, pred, true, counted, tp, count, ntrue, wtp=None, wcount=None, wtrue=None):
+        self.proteins = proteins
+        self.pred = pred
+        self.true = true
+        self.counted = counted
+        self.tp = tp
+        self.count = count
+        self.ntrue = ntrue
+        self.wtp = wtp
+        self.wcount = wcount
+        self.wtrue = wtrue
+
+    def counts(self, thresholds):
+        '''
+        ProteinCounts of the counted rows
+        '''
+        keep = self.counted
+        proteins = [p for p, c in zip(self.proteins, keep.tolist()) if c]
+        weighted = [None, None, None] if self.wtp is None else [self.wtp[keep], self.wcount[keep], self.wtrue[keep]]
+        return ProteinCounts(proteins, thresholds, self.tp[keep], self.count[keep], self.ntrue[keep], *weighted)
+
+
+def _meta(ontology, thresholds, ia):
+    return {'version': INCREMENTAL_VERSION,
+            'ontology': ontology_checksum(ontology),
+            'thresholds': [float(t) for t in thresholds],
+            'ia': ia_checksum(ia)}
+
+
+def load_rows(path, meta):
+    '''
+    the ProteinRows stored at path, None if missing or counted with another
+    ontology, threshold grid or IA table than meta describes
+    '''
+    if not os.path.isfile(path):
+        return None
+    try:
+        stored = read_meta(path)
+    except ValueError:
+        return None
+    if any(stored.get(key) != meta[key] for key in meta):
+        return None
+    arrays = read_arrays(path)[1]
+    weighted = [arrays.get('wtp'), arrays.get('wcount'), arrays.get('wtrue')]
+    return ProteinRows(arrays['proteins'].astype(str).tolist(), arrays['pred'], arrays['true'], arrays['counted'],
+                       arrays['tp'], arrays['count'], arrays['ntrue'], *weighted)
+
+
+def save_rows(path, rows, meta):
+    width = max([len(p) for p in rows.proteins] + [1])
+    arrays = [('proteins', numpy.array(rows.proteins, dtype='S%d' % width)),
+              ('pred', rows.pred), ('true', rows.true), ('counted', rows.counted),
+              ('tp', rows.tp), ('count', rows.count), ('ntrue', rows.ntrue)]
+    if rows.wtp is not None:
+        arrays += [('wtp', rows.wtp), ('wcount', rows.wcount), ('wtrue', rows.wtrue)]
+    write_arrays(path, arrays, meta)
+
+
+class IncrementalScore:
+    '''
+    Scores of one submission in one ontology, as PrecREC gives them, from its ProteinRows
+    exist and countb are as in PrecREC
+    rescored: number of proteins propagated and counted by this evaluation,
+    the others were reused from the store
+    '''
+    def __init__(self, benchmark, rows, thresholds, exist, rescored, ia=None):
+        self.true_terms = benchmark.true_terms
+        self.rows = rows
+        self.exist = exist
+        self.countb = len(rows.proteins)
+        self.rescored = rescored
+        self.ia = ia
+        self.counts = rows.counts(thresholds)
+        self.sums = ThresholdSums(thresholds).add(self.counts)
+
+    def nbench(self, mode):
+        if mode == 'full':
+            return len(self.true_terms)
+        elif mode == 'partial':
+            return self.countb
+        raise ValueError('Please enter a valid mode: full, partial')
+
+    def Fmax_output(self, mode='partial'):
+        '''
+        (precision, recall, fmax, threshold, coverage), as PrecREC.Fmax_output
+        '''
+        return self.sums.fmax(self.nbench(mode))
+
+    def weighted_output(self, mode='partial'):
+        '''
+        (fmax, weighted fmax, smin), as PrecREC.weighted_output
+        '''
+        nbench = self.nbench(mode)
+        missing = 0.0
+        if mode == 'full':
+            missing = unpredicted_ia(self.true_terms, self.counts.proteins, self.ia)
+        return (self.sums.fmax(nbench), self.sums.weighted_fmax(nbench), self.sums.smin(nbench, missing))
+
+
+def score_incremental(path, GoPred, benchmark, thresholds, ia=None):
+    '''
+    scores the predictions of one ontology on the propagated benchmark, reusing the rows
+    stored at path for the proteins whose predictions and benchmark terms are unchanged,
+    and stores the updated rows there
+    returns an IncrementalScore
+    '''
+    thresholds = numpy.asarray(thresholds, dtype=float)
+    ontology = benchmark.ontology
+    true_terms = benchmark.true_terms
+    meta = _meta(ontology, thresholds, ia)
+    stored = load_rows(path, meta)
+    digests = prediction_digests(GoPred)
+    #GOPred protein order, the order propagation gives the rows
+    proteins = [p for p in digests if true_terms.get(p)]
+    pred = numpy.array([digests[p] for p in proteins], dtype=numpy.uint64)
+    true = truth_digests(true_terms, proteins)
+    index = {}
+    if stored is not None:
+        index = dict((p, i) for i, p in enumerate(stored.proteins))
+    #row of every protein in the store, -1 to score again
+    old = numpy.array([index.get(p, -1) for p in proteins], dtype=numpy.int64)
+    reuse = old >= 0
+    if reuse.any():
+        reuse[reuse] = (stored.pred[old[reuse]] == pred[reuse]) & (stored.true[old[reuse]] == true[reuse])
+    changed = [p for p, r in zip(proteins, reuse.tolist()) if not r]
+
+    nthres = len(thresholds)
+    n = len(proteins)
+    weighted = ia is not None
+    counted = numpy.zeros(n, dtype=bool)
+    tp = numpy.zeros((n, nthres), dtype=numpy.int64)
+    count = numpy.zeros((n, nthres), dtype=numpy.int64)
+    ntrue = numpy.zeros(n)
+    wtp = numpy.zeros((n, nthres)) if weighted else None
+    wcount = numpy.zeros((n, nthres)) if weighted else None
+    wtrue = numpy.zeros(n) if weighted else None
+    if reuse.any():
+        rows = old[reuse]
+        counted[reuse] = stored.counted[rows]
+        tp[reuse] = stored.tp[rows]
+        count[reuse] = stored.count[rows]
+        ntrue[reuse] = stored.ntrue[rows]
+        if weighted:
+            wtp[reuse] = stored.wtp[rows]
+            wcount[reuse] = stored.wcount[rows]
+            wtrue[reuse] = stored.wtrue[rows]
+    if changed:
+        #only the changed proteins are in the benchmark the propagation is labelled with
+        subset = dict((p, set(term_array(true_terms, p).tolist())) for p in changed)
+        predicted = label_predictions(propagate_confidences(GoPred, ontology, subset), subset)[0]
+        fresh = count_predictions(predicted, subset, thresholds, ia)
+        position = dict((p, i) for i, p in enumerate(proteins))
+        rows = numpy.array([position[p] for p in fresh.proteins], dtype=numpy.int64)
+        counted[rows] = True
+        tp[rows] = fresh.tp
+        count[rows] = fresh.count
+        ntrue[rows] = fresh.ntrue
+        if weighted:
+            wtp[rows] = fresh.wtp
+            wcount[rows] = fresh.wcount
+            wtrue[rows] = fresh.wtrue
+    rows = ProteinRows(proteins, pred, true, counted, tp, count, ntrue, wtp, wcount, wtrue)
+    if changed or stored is None or len(stored.proteins) != n:
+        save_rows(path, rows, meta)
+    return IncrementalScore(benchmark, rows, thresholds, len(GoPred) > 0, len(changed), ia)
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+One way in for prediction files: folders, zip, tar(.gz) and gz archives
+
+iter_members() goes through the prediction files of a submission without
+extracting anything, and opens each of them as text, decoded in large chunks.
+map_members() hands several members to a parser in parallel. Zip members and
+plain files are opened by the worker processes themselves; tar archives can
+only be read front to back, so they are streamed once by the calling process
+and their members handed to the workers as bytes. In a single process,
+prefetch() reads and decompresses the next members in a thread while the
+current one is parsed.
+"""
+
+import gzip
+import io
+import multiprocessing
+import os
+import queue
+import tarfile
+import threading
+import zipfile
+
+#bytes decoded at once
+CHUNK_SIZE = 1 << 20
+
+
+class Member:
+    '''
+    one file of a submission
+    kind: 'file', 'gz', 'zip' or 'tar'
+    path: the file, or the archive holding it
+    name: the path of a file, the member name inside an archive
+    data: the member's bytes, only set while handing tar members to workers
+    '''
+    def __init__(self, kind, path, name):
+        self.kind = kind
+        self.path = path
+        self.name = name
+        self.data = None
+
+    def __repr__(self):
+        return 'Member(%r, %r, %r)' % (self.kind, self.path, self.name)
+
+
+class TextHandle:
+    '''
+    iterates over the decoded lines of a member
+    name is the member name, which GOPred.read() parses team, model and taxon from
+    (tar and gzip file objects would report the archive instead)
+    '''
+    def __init__(self, raw, name, closing=()):
+        self.text = io.TextIOWrapper(io.BufferedReader(raw, CHUNK_SIZE), encoding='utf-8')
+        self.text._CHUNK_SIZE = CHUNK_SIZE
+        self.name = name
+        #archives to close with the member
+        self.closing = closing
+
+    def __iter__(self):
+        return iter(self.text)
+
+    def read(self):
+        return self.text.read()
+
+    def close(self):
+        self.text.close()
+        for obj in self.closing:
+            obj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _RawBytes(io.RawIOBase):
+    '''
+    raw stream over a file object that only offers read(), e.g. a tar or zip member
+    '''
+    def __init__(self, handle):
+        self.handle = handle
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        data = self.handle.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.handle.close()
+        io.RawIOBase.close(self)
+
+
+def members(path, accept=None):
+    '''
+    generates a Member for every file of a folder (not recursive, archives in it are opened),
+    a zip, tar(.gz) or gz archive, or a single file,
+    in name order (tar members in archive order)
+    accept(name) filters the files, by default every file is taken
+    '''
+    if os.path.isdir(path):
+        for filename in sorted(os.listdir(path)):
+            full = os.path.join(path, filename)
+            if os.path.isfile(full):
+                for member in members(full, accept):
+                    yield member
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as obj:
+            names = sorted(i.filename for i in obj.infolist() if not i.is_dir())
+        for name in names:
+            if accept is None or accept(name):
+                yield Member('zip', path, name)
+    elif tarfile.is_tarfile(path):
+        for member, _ in _tar_members(path, accept):
+            yield member
+    elif accept is None or accept(path):
+        if path.endswith('.gz'):
+            yield Member('gz', path, path)
+        else:
+            yield Member('file', path, path)
+
+
+def _tar_members(path, accept):
+    '''
+    streams a tar archive once, in archive order
+    generates (Member, opener) for every accepted file
+    '''
+    with tarfile.open(path, 'r|*') as obj:
+        for info in obj:
+            if info.isfile() and (accept is None or accept(info.name)):
+                yield (Member('tar', path, info.name),
+                       lambda info=info: TextHandle(_RawBytes(obj.extractfile(info)), info.name))
+
+
+def iter_members(path, accept=None):
+    '''
+    generates (Member, opener) for every member of path, see members()
+    opener() returns a TextHandle over the member; members of a tar archive
+    are streamed, so their opener is only valid until the next member
+    '''
+    if os.path.isdir(path):
+        for filename in sorted(os.listdir(path)):
+            full = os.path.join(path, filename)
+            if os.path.isfile(full):
+                for found in iter_members(full, accept):
+                    yield found
+    elif not zipfile.is_zipfile(path) and tarfile.is_tarfile(path):
+        for found in _tar_members(path, accept):
+            yield found
+    else:
+        for member in members(path, accept):
+            yield member, lambda member=member: open_member(member)
+
+
+def open_member(member):
+    '''
+    a TextHandle over the decoded content of a member
+    a tar member is looked up by name, which reads a compressed archive
+    up to the member; iter_members() streams whole archives instead
+    '''
+    if member.data is not None:
+        return TextHandle(io.BytesIO(member.data), member.name)
+    if member.kind == 'file':
+        return TextHandle(io.FileIO(member.path), member.name)
+    if member.kind == 'gz':
+        return TextHandle(_RawBytes(gzip.open(member.path, 'rb')), member.name)
+    if member.kind == 'zip':
+        obj = zipfile.ZipFile(member.path)
+        return TextHandle(_RawBytes(obj.open(member.name, 'r')), member.name, (obj,))
+    if member.kind == 'tar':
+        obj = tarfile.open(member.path)
+        return TextHandle(_RawBytes(obj.extractfile(member.name)), member.name, (obj,))
+    raise ValueError('unknown member kind %s' % member.kind)
+
+
+def prefetch(items, load, depth=2):
+    '''
+    generates (item, load(item)) for every item, in order, with load() called by a
+    reader thread on up to depth items ahead of the consumer
+    Reading and decompressing release the GIL, so the next items are loaded while
+    the consumer works on this one. At most depth loaded items wait in memory.
+    items is also iterated by the reader thread; an exception of load() or of
+    items is raised by the generator where the item would have been
+    depth 0 loads every item when it is needed
+    '''
+    if depth <= 0:
+        for item in items:
+            yield item, load(item)
+        return
+    loaded = queue.Queue(depth)
+    stop = threading.Event()
+
+    def put(entry):
+        #gives up when the consumer is gone
+        while not stop.is_set():
+            try:
+                loaded.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for item in items:
+                if not put((item, load(item), None)):
+                    return
+        except Exception as e:
+            put((None, None, e))
+            return
+        put(None)
+
+    thread = threading.Thread(target=reader, name='prefetch')
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            entry = loaded.get()
+            if entry is None:
+                return
+            item, value, error = entry
+            if error is not None:
+                raise error
+            yield item, value
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _read_found(found):
+    '''
+    the decompressed bytes of a (Member, opener) of iter_members()
+    '''
+    member, opener = found
+    with opener() as handle:
+        return handle.text.buffer.read()
+
+
+def _apply(func, member):
+    with open_member(member) as handle:
+        return func(handle)
+
+
+def map_members(path, func, jobs=1, accept=None):
+    '''
+    generates (member, func(handle)) for every member of path, see members(),
+    in member order
+    func is called with an open TextHandle; with jobs > 1 it runs in worker
+    processes, so it and its result must be picklable (a module-level function
+    or a functools.partial of one)
+    at most 2*jobs members are in flight at a time
+    with jobs <= 1 func runs in this process, while the next 2 members are read
+    and decompressed, see prefetch()
+    '''
+    if jobs <= 1:
+        for (member, _), data in prefetch(iter_members(path, accept), _read_found):
+            with TextHandle(io.BytesIO(data), member.name) as handle:
+                yield member, func(handle)
+        return
+    pool = multiprocessing.get_context('fork').Pool(jobs)
+    try:
+        pending = []
+        for member, opener in iter_members(path, accept):
+            task = Member(member.kind, member.path, member.name)
+            if member.kind == 'tar':
+                #the task holds the bytes until a worker picks it up
+                with opener() as handle:
+                    task.data = handle.text.buffer.read()
+            pending.append((member, pool.apply_async(_apply, (func, task))))
+            if len(pending) >= 2 * jobs:
+                done, result = pending.pop(0)
+                yield done, result.get()
+        for done, result in pending:
+            yield done, result.get()
+    finally:
+        pool.terminate()
+        pool.join()
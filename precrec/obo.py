@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal OBO reader used to compile the ontology artifact
+
+Only [Term] stanzas are read, and only the fields the assessment needs:
+id, namespace, is_a, part_of relationships and is_obsolete.
+"""
+
+
+class OboTerm:
+    def __init__(self, term_id):
+        self.id = term_id
+        self.namespace = None
+        self.parents = []
+        self.obsolete = False
+
+
+def read_obo(handle):
+    '''
+    handle is an open OBO file
+    returns a list of OboTerm, in file order
+    '''
+    terms = []
+    current = None
+    for inline in handle:
+        inline = inline.strip()
+        if inline.startswith('['):
+            current = None
+            if inline == '[Term]':
+                current = OboTerm(None)
+                terms.append(current)
+            continue
+        if current is None or ':' not in inline:
+            continue
+        tag, value = inline.split(':', 1)
+        #drop trailing modifiers and comments: is_a: GO:0008150 ! biological_process
+        value = value.split('!')[0].strip()
+        if tag == 'id':
+            current.id = value
+        elif tag == 'namespace':
+            current.namespace = value
+        elif tag == 'is_a':
+            current.parents.append(value.split()[0])
+        elif tag == 'relationship':
+            fields = value.split()
+            if len(fields) >= 2 and fields[0] == 'part_of':
+                current.parents.append(fields[1])
+        elif tag == 'is_obsolete':
+            current.obsolete = value == 'true'
+    return [t for t in terms if t.id is not None]
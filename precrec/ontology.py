@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Integer-interned ontology with the ancestor closure stored in CSR form
+
+GO IDs are mapped to dense integers 0..n-1. The ancestors of term i are
+ancestors[offsets[i]:offsets[i+1]], sorted, so an ancestor lookup is an
+array slice instead of a hash lookup on a set of strings.
+
+An ontology is either read from a *_ancestors_*.txt file, or compiled once
+from the OBO file into a binary artifact (see compile_ontology) that later
+runs map into memory with load_ontology.
+"""
+
+import hashlib
+import os
+import sys
+import numpy
+from precrec.obo import read_obo
+from precrec.arrayfile import cached_paths, read_arrays, read_meta, write_cached
+
+#Terms that legitimately have no ancestors
+#anything else without ancestors is treated as obsolete
+ROOT_TERMS = (u'GO:0003674', u'GO:0008150', u'GO:0005575')
+
+#namespace codes, in the order of precrec_main.get_namespace_index
+ONTOLOGIES = ['bpo', 'mfo', 'cco']
+NAMESPACES = ['biological_process', 'molecular_function', 'cellular_component']
+NO_NAMESPACE = 255
+
+ARTIFACT_VERSION = 1
+
+
+class Ontology:
+    '''
+    terms: list of GO IDs, terms[i] is the term with index i
+    index: key: GO ID, value: term index
+    offsets: int64 array of length len(terms)+1
+    ancestors: int32 array, concatenation of the sorted ancestors of every term
+    roots: set of term indices that are roots
+    namespaces: uint8 array of namespace codes (index into ONTOLOGIES), None if unknown
+    checksum: checksum of the OBO file a compiled ontology was built from
+    '''
+    def __init__(self, terms, offsets, ancestors, roots=(), namespaces=None, checksum=None):
+        self.terms = terms
+        self.index = dict((term, i) for i, term in enumerate(terms))
+        self.offsets = offsets
+        self.ancestors = ancestors
+        self.roots = set(roots)
+        self.namespaces = namespaces
+        self.checksum = checksum
+        #direct parents in CSR form, only kept by compiled ontologies
+        self.parent_offsets = None
+        self.parents = None
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self.index
+
+    def term_id(self, term):
+        '''
+        returns the index of a GO ID, None if it is not in the ontology
+        '''
+        return self.index.get(term)
+
+    def get_ancestors(self, i):
+        '''
+        ancestors of term index i, as a sorted int32 array
+        '''
+        return self.ancestors[self.offsets[i]:self.offsets[i+1]]
+
+    def namespace(self, term):
+        '''
+        ontology of a GO ID ('bpo', 'mfo' or 'cco')
+        None if the term is not in the ontology or has no GO namespace
+        '''
+        i = self.index.get(term)
+        if i is None or self.namespaces is None:
+            return None
+        code = self.namespaces[i]
+        if code == NO_NAMESPACE:
+            return None
+        return ONTOLOGIES[code]
+
+    def is_obsolete(self, i):
+        '''
+        a term without ancestors that is not a root
+        '''
+        return self.offsets[i] == self.offsets[i+1] and i not in self.roots
+
+    def closure(self, ids):
+        '''
+        sorted unique array of the term indices in ids and all their ancestors
+        '''
+        ids = numpy.asarray(ids, dtype=numpy.int32)
+        parts = [ids]
+        for i in ids:
+            parts.append(self.ancestors[self.offsets[i]:self.offsets[i+1]])
+        return numpy.unique(numpy.concatenate(parts))
+
+
+def read_ancestors(ancestor_path, roots=ROOT_TERMS):
+    '''
+    Read GO ancestors file generated with go_ontology_ancestors_split_write()
+    File format:
+    go_term <tab> ancestor_1,ancestor_2,..,ancestor_n
+    Terms that only appear as ancestors get an empty closure
+    '''
+    index = {}
+    terms = []
+
+    def intern(term):
+        i = index.get(term)
+        if i is None:
+            i = index[term] = len(terms)
+            terms.append(term)
+        return i
+
+    closure = {}
+    with open(ancestor_path) as ancestors_input:
+        for inline in ancestors_input:
+            inrec = inline.strip().split('\t')
+            term = intern(inrec[0])
+            if len(inrec) == 1 or inrec[1] == '':
+                closure[term] = ()
+            else:
+                closure[term] = sorted(set(intern(a) for a in inrec[1].split(',')))
+    sizes = numpy.zeros(len(terms), dtype=numpy.int64)
+    for term in closure:
+        sizes[term] = len(closure[term])
+    offsets = numpy.zeros(len(terms) + 1, dtype=numpy.int64)
+    numpy.cumsum(sizes, out=offsets[1:])
+    ancestors = numpy.empty(offsets[-1], dtype=numpy.int32)
+    for term in closure:
+        ancestors[offsets[term]:offsets[term+1]] = closure[term]
+    return Ontology(terms, offsets, ancestors, [index[r] for r in roots if r in index])
+
+
+def file_checksum(path):
+    '''
+    sha1 of a file, read in 1MB blocks
+    '''
+    digest = hashlib.sha1()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _closure(terms, index):
+    '''
+    ancestor closure over is_a and part_of, as a list of sorted index lists
+    '''
+    parents = [sorted(set(index[p] for p in t.parents if p in index)) for t in terms]
+    closure = [None] * len(terms)
+    for start in range(len(terms)):
+        if closure[start] is not None:
+            continue
+        #iterative depth-first search, parents are finished before their children
+        stack = [start]
+        while stack:
+            i = stack[-1]
+            pending = [p for p in parents[i] if closure[p] is None]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if closure[i] is not None:
+                continue
+            ancestors = set(parents[i])
+            for p in parents[i]:
+                ancestors.update(closure[p])
+            closure[i] = sorted(ancestors)
+    return parents, closure
+
+
+def _csr(rows):
+    offsets = numpy.zeros(len(rows) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(r) for r in rows], out=offsets[1:])
+    values = numpy.fromiter((v for r in rows for v in r), dtype=numpy.int32, count=offsets[-1])
+    return offsets, values
+
+
+def compile_ontology(obo_path, path, checksum=None):
+    '''
+    Read the OBO file once and write one binary artifact with
+    the term index, namespace codes, roots, parents and the ancestor closure
+    Returns the compiled Ontology, mapped from the artifact, or kept in memory
+    if the artifact could be written neither at path nor in the user cache
+    '''
+    if checksum is None:
+        checksum = file_checksum(obo_path)
+    with open(obo_path) as obo_input:
+        obo_terms = read_obo(obo_input)
+    terms = [t.id for t in obo_terms]
+    index = dict((term, i) for i, term in enumerate(terms))
+    parents, closure = _closure(obo_terms, index)
+    namespaces = numpy.array([NAMESPACES.index(t.namespace) if t.namespace in NAMESPACES else NO_NAMESPACE
+                              for t in obo_terms], dtype=numpy.uint8)
+    roots = numpy.array([i for i, t in enumerate(obo_terms) if not t.obsolete and not parents[i]],
+                        dtype=numpy.int32)
+    offsets, ancestors = _csr(closure)
+    parent_offsets, parent_values = _csr(parents)
+    width = max([len(t) for t in terms] + [1])
+    arrays = [('terms', numpy.array(terms, dtype='S%d' % width)),
+              ('namespaces', namespaces),
+              ('roots', roots),
+              ('offsets', offsets),
+              ('ancestors', ancestors),
+              ('parent_offsets', parent_offsets),
+              ('parents', parent_values)]
+    meta = {'version': ARTIFACT_VERSION, 'checksum': checksum, 'obo': os.path.basename(obo_path)}
+    written = write_cached(path, arrays, meta)
+    if written is None:
+        sys.stderr.write("%s is not cached, it is compiled again in every run\n" % obo_path)
+        return _from_arrays(meta, dict(arrays))
+    return _from_artifact(written)
+
+
+def _from_artifact(path):
+    return _from_arrays(*read_arrays(path))
+
+
+def _from_arrays(meta, arrays):
+    terms = arrays['terms'].astype(str).tolist()
+    onto = Ontology(terms, arrays['offsets'], arrays['ancestors'],
+                    arrays['roots'].tolist(), arrays['namespaces'], meta['checksum'])
+    onto.parent_offsets = arrays['parent_offsets']
+    onto.parents = arrays['parents']
+    return onto
+
+
+def artifact_path(obo_path, checksum, cache_dir=None):
+    '''
+    the artifact is keyed by the checksum of the OBO file,
+    so editing or replacing the OBO file gives a new artifact
+    '''
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(obo_path))
+    return os.path.join(cache_dir, '%s.%s.ontology' % (os.path.basename(obo_path), checksum[:16]))
+
+
+def _current(path, checksum):
+    if not os.path.isfile(path):
+        return False
+    try:
+        meta = read_meta(path)
+    except ValueError:
+        return False
+    return meta.get('checksum') == checksum and meta.get('version') == ARTIFACT_VERSION
+
+
+#key: (OBO path, cache folder), value: ((size, mtime) of the OBO file, Ontology)
+#the ontologies loaded by this process, see load_ontology
+_loaded = {}
+
+
+def load_ontology(obo_path, cache_dir=None, reuse=True):
+    '''
+    Memory-map the compiled artifact of an OBO file,
+    compiling it first if it is missing or stale
+    The artifact is in cache_dir, by default next to the OBO file,
+    or in the user cache if that folder cannot be written, see precrec.arrayfile.write_cached
+    reuse: return the Ontology this process loaded last from the same OBO file
+    while its size and modification time are unchanged, without checksumming it again
+    '''
+    key = (os.path.abspath(obo_path), cache_dir)
+    stat = os.stat(obo_path)
+    stamp = (stat.st_size, stat.st_mtime)
+    loaded = _loaded.get(key)
+    if reuse and loaded is not None and loaded[0] == stamp:
+        return loaded[1]
+    checksum = file_checksum(obo_path)
+    path = artifact_path(obo_path, checksum, cache_dir)
+    onto = None
+    for cached in cached_paths(path):
+        if _current(cached, checksum):
+            onto = _from_artifact(cached)
+            break
+    if onto is None:
+        sys.stderr.write("compiling %s into %s\n" % (obo_path, path))
+        onto = compile_ontology(obo_path, path, checksum)
+    _loaded[key] = (stamp, onto)
+    return onto
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Precision-recall plots, kept off the scoring path
+
+A Curve holds what a figure needs from a result. The smoothed curve (the
+points no earlier point beats in both precision and recall) is computed once
+per curve in O(n log n). matplotlib and seaborn are only imported by the
+process that renders, and Plotter renders in background worker processes,
+or not at all.
+"""
+
+import multiprocessing
+import os
+
+
+class Curve:
+    '''
+    precision, recall: lists over the threshold grid
+    fmax, threshold: the best F-measure and the threshold giving it
+    smooth: plot only the pareto frontier, see pareto_frontier()
+    '''
+    def __init__(self, author, model, taxon, ontology, mode, TYPE, precision, recall, fmax, threshold, smooth=False):
+        self.author = author
+        self.model = model
+        self.taxon = taxon
+        self.ontology = ontology
+        self.mode = mode
+        self.TYPE = TYPE
+        self.precision = list(precision)
+        self.recall = list(recall)
+        self.fmax = fmax
+        self.threshold = threshold
+        #the fmax point is marked on the unsmoothed curve
+        best = best_index(self.precision, self.recall)
+        self.best = None if best is None else (self.recall[best], self.precision[best])
+        if smooth:
+            self.precision, self.recall = pareto_frontier(self.precision, self.recall)
+
+    @classmethod
+    def from_result(cls, result, smooth=False):
+        '''
+        smooth: 'Y'/'N' as on the command line, or a boolean
+        '''
+        return cls(result.author, result.model, result.taxon, result.ontology, result.mode, result.TYPE,
+                   result.precision, result.recall, result.opt, result.thres, smooth in ('Y', True))
+
+    def label(self):
+        return self.author + ': fmax=' + '%.3f' % self.fmax
+
+
+def best_index(precision, recall):
+    '''
+    the last point of the curve with the largest F-measure, where the fmax marker goes
+    None if no point has one
+    '''
+    best = None
+    fmax = None
+    for i, (p, r) in enumerate(zip(precision, recall)):
+        if p + r > 0:
+            f = 2 * p * r / (p + r)
+            if fmax is None or f >= fmax:
+                best = i
+                fmax = f
+    return best
+
+
+def pareto_frontier(precision, recall):
+    '''
+    removes a p-r pair if an earlier p-r pair is greater in both precision and recall
+    returns [precision, recall] of the pairs kept, in order
+    For every point, a Fenwick tree over the recall ranks of the earlier points
+    gives the largest earlier precision among strictly larger recalls
+    Pairs with a NaN value compare False both ways, so they are kept and never remove others
+    '''
+    def valid(p, r):
+        return p == p and r == r
+
+    #rank 1 is the largest recall, so strictly larger recalls are a prefix
+    recalls = sorted(set(r for p, r in zip(precision, recall) if valid(p, r)), reverse=True)
+    rank = dict((r, i + 1) for i, r in enumerate(recalls))
+    tree = [float('-inf')] * (len(recalls) + 1)
+
+    def best_before(k):
+        #largest precision among ranks 1..k
+        found = float('-inf')
+        while k > 0:
+            found = max(found, tree[k])
+            k -= k & -k
+        return found
+
+    def insert(k, p):
+        while k < len(tree):
+            if p > tree[k]:
+                tree[k] = p
+            k += k & -k
+
+    kept_precision = []
+    kept_recall = []
+    for p, r in zip(precision, recall):
+        if not valid(p, r):
+            kept_precision.append(p)
+            kept_recall.append(r)
+            continue
+        if not best_before(rank[r] - 1) > p:
+            kept_precision.append(p)
+            kept_recall.append(r)
+        insert(rank[r], p)
+    return [kept_precision, kept_recall]
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('pdf')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _finish(plt, title, figurename):
+    import numpy
+    plt.axis([0, 1, 0, 1])
+    plt.yticks(numpy.arange(0, 1, 0.1))
+    plt.xlabel('Recall')
+    plt.ylabel('Precision')
+    plt.legend(loc='best')
+    plt.title(title)
+    plt.savefig(figurename, dpi=200)
+    plt.close()
+
+
+def plot_single(curve, folder='./plots/'):
+    '''
+    one curve, recall on the x-axis, the fmax point marked
+    '''
+    plt = _pyplot()
+    ax = plt.subplot()
+    ax.plot(curve.recall, curve.precision, '-g', label=curve.label())
+    if curve.best is not None:
+        ax.plot(curve.best[0], curve.best[1], 'gD')
+    figuretitle = curve.author+" "+str(curve.model)+" "+str(curve.taxon)+ " " + curve.ontology+' '+ 'mode:'+curve.mode+' '+'type:'+curve.TYPE
+    figurename = os.path.join(folder, curve.author+"_"+str(curve.model)+"_"+str(curve.taxon)+ "_" + curve.ontology+'_'+ curve.mode+'_'+curve.TYPE+'.png')
+    _finish(plt, figuretitle, figurename)
+
+
+def plot_multiple(title, curves, folder='./plots/'):
+    '''
+    several curves on one figure
+    '''
+    plt = _pyplot()
+    import seaborn as sns
+    colors = sns.color_palette("Set2", len(curves)).as_hex()
+    ax = plt.subplot()
+    for color, curve in zip(colors, curves):
+        ax.plot(curve.recall, curve.precision, '-', color=color, label=curve.label())
+        if curve.best is not None:
+            ax.plot(curve.best[0], curve.best[1], 'o', color=color)
+    if title == None:
+        figurename = os.path.join(folder, 'Combined_plot.png')
+    else:
+        figurename = os.path.join(folder, title+'.png')
+    _finish(plt, title, figurename)
+
+
+class Plotter:
+    '''
+    renders plots in jobs background processes
+    jobs 0 renders in the calling process, None skips plotting altogether
+    close() waits for every plot and raises the first rendering error
+    '''
+    def __init__(self, jobs=1):
+        self.jobs = jobs
+        self.pool = None
+        self.pending = []
+        if jobs:
+            self.pool = multiprocessing.get_context('fork').Pool(jobs)
+
+    def _submit(self, func, args):
+        if self.jobs is None:
+            return
+        if self.pool is None:
+            func(*args)
+        else:
+            self.pending.append(self.pool.apply_async(func, args))
+
+    def single(self, curve, folder='./plots/'):
+        self._submit(plot_single, (curve, folder))
+
+    def multiple(self, title, curves, folder='./plots/'):
+        self._submit(plot_multiple, (title, curves, folder))
+
+    def close(self):
+        if self.pool is None:
+            return
+        self.pool.close()
+        try:
+            for task in self.pending:
+                task.get()
+        finally:
+            self.pool.join()
+            self.pending = []
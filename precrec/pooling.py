@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Scores of a model pooled over the benchmarks of several taxa
+
+A team submits one file per taxon, and each file is scored on its taxon's
+benchmark. CAFA headline numbers pool the benchmark proteins of all taxa
+instead. Fmax, weighted Fmax and Smin only need sums over the proteins
+(see precrec.fmax.ThresholdSums), and the proteins of different taxa are
+distinct, so the pooled scores of any set of taxa are sums of the per-taxon
+ProteinCounts kept from the per-file evaluation: no prediction is read or
+propagated again.
+"""
+
+from precrec.annotations import term_array
+from precrec.fmax import ThresholdSums, true_ia
+
+
+def unpredicted_ia(true_terms, proteins, ia):
+    '''
+    total information accretion of the benchmark terms of the proteins not in proteins,
+    the remaining uncertainty full mode adds for them
+    '''
+    proteins = set(proteins)
+    return sum(true_ia(term_array(true_terms, p), ia) for p in true_terms if p not in proteins)
+
+
+class TaxonScore:
+    '''
+    What one prediction file scored on one taxon's benchmark adds to pooled scores
+    counts: its ProteinCounts, None if it predicts nothing in the ontology
+    nbench: number of benchmark proteins, for full mode
+    countb: number of benchmark proteins predicted, for partial mode
+    missing: information accretion of the benchmark terms of the proteins not predicted,
+    for full-mode Smin (0 without IA)
+    '''
+    def __init__(self, taxon, counts, nbench, countb, missing=0.0):
+        self.taxon = taxon
+        self.counts = counts
+        self.nbench = nbench
+        self.countb = countb
+        self.missing = missing
+
+    @classmethod
+    def unpredicted(cls, taxon, true_terms, ia=None):
+        '''
+        a taxon the model has no prediction file for: its benchmark proteins
+        still count in full mode
+        '''
+        missing = unpredicted_ia(true_terms, (), ia) if ia is not None else 0.0
+        return cls(taxon, None, len(true_terms), 0, missing)
+
+
+class PooledScore:
+    '''
+    Scores of one model over the TaxonScores of several taxa, in one ontology
+    thresholds: the threshold grid of the counts
+    exist is as in PrecREC
+    '''
+    def __init__(self, scores, thresholds):
+        self.taxa = [s.taxon for s in scores]
+        self.sums = ThresholdSums(thresholds)
+        self.exist = False
+        self.full = 0
+        self.countb = 0
+        self.missing = 0.0
+        for s in scores:
+            self.full += s.nbench
+            self.countb += s.countb
+            self.missing += s.missing
+            if s.counts is not None:
+                self.exist = True
+                self.sums.add(s.counts)
+
+    def nbench(self, mode):
+        if mode == 'full':
+            return self.full
+        elif mode == 'partial':
+            return self.countb
+        raise ValueError('Please enter a valid mode: full, partial')
+
+    def Fmax_output(self, mode='partial'):
+        '''
+        (precision, recall, fmax, threshold, coverage), as PrecREC.Fmax_output
+        '''
+        return self.sums.fmax(self.nbench(mode))
+
+    def weighted_output(self, mode='partial'):
+        '''
+        (fmax, weighted fmax, smin), as PrecREC.weighted_output
+        '''
+        nbench = self.nbench(mode)
+        missing = self.missing if mode == 'full' else 0.0
+        return (self.sums.fmax(nbench), self.sums.weighted_fmax(nbench), self.sums.smin(nbench, missing))
+
+
+def pool(scores, thresholds, taxa=None):
+    '''
+    scores: key: taxon, value: TaxonScore of one model in one ontology
+    taxa: the taxa to pool, by default all of them; taxa without a score are left out
+    returns a PooledScore
+    '''
+    if taxa is None:
+        taxa = scores
+    return PooledScore([scores[t] for t in sorted(taxa) if t in scores], thresholds)
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+"""
+new CAFA precision recall assessment
+
+Created on Thu Apr 14 17:14:30 2016
+dependency: - 
+@author: Ashley Zhou
+"""
+
+
+import os
+import sys
+sys.path.append('/home/nzhou/git')
+from collections import defaultdict
+import numpy
+from precrec.bootstrap import Bootstrap, benchmark_proteins, confidence_interval, counted_proteins
+from precrec.confdata import write_confidence
+from precrec.fmax import INTERVAL, count_predictions, threshold_grid, true_ia
+from precrec.ontology import Ontology, load_ontology, read_ancestors
+from precrec.propagate import propagate_predictions
+
+class benchmark:
+    def __init__(self,ancestor_path,benchmark_path,proteins=None):
+        '''
+        Here benchmark_path should be ontology specific
+        ancestor_path should also be ontology specific,
+        or an Ontology compiled from the obo file (see read_benchmark)
+        proteins: if given, only the annotations of these proteins are read
+        '''
+        if isinstance(ancestor_path, Ontology):
+            self.ontology = ancestor_path
+        else:
+            # Read GO ancestors file generated with go_ontology_ancestors_split_write()
+            # into an integer-interned ontology, see precrec.ontology
+            self.ontology = read_ancestors(ancestor_path)
+        #Key: protein
+        #Value: set of benchmark leaf terms
+        self.true_base_terms = defaultdict(set)
+        with open(benchmark_path) as benchmark_input:
+            for inline in benchmark_input:
+                protein, term = inline.strip().split('\t')
+                if proteins is None or protein in proteins:
+                    self.true_base_terms[protein].add(term)
+                
+    def propagate(self):
+        #Key: protein
+        #Value: set of indices of benchmark propagated terms
+        self.true_terms = defaultdict(set)
+        for protein in self.true_base_terms:
+            ids = []
+            for term in self.true_base_terms[protein]:
+                i = self.ontology.term_id(term)
+                if i is None:
+                    sys.stderr.write("%s not found \n" % term)
+                else:
+                    ids.append(i)
+            self.true_terms[protein] = set(self.ontology.closure(ids).tolist())
+        
+
+def read_benchmark(namespace,species,TYPE,fullbenchmarkfolder,obo_path):
+    '''
+    propagated benchmark of one ontology, species and benchmark type
+    namespace: 'bpo', 'mfo' or 'cco', in any case
+    species: taxon name, e.g. HUMAN, see precrec_main.taxon_name_converter
+    TYPE: 'type1' (no knowledge), 'type2' (limited knowledge) or 'all' (both)
+    fullbenchmarkfolder follows the CAFA2 structure:
+    leafonly_<ONTOLOGY>.txt holds the annotations of every benchmark protein,
+    lists/<ontology>_<species>_<type>.txt the proteins of every benchmark, one per line
+    A benchmark without a list file has no proteins
+    The ontology is memory-mapped from the artifact compiled from obo_path, see precrec.ontology
+    '''
+    namespace = namespace.lower()
+    if namespace not in ('bpo','mfo','cco'):
+        raise ValueError('Please enter a valid ontology: bpo, mfo, cco')
+    if TYPE == 'all':
+        types = ['type1','type2']
+    elif TYPE in ('type1','type2'):
+        types = [TYPE]
+    else:
+        raise ValueError('Please enter a valid benchmark type: type1, type2, all')
+    proteins = set()
+    for t in types:
+        list_path = os.path.join(fullbenchmarkfolder,'lists','%s_%s_%s.txt' % (namespace,species,t))
+        if os.path.isfile(list_path):
+            with open(list_path) as list_input:
+                proteins.update(inline.strip() for inline in list_input if inline.strip())
+    benchmark_path = os.path.join(fullbenchmarkfolder,'leafonly_%s.txt' % namespace.upper())
+    bench = benchmark(load_ontology(obo_path),benchmark_path,proteins)
+    bench.propagate()
+    return bench
+
+
+def propagated_benchmark(ancestor_path,benchmark_path):
+    bench = benchmark(ancestor_path,benchmark_path)
+    bench.propagate()
+    return bench
+
+
+class PrecREC:
+    '''
+    New code by Ashley
+    updated: 05/24/2016
+    A class for doing precision recall calculations
+    Not necssarily curve computation
+    read in ONTOLOGY-SPECIFIC prediction file
+    #Do we need ONTOLOGY-SPECIFIC ontology file??
+    '''
+    def __init__(self, benchmark, GoPred, engine='sparse', ia=None):
+        '''
+        constructor
+        benchmark is an instance of the benchmark class
+        GoPred is a GOPred for one ontology, e.g. a partition returned by GOPred.split()
+        countb is the number of predicted proteins in this file that are in the benchmark file
+        counted is the list of those proteins, see precrec.bootstrap.counted_proteins
+        counta is the number of proteins with at least one term above threshold
+        exist is whether the prediction has any term in this ontology
+        engine is how predicted terms are propagated: 'sparse' or 'loop'
+        ia is the information accretion of every term index, see precrec.ia.load_ia,
+        needed by weighted_output only
+        '''
+        self.exist = len(GoPred) > 0
+        self.ia = ia
+        self.ontology = benchmark.ontology
+        self.true_terms = benchmark.true_terms
+        self.obsolete = set()
+        self.counta = defaultdict()
+        self.countb = 0
+        
+        #Now propogate the predicted terms
+        #key:protein
+        #value: None if the protein is not in the benchmark, else a dictionary
+        #key: index of GO term in self.ontology
+        #value: [confidence, True/False] whether in true terms or not
+        #take the largest confidence
+        #Take care of obsolete terms as well
+        #engine 'sparse' does it with array operations, see precrec.propagate
+        #engine 'loop' is the original term-by-term propagation below
+        if engine == 'sparse':
+            self.predicted, self.obsolete, self.countb = propagate_predictions(GoPred, self.ontology, self.true_terms)
+        elif engine == 'loop':
+            self.__propagate__(GoPred)
+        else:
+            raise ValueError('Please enter a valid propagation engine: sparse, loop')
+        self.counted = counted_proteins(GoPred, self.true_terms)
+
+    def __propagate__(self, GoPred):
+        '''
+        term-by-term propagation, the reference for precrec.propagate
+        '''
+        self.predicted = defaultdict(defaultdict)
+        for prot, goterms, confidences in GoPred.by_protein():
+            if self.true_terms.get(prot):
+                '''
+                The protein is in the benchmark file
+                i.e. gained experimental annotation
+                '''
+                self.countb += 1
+                for goterm, confidence in zip(goterms, confidences):
+                    term = self.ontology.term_id(goterm)
+                    if term is None or self.ontology.is_obsolete(term):
+                        #not in the ontology, or no ancestors found and not a root
+                        self.obsolete.add(goterm)
+                        continue
+                    tc = {'term':term,'confidence':confidence}
+                    
+                    if term in self.predicted[prot]:
+                        #This term has already been added
+                        #maybe as an ancestor of other terms
+                        #update confidence with the maximum one
+                        #propagate and update all ancestor confidence
+                        self.__update_confidence__(prot,tc)
+                    else:
+                        #add this term to self.predicted
+                        #add confidence, and compare with self.true_terms
+                        #if term in self.true_terms, True
+                        #else False
+                        #No matter true or false, propagate
+                        self.predicted[prot][term]=self.__compare__(prot,tc)
+                        for ancterm in self.ontology.get_ancestors(term).tolist():
+                            newtc = {'term':ancterm,'confidence':tc['confidence']}
+                            if ancterm in self.predicted[prot]:
+                                self.__update_confidence__(prot,newtc)
+                            else:
+                                self.predicted[prot][ancterm]=self.__compare__(prot,newtc)
+            else:
+                '''
+                this protein is not in the benchmark file
+                '''
+                self.predicted[prot] = None
+                
+
+
+    def __update_confidence__(self,prot,tc):
+        '''
+        tc is a dictionary with {'confidence':0.57,'term':term index}
+        prot is a protein
+        This function compares the confidence value in tc, and if it's larger than
+        the confidence that's been added for term in self.predicted
+        we update that confidence
+        It also updates all propagated terms of tc
+        '''
+        if tc['confidence']>self.predicted[prot][tc['term']][0]:
+            self.predicted[prot][tc['term']][0]=tc['confidence']
+            for ancterm in self.ontology.get_ancestors(tc['term']).tolist():
+                if tc['confidence']>self.predicted[prot][ancterm][0]:
+                    self.predicted[prot][ancterm][0]=tc['confidence']
+                    
+                    
+    def __compare__(self,prot,tc):
+        '''
+        tc is a dictionary with {'confidence':0.57,'term':term index}
+        prot is a protein
+        This function compares if tc['term'] is in self.true_terms
+        returns a list ["confidence","True/False"]
+        '''
+        if tc['term'] in self.true_terms[prot]:
+            return [tc['confidence'],True]
+        else:
+            return [tc['confidence'],False]
+            
+        
+    def getObsolete(self):
+        '''
+        return all obsolete terms used by the prediction team
+        '''
+        return(self.obsolete)
+
+    def term_precision_recall(self,threshold,protein):
+        TP = 0.0
+        count = 0
+        #count is to count how many terms are above the threshold
+        if self.predicted[protein] is not None:
+            for term in self.predicted[protein]:
+                if self.predicted[protein][term][0]>=threshold:
+                    #greater but not greater or equal
+                    count+=1
+                    if self.predicted[protein][term][1] :
+                        TP+=1
+            try:
+                precision = TP/count
+            except ZeroDivisionError:
+                precision=None
+            recall = TP/len(self.true_terms[protein])
+            #recall should not have zerodivision problem
+            #since if self.predicted[protein] is not None
+            #This protein is in the benchmark file
+            #i.e. gained experimental annotation
+            #len(self.true_terms[protein]) should not be 0
+            return (precision, recall)
+        else:
+            return (None,None)
+                        
+    def precision_recall(self,threshold):
+        '''
+        this calculates the overall precision recall of the team, given a threshold,
+        For one prediction file, i.e. for one species and one model!!!!
+        05/24/2016: countb has been calculated over and over again for each threshold
+        '''
+        prec = float(0)
+        self.counta[threshold] = 0
+        rec = float(0)
+        for prot in self.predicted:
+                a,b = self.term_precision_recall(threshold,prot)
+                if a is not None:
+                    prec +=a
+                    self.counta[threshold]+=1
+                if b is not None:
+                    rec +=b
+        return (prec/self.counta[threshold], rec/self.countb)
+    
+    def getNumProteins(self,threshold):
+         
+        '''
+        run precision_recall first
+        '''         
+        print('number of benchmark proteins: %s\n'% len(self.true_terms))
+        print('number of proteins predicted: %s\n'% len(self.predicted))
+        #Those with not-None recall: 
+        #(predicted protein that are in benchmark, only one species per prediction file!! )
+        print ('number of predicted proteins that are in the benchmark file: %s\n' % self.countb)
+        #Those with not-None precision:
+        try:
+            print('number of proteins with at least one term above threshold: %s\n' % self.counta[threshold] )
+        except KeyError:
+            sys.stderr.write("Run precision_recall(%s) first\n" % str(threshold))
+            
+    def counts(self,thresholds):
+        '''
+        per-protein TP and predicted-count arrays over the thresholds
+        computed in one pass over self.predicted
+        see precrec.fmax.ProteinCounts
+        '''
+        return count_predictions(self.predicted, self.true_terms, thresholds)
+
+    def Fmax_output(self,mode='partial'):
+        '''
+        returns the fmax value AND outputs the precision-recall values for each threshold
+        This computes precision and recall for the INTERVAL thresholds between 0.01 and 0.99
+        mode: 'partial' averages recall over predicted benchmark proteins (countb)
+        'full' averages recall over all benchmark proteins
+        returns (precision, recall, fmax, threshold, coverage)
+        precision and recall are computed for all thresholds in one pass,
+        precision_recall(threshold) is the per-threshold equivalent
+        '''
+        thresholds = threshold_grid(INTERVAL)
+        if mode == 'full':
+            nbench = len(self.true_terms)
+        elif mode == 'partial':
+            nbench = self.countb
+        else:
+            raise ValueError('Please enter a valid mode: full, partial')
+        counts = self.counts(thresholds)
+        counta = counts.precision_recall(nbench)[2]
+        for thres, a in zip(thresholds, counta):
+            self.counta[thres] = int(a)
+        return counts.fmax(nbench)
+
+    def weighted_output(self,mode='partial'):
+        '''
+        Fmax, weighted Fmax and Smin from one pass over self.predicted
+        weighted by the information accretion given to the constructor
+        returns (fmax, weighted fmax, smin):
+        fmax and weighted fmax as returned by Fmax_output,
+        smin as (ru, mi, smin, threshold), see precrec.fmax.ProteinCounts.smin
+        '''
+        if self.ia is None:
+            raise ValueError('weighted_output needs the information accretion, see PrecREC(ia=...)')
+        ia = self.ia
+        thresholds = threshold_grid(INTERVAL)
+        counts = count_predictions(self.predicted, self.true_terms, thresholds, ia)
+        if mode == 'full':
+            nbench = len(self.true_terms)
+            #benchmark proteins without predictions miss all their true terms
+            predicted = set(counts.proteins)
+            missing = sum(true_ia(self.true_terms[p],ia) for p in self.true_terms if p not in predicted)
+        elif mode == 'partial':
+            nbench = self.countb
+            missing = 0.0
+        else:
+            raise ValueError('Please enter a valid mode: full, partial')
+        return (counts.fmax(nbench),counts.weighted_fmax(nbench),counts.smin(nbench,missing))
+
+    def Fmax_bootstrap(self,mode='partial',n=10000,seed=0,alpha=0.05):
+        '''
+        Fmax with a bootstrap confidence interval over the benchmark proteins
+        n resamples, drawn from seed; the same seed on the same benchmark
+        gives the same resamples for every team, see precrec.bootstrap
+        returns (fmax, lower, upper, samples)
+        '''
+        if mode not in ('full','partial'):
+            raise ValueError('Please enter a valid mode: full, partial')
+        thresholds = threshold_grid(INTERVAL)
+        counts = self.counts(thresholds)
+        boot = Bootstrap(benchmark_proteins(self.true_terms),n,seed)
+        samples = boot.fmax([counts],full=(mode=='full'),counted=[self.counted])[0]
+        nbench = len(self.true_terms) if mode == 'full' else self.countb
+        lower,upper = confidence_interval(samples,alpha)
+        return (counts.fmax(nbench)[2],lower,upper,samples)
+    
+    def printConfidence(self,output_path,output_format='text',compress=False):
+        '''
+        print confidence and True/False to a file
+        output_format 'text': one protindex <tab> confidence <tab> True/False line per term,
+        to be read by R
+        output_format 'binary': typed arrays, read back with precrec.confdata.read_confidence,
+        zlib-compressed if compress is True
+        '''
+        if output_format == 'binary':
+            write_confidence(output_path,self.predicted,compress)
+            return
+        elif output_format != 'text':
+            raise ValueError('Please enter a valid output format: text, binary')
+        protindex = 0
+        out = open(output_path,'w')
+        for prot in self.predicted:
+            protindex += 1
+            if self.predicted[prot] is not None:
+                for term in self.predicted[prot]:
+                    out.write("%s\t%s\t%s\n" % (str(protindex), self.predicted[prot][term][0],self.predicted[prot][term][1]))
+        out.close()
+
+
+class result:
+    '''
+    scores of one prediction file in one ontology, benchmark type and mode
+    filled in by precrec_main and plotted by precrec.plotting
+    precision, recall: lists over the threshold grid, see PrecREC.Fmax_output
+    opt, thres, coverage: fmax, the threshold giving it and the coverage there
+    '''
+    def __init__(self):
+        self.author = None
+        self.model = None
+        self.keywords = []
+        self.taxon = None
+        self.ontology = None
+        self.mode = None
+        self.TYPE = None
+        self.exist = False
+        self.precision = None
+        self.recall = None
+        self.opt = None
+        self.thres = None
+        self.coverage = None
+        #per-protein counts, kept for -bootstrap, -ia and -pool, see precrec.fmax.ProteinCounts
+        self.counts = None
+        #benchmark proteins averaged over in partial mode, see PrecREC.counted
+        self.counted = None
+
+    def read_from_GOPred(self,GoPred):
+        '''
+        header information of the prediction file
+        '''
+        self.author = GoPred.author
+        self.model = GoPred.model
+        self.keywords = GoPred.keywords
+        self.taxon = GoPred.taxon
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Per-stage timings and counters of an evaluation run, as a JSON report
+
+A Profiler records, for every stage (reading, splitting, benchmark loading,
+propagation, threshold sweep, plotting...) and every input file, the wall
+and CPU time, the resident set size before and after, the process peak RSS
+and, when tracing memory, the tracemalloc peak within the stage. Counters
+(proteins, predictions, obsolete terms, countb, counta...) are recorded next
+to them. Records made in worker processes are drained and handed back with
+the results, so one report covers the whole run.
+
+A disabled Profiler, the default, costs one function call per stage.
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    #not available on Windows, peak RSS is then left out
+    resource = None
+
+PROFILE_VERSION = 1
+
+
+def rss():
+    '''
+    current resident set size in bytes, None where /proc is not available
+    '''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_rss():
+    '''
+    peak resident set size of the process so far, in bytes
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Profiler:
+    '''
+    enabled: record anything at all
+    trace_memory: also trace Python allocations with tracemalloc, which slows
+    allocation-heavy stages down, for the peak memory of every stage
+    '''
+    def __init__(self, enabled=True, trace_memory=False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.records = []
+        self.started = time.time()
+        #tracemalloc peaks of the stages being timed, innermost last
+        self._open = []
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, file=None, ontology=None):
+        '''
+        with profiler.stage('propagate', path, 'bpo'): ...
+        a stage may be nested in another one, the outer stage's time includes it
+        '''
+        if not self.enabled:
+            yield
+            return
+        record = {'type': 'stage', 'stage': name, 'file': file, 'ontology': ontology, 'pid': os.getpid(),
+                  'start': time.time() - self.started, 'rss_before': rss()}
+        if self.trace_memory:
+            #the peak so far belongs to the stages already open
+            self._fold_peak()
+            self._open.append(0)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record['wall'] = time.perf_counter() - wall
+            record['cpu'] = time.process_time() - cpu
+            record['rss_after'] = rss()
+            record['max_rss'] = max_rss()
+            if self.trace_memory:
+                self._fold_peak()
+                peak = self._open.pop()
+                record['traced_peak'] = peak
+                if self._open:
+                    self._open[-1] = max(self._open[-1], peak)
+            self.records.append(record)
+
+    def _fold_peak(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._open:
+            self._open[-1] = max(self._open[-1], peak)
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    def count(self, name, value, file=None, ontology=None):
+        '''
+        records a counter, e.g. profiler.count('countb', c.countb, path, 'bpo')
+        '''
+        if self.enabled and value is not None:
+            self.records.append({'type': 'counter', 'counter': name, 'value': value,
+                                 'file': file, 'ontology': ontology, 'pid': os.getpid()})
+
+    def drain(self):
+        '''
+        returns the records made since the last drain and forgets them,
+        to send them from a worker process to the one writing the report
+        '''
+        records = self.records
+        self.records = []
+        return records
+
+    def extend(self, records):
+        if self.enabled and records:
+            self.records.extend(records)
+
+    def report(self, info=None):
+        '''
+        the JSON-serializable report: every stage and counter record,
+        plus the wall and CPU time and number of calls of each stage over the run
+        info: extra information about the run, e.g. the command-line arguments
+        '''
+        totals = {}
+        for record in self.records:
+            if record['type'] == 'stage':
+                total = totals.setdefault(record['stage'], {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+                total['calls'] += 1
+                total['wall'] += record['wall']
+                total['cpu'] += record['cpu']
+        return {'version': PROFILE_VERSION,
+                'started': self.started,
+                'wall': time.time() - self.started,
+                'max_rss': max_rss(),
+                'trace_memory': self.trace_memory,
+                'info': info or {},
+                'totals': totals,
+                'stages': [r for r in self.records if r['type'] == 'stage'],
+                'counters': [r for r in self.records if r['type'] == 'counter']}
+
+    def write(self, path, info=None):
+        with open(path, 'w') as out:
+            json.dump(self.report(info), out, indent=1)
+            out.write('\n')
+
+
+#the profiler of runs without profiling
+DISABLED = Profiler(False)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Max-propagation of predicted terms up the ontology, as sparse array operations
+
+Predictions of one ontology are a sparse proteins x terms matrix of
+confidences. Every (protein, term) row is expanded to the term and its
+ancestors with one gather over the CSR ancestor arrays, and the confidence of
+each (protein, term) cell is the maximum over the rows reaching it. This is
+the same result PrecREC.__init__ used to build term by term, re-walking the
+ancestors of a term whenever one of its descendants came with a higher
+confidence.
+"""
+
+from collections import defaultdict
+import numpy
+from precrec.annotations import annotated_proteins, term_array, true_sizes
+
+
+def _expand(ids, offsets, ancestors):
+    '''
+    for every term in ids, the term followed by its ancestors
+    returns (row, term): the position in ids each expanded entry comes from,
+    and the expanded term indices, in order
+    '''
+    starts = offsets[ids]
+    sizes = offsets[ids + 1] - starts + 1
+    row = numpy.repeat(numpy.arange(len(ids)), sizes)
+    #position of every expanded entry within its row, 0 is the term itself
+    local = numpy.arange(len(row)) - numpy.repeat(numpy.cumsum(sizes) - sizes, sizes)
+    term = numpy.repeat(ids, sizes)
+    up = local > 0
+    if up.any():
+        term[up] = ancestors[numpy.repeat(starts - 1, sizes)[up] + local[up]]
+    return row, term
+
+
+class Propagated:
+    '''
+    Max-propagated confidences of the predictions of one ontology, before any
+    benchmark labels them, see propagate_confidences()
+    proteins: sorted GOPred protein indices of every predicted protein
+    keys: protein index * number of terms + ontology term index of every propagated cell,
+    grouped by protein in the order the term-by-term propagation creates them
+    confidences: uint8 confidence of every cell, in hundredths
+    invalid_proteins, invalid_terms: GOPred protein and term indices of the predictions
+    whose term is obsolete or not in the ontology
+    '''
+    def __init__(self, GoPred, nterms, proteins, keys, confidences, invalid_proteins, invalid_terms):
+        self.GoPred = GoPred
+        self.nterms = nterms
+        self.proteins = proteins
+        self.keys = keys
+        self.confidences = confidences
+        self.invalid_proteins = invalid_proteins
+        self.invalid_terms = invalid_terms
+
+
+def propagate_confidences(GoPred, ontology, proteins=None):
+    '''
+    the benchmark-independent part of propagate_predictions(): every prediction
+    is expanded to its term and ancestors, keeping the largest confidence per cell
+    proteins: IDs of the proteins worth propagating, e.g. those of the benchmarks to
+    label the result with; None propagates every protein
+    returns a Propagated, to be labelled with label_predictions() once per benchmark
+    '''
+    empty = numpy.zeros(0, dtype=numpy.int64)
+    if len(GoPred) == 0:
+        return Propagated(GoPred, len(ontology), empty, empty, numpy.zeros(0, numpy.uint8), empty, empty)
+    protein_ids, term_ids, confidences = GoPred.columns()
+    #same protein order as GOPred.by_protein(), file order within a protein
+    order = numpy.argsort(protein_ids, kind='stable')
+    protein_ids = protein_ids[order].astype(numpy.int64)
+    term_ids = term_ids[order]
+    confidences = confidences[order]
+
+    predicted = numpy.unique(protein_ids)
+    wanted = numpy.zeros(len(GoPred.proteins), dtype=bool)
+    if proteins is None:
+        wanted[predicted] = True
+    else:
+        wanted[predicted] = [GoPred.proteins[p] in proteins for p in predicted.tolist()]
+    #ontology index of every term of the partition, -1 if obsolete
+    used = numpy.unique(term_ids)
+    index = numpy.full(len(GoPred.terms), -1, dtype=numpy.int64)
+    for t in used.tolist():
+        term = ontology.term_id(GoPred.terms[t])
+        if term is not None and not ontology.is_obsolete(term):
+            index[t] = term
+
+    rows = wanted[protein_ids]
+    valid = rows & (index[term_ids] >= 0)
+    invalid = rows & ~valid
+
+    row, term = _expand(index[term_ids[valid]], ontology.offsets, ontology.ancestors)
+    nterms = len(ontology)
+    keys = protein_ids[valid][row] * nterms + term
+    #max confidence of every (protein, term), and where it was first reached
+    by_key = numpy.argsort(keys, kind='stable')
+    keys = keys[by_key]
+    starts = numpy.flatnonzero(numpy.r_[True, keys[1:] != keys[:-1]]) if len(keys) else numpy.zeros(0, dtype=int)
+    best = numpy.maximum.reduceat(confidences[valid][row][by_key], starts) if len(keys) else numpy.zeros(0, numpy.uint8)
+    first = by_key[starts]
+    #cells in insertion order are grouped by protein, like the expanded rows
+    insertion = numpy.argsort(first)
+    return Propagated(GoPred, nterms, predicted, keys[starts][insertion], best[insertion],
+                      protein_ids[invalid], term_ids[invalid].astype(numpy.int64))
+
+
+def label_predictions(propagated, true_terms):
+    '''
+    the result of propagate_predictions() for one benchmark, from a Propagated
+    covering at least the benchmark proteins
+    '''
+    predicted = defaultdict(defaultdict)
+    obsolete = set()
+    GoPred = propagated.GoPred
+    proteins = propagated.proteins
+    if len(proteins) == 0:
+        return predicted, obsolete, 0
+    in_benchmark = numpy.zeros(len(GoPred.proteins), dtype=bool)
+    in_benchmark[proteins] = true_sizes(true_terms, [GoPred.proteins[p] for p in proteins.tolist()]) > 0
+    obsolete.update(GoPred.terms[t] for t in numpy.unique(propagated.invalid_terms[in_benchmark[propagated.invalid_proteins]]).tolist())
+    countb = int(in_benchmark[proteins].sum())
+
+    nterms = propagated.nterms
+    keep = in_benchmark[propagated.keys // nterms]
+    keys = propagated.keys[keep]
+    #the sorted true terms of a whole protein at once, see precrec.annotations
+    truth = [p * nterms + term_array(true_terms, GoPred.proteins[p])
+             for p in proteins[in_benchmark[proteins]].tolist()]
+    truth = numpy.isin(keys, numpy.concatenate(truth)) if truth else numpy.zeros(len(keys), dtype=bool)
+
+    cell_protein = keys // nterms
+    bounds = numpy.flatnonzero(numpy.r_[True, cell_protein[1:] != cell_protein[:-1], True]).tolist() if len(keys) else [0]
+    cell_term = (keys % nterms).tolist()
+    cell_value = list(map(list, zip((propagated.confidences[keep] / 100.0).tolist(), truth.tolist())))
+    cells = {}
+    for start, end, p in zip(bounds[:-1], bounds[1:], cell_protein[bounds[:-1]].tolist()):
+        cells[p] = defaultdict(None, zip(cell_term[start:end], cell_value[start:end]))
+    for p in proteins.tolist():
+        if not in_benchmark[p]:
+            predicted[GoPred.proteins[p]] = None
+        elif p in cells:
+            predicted[GoPred.proteins[p]] = cells[p]
+    return predicted, obsolete, countb
+
+
+def propagate_predictions(GoPred, ontology, true_terms):
+    '''
+    GoPred: predictions of one ontology, see GOPred.split()
+    ontology: precrec.ontology.Ontology the benchmark is propagated with
+    true_terms: key: protein, value: set of propagated true term indices
+    returns (predicted, obsolete, countb) as PrecREC.__init__ defines them:
+    predicted: key: protein, value: None if the protein is not in the benchmark,
+    else key: term index, value: [confidence, True/False whether the term is true]
+    proteins with only obsolete terms are counted in countb but left out of predicted
+    obsolete: set of GO IDs that are not in the ontology or have no ancestors and are not roots
+    countb: number of predicted proteins that are in the benchmark
+    Proteins and terms of each protein keep the order the term-by-term propagation gives
+    Only the benchmark proteins are propagated; to label one propagation with several
+    benchmarks, see propagate_confidences() and label_predictions()
+    '''
+    proteins = set(annotated_proteins(true_terms))
+    return label_predictions(propagate_confidences(GoPred, ontology, proteins), true_terms)
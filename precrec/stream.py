@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded-memory evaluation of a prediction file, one block of targets at a time
+
+CAFA prediction files are grouped by target. GOPred.read_split_blocks hands
+over the predictions of the targets read so far, split by ontology; each
+block is propagated, counted against the benchmark, added to per-threshold
+sums and dropped. Neither GOPred.data nor PrecREC.predicted is ever built
+for the whole file, so memory grows with the ontology and the benchmark,
+not with the submission.
+"""
+
+from precrec.fmax import ThresholdSums, count_predictions
+from precrec.GOPred import GOPred
+from precrec.pooling import unpredicted_ia
+from precrec.propagate import propagate_predictions
+
+
+class StreamScore:
+    '''
+    Accumulated score of one prediction file in one ontology
+    benchmark: propagated benchmark of the ontology
+    thresholds: threshold grid, see precrec.fmax.threshold_grid
+    ia: information accretion of every term index, for weighted Fmax and Smin
+    exist, countb and obsolete are as in PrecREC
+    '''
+    def __init__(self, benchmark, thresholds, ia=None):
+        self.ontology = benchmark.ontology
+        self.true_terms = benchmark.true_terms
+        self.ia = ia
+        self.sums = ThresholdSums(thresholds)
+        self.exist = False
+        self.countb = 0
+        self.obsolete = set()
+        #benchmark proteins with at least one propagated term
+        self.scored = set()
+
+    def add(self, GoPred):
+        '''
+        score the predictions of a block of complete targets
+        '''
+        if len(GoPred) == 0:
+            return
+        self.exist = True
+        predicted, obsolete, countb = propagate_predictions(GoPred, self.ontology, self.true_terms)
+        self.countb += countb
+        self.obsolete.update(obsolete)
+        counts = count_predictions(predicted, self.true_terms, self.sums.thresholds, self.ia)
+        self.scored.update(counts.proteins)
+        self.sums.add(counts)
+
+    def nbench(self, mode):
+        if mode == 'full':
+            return len(self.true_terms)
+        elif mode == 'partial':
+            return self.countb
+        raise ValueError('Please enter a valid mode: full, partial')
+
+    def Fmax_output(self, mode='partial'):
+        '''
+        (precision, recall, fmax, threshold, coverage), as PrecREC.Fmax_output
+        '''
+        return self.sums.fmax(self.nbench(mode))
+
+    def weighted_output(self, mode='partial'):
+        '''
+        (fmax, weighted fmax, smin), as PrecREC.weighted_output
+        '''
+        nbench = self.nbench(mode)
+        missing = 0.0
+        if mode == 'full':
+            missing = unpredicted_ia(self.true_terms, self.scored, self.ia)
+        return (self.sums.fmax(nbench), self.sums.weighted_fmax(nbench), self.sums.smin(nbench, missing))
+
+
+def stream_evaluate(pred_path, obo_path, benchmarks, thresholds, ias=None, max_terms=None):
+    '''
+    pred_path: handle of a raw prediction file
+    benchmarks: key: 'bpo', 'mfo' or 'cco', value: propagated benchmark
+    ias: key: ontology, value: information accretion table, optional
+    max_terms: most predictions kept per protein, see GOPred
+    returns (GOPred holding the header information, {ontology: StreamScore})
+    '''
+    if ias is None:
+        ias = {}
+    scores = dict((onto, StreamScore(benchmarks[onto], thresholds, ias.get(onto))) for onto in benchmarks)
+    all_pred = GOPred(max_terms)
+    for parts in all_pred.read_split_blocks(obo_path, pred_path):
+        for onto in scores:
+            scores[onto].add(parts[onto])
+    return all_pred, scores
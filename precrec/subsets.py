@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Scores of one submission on several benchmarks from a single propagation
+
+The benchmark types (NK, LK, all) of an ontology are subsets of the same
+annotations, propagated with the same ontology. Propagating the predictions
+does not depend on the benchmark, only labelling the propagated terms true
+or false does, so the predictions are propagated once for the union of the
+benchmark proteins and labelled once per benchmark. Each benchmark's
+per-protein counts then give Fmax in both full and partial mode.
+"""
+
+from precrec.annotations import annotated_proteins
+from precrec.bootstrap import counted_proteins
+from precrec.fmax import count_predictions
+from precrec.propagate import label_predictions, propagate_confidences
+
+
+class SubsetScore:
+    '''
+    Scores of one benchmark, as PrecREC gives them
+    exist, predicted, obsolete, countb, counted and counta are as in PrecREC
+    counts: the per-protein counts over the thresholds, see precrec.fmax.ProteinCounts
+    '''
+    def __init__(self, benchmark, propagated, thresholds, ia=None):
+        self.true_terms = benchmark.true_terms
+        self.exist = len(propagated.GoPred) > 0
+        self.predicted, self.obsolete, self.countb = label_predictions(propagated, self.true_terms)
+        self.counted = counted_proteins(propagated.GoPred, self.true_terms)
+        self.thresholds = thresholds
+        self.counts = count_predictions(self.predicted, self.true_terms, thresholds, ia)
+        self.counta = {}
+
+    def nbench(self, mode):
+        if mode == 'full':
+            return len(self.true_terms)
+        elif mode == 'partial':
+            return self.countb
+        raise ValueError('Please enter a valid mode: full, partial')
+
+    def Fmax_output(self, mode='partial'):
+        '''
+        (precision, recall, fmax, threshold, coverage), as PrecREC.Fmax_output
+        '''
+        nbench = self.nbench(mode)
+        for thres, a in zip(self.thresholds, self.counts.precision_recall(nbench)[2]):
+            self.counta[thres] = int(a)
+        return self.counts.fmax(nbench)
+
+
+def score_subsets(GoPred, benchmarks, thresholds, ia=None):
+    '''
+    GoPred: predictions of one ontology
+    benchmarks: key: e.g. the benchmark type, value: propagated benchmark;
+    all of them propagated with the same ontology
+    ia: information accretion of the ontology's terms, for weighted Fmax and Smin
+    returns {key: SubsetScore}
+    '''
+    ontology = next(iter(benchmarks.values())).ontology
+    proteins = set()
+    for b in benchmarks.values():
+        proteins.update(annotated_proteins(b.true_terms))
+    propagated = propagate_confidences(GoPred, ontology, proteins)
+    return dict((key, SubsetScore(benchmarks[key], propagated, thresholds, ia)) for key in benchmarks)
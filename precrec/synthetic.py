@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic GO-like ontologies, benchmarks and CAFA submissions of any size
+
+Used by perf_main.py to time the evaluation pipeline on inputs of a known
+size. Every namespace is a layered DAG under its GO root: depth levels of
+width terms, each term with up to n_parents parents in the levels above it.
+Every namespace also has obsolete terms, without parents. Benchmark proteins
+are annotated with terms of the lower levels; submissions predict some of
+those terms (or their ancestors), random other terms and a few obsolete ones,
+with random confidences, and some proteins only get obsolete terms in a
+namespace. The same seed gives the same files.
+"""
+
+import os
+import random
+from precrec.ontology import NAMESPACES, ONTOLOGIES
+
+#root of every namespace, as precrec.ontology.ROOT_TERMS lists them
+ROOTS = {'biological_process': 'GO:0008150',
+         'molecular_function': 'GO:0003674',
+         'cellular_component': 'GO:0005575'}
+
+SYNTHETIC_TAXON = '9606'
+
+
+def make_dag(depth, width, n_parents=2, seed=0):
+    '''
+    returns {namespace: [[root], level 1 terms, ..., level depth terms]}
+    and {term: [parents]}
+    '''
+    rng = random.Random(seed)
+    levels = {}
+    parents = {}
+    serial = 1000000
+    for namespace in NAMESPACES:
+        root = ROOTS[namespace]
+        parents[root] = []
+        layers = [[root]]
+        for level in range(depth):
+            layer = []
+            above = [t for l in layers[-2:] for t in l]
+            for i in range(width):
+                term = 'GO:%07d' % serial
+                serial += 1
+                #at least one parent in the level just above, so the level is the depth
+                first = rng.choice(layers[-1])
+                others = rng.sample(above, min(len(above), rng.randint(0, n_parents - 1)))
+                parents[term] = [first] + [p for p in others if p != first]
+                layer.append(term)
+            layers.append(layer)
+        levels[namespace] = layers
+    return levels, parents
+
+
+def make_obsolete(n_obsolete):
+    '''
+    returns {namespace: [n_obsolete obsolete terms]}, numbered apart from the terms of make_dag
+    '''
+    obsolete = {}
+    for i, namespace in enumerate(NAMESPACES):
+        obsolete[namespace] = ['GO:9%06d' % (i * n_obsolete + j) for j in range(n_obsolete)]
+    return obsolete
+
+
+def write_obo(path, levels, parents, obsolete=None):
+    '''
+    obsolete: {namespace: [terms]} written with is_obsolete and no parents, see make_obsolete
+    '''
+    with open(path, 'w') as out:
+        out.write('format-version: 1.2\nontology: go\n')
+        for namespace in NAMESPACES:
+            for layer in levels[namespace]:
+                for term in layer:
+                    out.write('\n[Term]\nid: %s\nname: %s\nnamespace: %s\n' % (term, term, namespace))
+                    for p in parents[term]:
+                        out.write('is_a: %s\n' % p)
+            for term in (obsolete or {}).get(namespace, []):
+                out.write('\n[Term]\nid: %s\nname: %s\nnamespace: %s\nis_obsolete: true\n' % (term, term, namespace))
+
+
+def make_benchmark(levels, n_proteins, n_true, seed=0):
+    '''
+    returns {namespace: {protein: [terms]}}
+    every protein of a namespace gets n_true terms from the lower half of its levels
+    '''
+    rng = random.Random(seed + 1)
+    benchmarks = {}
+    for namespace in NAMESPACES:
+        layers = levels[namespace]
+        deep = [t for l in layers[max(1, len(layers) // 2):] for t in l]
+        benchmarks[namespace] = dict(('T%09d' % p, rng.sample(deep, min(n_true, len(deep))))
+                                     for p in range(n_proteins))
+    return benchmarks
+
+
+def write_benchmark(path, annotations):
+    '''
+    protein <tab> term, the benchmark file format
+    '''
+    with open(path, 'w') as out:
+        for protein in annotations:
+            for term in annotations[protein]:
+                out.write('%s\t%s\n' % (protein, term))
+
+
+def write_submission(path, levels, parents, benchmarks, n_proteins, n_terms, hit_rate=0.3, seed=0,
+                     author='Synthgroup', model=1, obsolete=None, obsolete_rate=0.05, obsolete_only=0.02):
+    '''
+    a CAFA submission predicting n_terms terms in every namespace for n_proteins proteins
+    a hit_rate fraction of the predictions are true terms of the protein or their parents
+    proteins beyond the benchmark are predicted too, as in real submissions
+    obsolete: {namespace: [terms]}, see make_obsolete; an obsolete_rate fraction of the
+    predictions are obsolete terms, and an obsolete_only fraction of the proteins only
+    get obsolete terms in a namespace
+    '''
+    rng = random.Random(seed + 2)
+    pool = dict((namespace, [t for l in levels[namespace][1:] for t in l]) for namespace in NAMESPACES)
+    with open(path, 'w') as out:
+        out.write('AUTHOR %s\nMODEL %d\nKEYWORDS sequence alignment.\n' % (author, model))
+        for p in range(n_proteins):
+            protein = 'T%09d' % p
+            for namespace in NAMESPACES:
+                truth = benchmarks[namespace].get(protein, [])
+                stale = (obsolete or {}).get(namespace, [])
+                size = min(n_terms, len(pool[namespace]))
+                terms = set()
+                #without obsolete terms, the same seed draws the same predictions as before
+                if stale and rng.random() < obsolete_only:
+                    #only obsolete terms for this protein in this namespace
+                    terms.update(rng.sample(stale, min(size, len(stale))))
+                    size = len(terms)
+                while len(terms) < size:
+                    if stale and rng.random() < obsolete_rate:
+                        term = rng.choice(stale)
+                    elif truth and rng.random() < hit_rate:
+                        term = rng.choice(truth)
+                        if rng.random() < 0.5 and parents[term]:
+                            term = rng.choice(parents[term])
+                    else:
+                        term = rng.choice(pool[namespace])
+                    terms.add(term)
+                for term in sorted(terms):
+                    out.write('%s\t%s\t%.2f\n' % (protein, term, rng.randint(1, 100) / 100.0))
+        out.write('END\n')
+
+
+def make_inputs(folder, n_proteins=1000, n_terms=20, n_true=5, depth=8, width=100, n_parents=2,
+                benchmark_fraction=0.5, seed=0, n_obsolete=5):
+    '''
+    writes synthetic.obo, benchmark_<ontology>.txt and Synthgroup_1_9606.txt to folder
+    returns (obo path, {ontology: benchmark path}, submission path)
+    ontology keys are 'bpo', 'mfo' and 'cco'
+    n_obsolete: obsolete terms per namespace, some of them predicted
+    '''
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    levels, parents = make_dag(depth, width, n_parents, seed)
+    obsolete = make_obsolete(n_obsolete)
+    obo_path = os.path.join(folder, 'synthetic.obo')
+    write_obo(obo_path, levels, parents, obsolete)
+    benchmarks = make_benchmark(levels, int(n_proteins * benchmark_fraction), n_true, seed)
+    benchmark_paths = {}
+    for onto, namespace in zip(ONTOLOGIES, NAMESPACES):
+        benchmark_paths[onto] = os.path.join(folder, 'benchmark_%s.txt' % onto)
+        write_benchmark(benchmark_paths[onto], benchmarks[namespace])
+    pred_path = os.path.join(folder, 'Synthgroup_1_%s.txt' % SYNTHETIC_TAXON)
+    write_submission(pred_path, levels, parents, benchmarks, n_proteins, n_terms, seed=seed, obsolete=obsolete)
+    return obo_path, benchmark_paths, pred_path
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Format check of CAFA prediction files, in parallel over byte ranges
+
+GOPred.read() checks a file line by line and stops at the first error.
+validate() only checks: the file is cut into byte ranges on line
+boundaries, and worker processes check the prediction lines of each range
+with the same rules (whole blocks at once with GOPred.prediction_lines when
+they are all valid). Header records, END and anything else that is not a
+prediction line are handed back with their line numbers, and only those go
+through the record order checks of GOPred.read(), in file order.
+Every error is reported with its line number; no prediction is stored.
+"""
+
+import gzip
+import multiprocessing
+import os
+import re
+from functools import partial
+from precrec.GOPred import GOPred, legal_states1, legal_states2, legal_states3, legal_states4, \
+    prediction_check, prediction_lines, record_state
+
+#bytes read at once by a worker
+READ_SIZE = 1 << 22
+#largest byte range checked by one task
+CHUNK_SIZE = 1 << 25
+#smallest byte range worth a task of its own
+MIN_CHUNK_SIZE = 1 << 20
+#errors kept per file, the others are only counted
+MAX_ERRORS = 1000
+
+prediction_bytes = re.compile(prediction_lines.pattern.encode('ascii'), re.M)
+
+
+class ValidationReport:
+    '''
+    path: the file checked
+    lines: number of lines
+    errors: list of (line number, error message), sorted, at most max_errors of them;
+    line number 0 is an error about the whole file
+    nerrors: number of errors found, including those not kept
+    '''
+    def __init__(self, path, lines, errors, nerrors):
+        self.path = path
+        self.lines = lines
+        self.errors = errors
+        self.nerrors = nerrors
+
+    @property
+    def valid(self):
+        return self.nerrors == 0
+
+
+class _Chunk:
+    '''
+    what a worker finds in one byte range, line numbers start at 0 in the range
+    events: (line, state, text) of every line that is not a valid prediction,
+    and of the first valid prediction, for the record order checks
+    '''
+    def __init__(self, max_errors):
+        self.lines = 0
+        self.errors = []
+        self.nerrors = 0
+        self.events = []
+        self.predicted = False
+        self.max_errors = max_errors
+
+    def error(self, line, errmsg):
+        self.nerrors += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, errmsg))
+
+    def prediction(self, line):
+        if not self.predicted:
+            self.events.append((line, 'go_prediction', None))
+            self.predicted = True
+
+
+def chunk_ranges(path, chunk_size=CHUNK_SIZE):
+    '''
+    (start, end) byte ranges covering the file, each starting at the beginning of a line
+    '''
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as handle:
+        pos = chunk_size
+        while pos < size:
+            handle.seek(pos)
+            handle.readline()
+            pos = handle.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            pos += chunk_size
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _blocks(path, start, end):
+    '''
+    blocks of whole lines of the byte range, end None reads to the end
+    gzipped files can only be read whole, from start 0
+    '''
+    if path.endswith('.gz'):
+        handle = gzip.open(path, 'rb')
+    else:
+        handle = open(path, 'rb')
+        handle.seek(start)
+    with handle:
+        remaining = None if end is None else end - start
+        rest = b''
+        while remaining is None or remaining > 0:
+            data = handle.read(READ_SIZE if remaining is None else min(READ_SIZE, remaining))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            data = rest + data
+            cut = data.rfind(b'\n') + 1
+            rest = data[cut:]
+            if cut:
+                yield data[:cut]
+        if rest:
+            yield rest
+
+
+def _check_block(block, chunk):
+    lines = block.split(b'\n')
+    if lines[-1] == b'':
+        lines.pop()
+    first = chunk.lines
+    chunk.lines += len(lines)
+    records = prediction_bytes.findall(block)
+    if len(records) == len(lines) and max(r[2] for r in records) <= b'1.00':
+        chunk.prediction(first)
+        return
+    for n, raw in enumerate(lines, first):
+        record = prediction_bytes.match(raw)
+        if record is not None and record.group(3) <= b'1.00':
+            chunk.prediction(n)
+            continue
+        try:
+            text = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            chunk.error(n, "line is not UTF-8 text")
+            continue
+        fields = text.split()
+        if not fields:
+            chunk.error(n, "empty line")
+            continue
+        state = record_state(fields[0])
+        if state == 'go_prediction':
+            correct, errmsg, _ = prediction_check(text)
+            if correct:
+                chunk.prediction(n)
+            else:
+                chunk.error(n, errmsg)
+        else:
+            chunk.events.append((n, state, text))
+
+
+def _check_range(path, bounds, max_errors=MAX_ERRORS):
+    '''
+    checks the lines of one byte range, returns a _Chunk
+    '''
+    chunk = _Chunk(max_errors)
+    for block in _blocks(path, bounds[0], bounds[1]):
+        _check_block(block, chunk)
+    return chunk
+
+
+def _check_records(events, filename):
+    '''
+    the checks of GOPred._read_line() and the record order check of GOPred._read()
+    over the header records, END and the first prediction, in file order
+    returns a list of (line number, error message)
+    '''
+    errors = []
+    filenamefields = filename.split('.')[0].split('_')
+    if len(filenamefields) < 3:
+        errors.append((0, "filename should be <team>_<model>_<taxon>.txt"))
+        filenamefields = filenamefields + [None] * (3 - len(filenamefields))
+    #only the header fields are set by the checks below
+    pred = GOPred()
+    visited_states = []
+    n_models = 0
+    n_accuracy = 0
+    for line, state, text in events:
+        correct, errmsg = True, None
+        if state == 'go_prediction':
+            if 'go_prediction' not in visited_states:
+                visited_states.append(state)
+            continue
+        elif state == 'author':
+            correct, errmsg = pred._author_check(text)
+            if correct and pred.author != filenamefields[0]:
+                correct, errmsg = False, "AUTHOR: author name different from teamID in filename"
+            visited_states.append(state)
+        elif state == 'model':
+            n_models += 1
+            n_accuracy = 0
+            correct, errmsg = pred._model_check(text)
+            if n_models > 3:
+                correct, errmsg = False, "Too many models. Only up to 3 allowed"
+            #compared as int() would, without failing on a filename field that is not a number
+            elif correct and str(pred.model) != (filenamefields[1] or '').lstrip('0').rjust(1, '0'):
+                correct, errmsg = False, 'MODEL: model number in file different from filename'
+            if n_models == 1:
+                visited_states.append(state)
+        elif state == 'keywords':
+            if state not in visited_states:
+                visited_states.append(state)
+            correct, errmsg = pred._keywords_check(text)
+        elif state == 'accuracy':
+            if state not in visited_states:
+                visited_states.append(state)
+            n_accuracy += 1
+            if n_accuracy > 3:
+                correct, errmsg = False, "ACCURACY: too many ACCURACY records"
+            else:
+                correct, errmsg = pred._accuracy_check(text)
+        elif state == 'end':
+            correct, errmsg = pred._end_check(text)
+            visited_states.append(state)
+        if not correct:
+            errors.append((line, errmsg))
+    if visited_states not in (legal_states1, legal_states2, legal_states3, legal_states4):
+        errors.append((0, "file not formatted according to CAFA specs: records should be "
+                          "AUTHOR, MODEL, KEYWORDS, ACCURACY (optional), predictions, END, found %s"
+                       % ', '.join(visited_states)))
+    return errors
+
+
+def validate(path, jobs=1, chunk_size=None, max_errors=MAX_ERRORS):
+    '''
+    checks the format of a prediction file without reading its predictions into memory
+    jobs: number of worker processes checking byte ranges
+    chunk_size: bytes per range, by default enough ranges for every worker to get several
+    returns a ValidationReport
+    '''
+    if path.endswith('.gz'):
+        ranges = [(0, None)]
+    else:
+        if chunk_size is None:
+            chunk_size = min(CHUNK_SIZE, max(MIN_CHUNK_SIZE, os.path.getsize(path) // (4 * jobs) + 1))
+        ranges = chunk_ranges(path, chunk_size)
+    check = partial(_check_range, path, max_errors=max_errors)
+    if jobs > 1 and len(ranges) > 1:
+        with multiprocessing.get_context('fork').Pool(jobs) as pool:
+            chunks = pool.map(check, ranges, chunksize=1)
+    else:
+        chunks = [check(bounds) for bounds in ranges]
+    errors = []
+    nerrors = 0
+    events = []
+    offset = 1
+    for chunk in chunks:
+        errors.extend((offset + line, errmsg) for line, errmsg in chunk.errors)
+        nerrors += chunk.nerrors
+        events.extend((offset + line, state, text) for line, state, text in chunk.events)
+        offset += chunk.lines
+    record_errors = _check_records(events, os.path.basename(path))
+    nerrors += len(record_errors)
+    errors = sorted(errors + record_errors)[:max_errors]
+    return ValidationReport(path, offset - 1, errors, nerrors)
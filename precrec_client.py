@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Thin client of precrec_server.py
+
+Takes the same arguments as precrec_main.py, plus -server. The command line
+is run by the server in the current folder, which gets the same results
+files, plots and reports; the output is printed here and the exit status is
+that of the job. Replacing "python precrec_main.py" by
+"python precrec_client.py" is all a script needs to use a running server.
+"""
+
+import argparse
+import os
+import sys
+from precrec.daemon import default_address, default_token, request
+
+
+if __name__=='__main__':
+    #every other argument is for precrec_main.py, and is checked by the server
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument('-server', dest='server', help='Unix socket path or host:port of precrec_server.py, a TCP server needs $PRECREC_TOKEN. Default is $PRECREC_SERVER or precrec.sock in the user cache', default=default_address())
+    args, argv = parser.parse_known_args()
+    try:
+        reply = request(args.server, 'POST', '/evaluate', {'argv': argv, 'cwd': os.getcwd()}, token=default_token())
+    except (IOError, OSError) as e:
+        sys.stderr.write('cannot run the job on precrec_server.py at %s: %s\n' % (args.server, e))
+        sys.exit(1)
+    sys.stdout.write(reply['stdout'])
+    sys.stderr.write(reply['stderr'])
+    sys.exit(reply['status'])
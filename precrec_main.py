@@ -8,14 +8,23 @@ last updated 04/06/2017
 
 import argparse
 from precrec.precRec import PrecREC,read_benchmark,result
-from precrec.GOPred import GOPred
-import numpy
+from precrec.GOPred import CAFA_MAX_TERMS, GOPred
+from precrec.annotations import CompiledLoader
+from precrec.cache import BenchmarkCache
+from precrec.bootstrap import Bootstrap, benchmark_proteins, confidence_interval, paired_test
+from precrec.fmax import INTERVAL, count_predictions, threshold_grid
+from precrec.ia import load_ia
+from precrec.ingest import TextHandle, prefetch
+from precrec.plotting import Curve, Plotter
+from precrec.pooling import TaxonScore, pool, unpredicted_ia
+from precrec.profiling import DISABLED, Profiler
+from precrec.stream import stream_evaluate
+from precrec.subsets import SubsetScore, score_subsets
+import io
 import os
-import matplotlib
-matplotlib.use('pdf')
-import matplotlib.pyplot as plt
+import sys
+import multiprocessing
 import errno    
-import seaborn as sns
 
 def mkdir_p(path):
     try:
@@ -50,80 +59,6 @@ def taxon_name_converter(taxonID):
     return taxonTable[taxonID]    
 
 
-def curveSmooth(result):
-    #This function removes a p-r pair if there exists another p-r pair that's greater in both precision and recall
-    #precision and recall should both be lists of the same length
-    precision = []
-    recall = []
-    for i in range(len(result.precision)):
-        remove = False
-        for j in range(i):
-            if result.precision[i]<result.precision[j] and result.recall[i]<result.recall[j]:
-                remove = True
-                break
-        if not remove:
-            precision.append(result.precision[i])
-            recall.append(result.recall[i])
-    return([precision,recall])
-
-def plotSingle(result,smooth):
-    '''
-    an result object
-    pay attention to order of precision-recall
-    recall is on x-axis, but supplied second
-    '''
-    if smooth=='Y':
-        precision = curveSmooth(result)[0]
-        recall = curveSmooth(result)[1]
-        ax = plt.subplot()
-        ax.plot(recall,precision,'-g',label=result.author+': fmax='+ '%.3f'%result.opt)
-        ax.plot(result.recall[int(result.thres*100)],result.precision[int(result.thres*100)],'gD')
-    elif smooth=='N':
-        ax = plt.subplot()
-        ax.plot(result.recall,result.precision,'-g',label=result.author+': fmax='+ '%.3f'%result.opt)
-        ax.plot(result.recall[int(result.thres*100)],result.precision[int(result.thres*100)],'gD')
-    plt.axis([0,1,0,1])
-    plt.yticks(numpy.arange(0,1,0.1))
-    plt.xlabel('Recall')
-    plt.ylabel('Precision')
-    plt.legend(loc='best')
-    figuretitle = result.author+" "+str(result.model)+" "+str(result.taxon)+ " " + result.ontology+' '+ 'mode:'+result.mode+' '+'type:'+result.TYPE
-    plt.title(figuretitle)
-    figurename = './plots/'+result.author+"_"+str(result.model)+"_"+str(result.taxon)+ "_" + result.ontology+'_'+ result.mode+'_'+result.TYPE+'.png'
-    plt.savefig(figurename,dpi=200)
-    plt.close()
-
-def plotMultiple(title,listofResults,smooth):
-    '''
-    supply lists of precision+recall+name lists
-    '''
-    num = len(listofResults)
-    pal=sns.color_palette("Set2", num)
-    colors=pal.as_hex()
-    for j,i in enumerate(listofResults):
-        if smooth=='Y':
-            ax = plt.subplot()
-            precision = curveSmooth(i)[0]
-            recall = curveSmooth(i)[1]
-            ax.plot(recall,precision,'-',color=colors[j],label=i.author+': fmax='+ '%.3f'%i.opt) 
-            ax.plot(i.recall[int(i.thres*100)],i.precision[int(i.thres*100)],'o',color=colors[j])
-        elif smooth=='N':
-            ax = plt.subplot()
-            ax.plot(i.recall,i.precision,'-',color=colors[j],label=i.author+': fmax='+ '%.3f'%i.opt )
-            ax.plot(i.recall[int(i.thres*100)],i.precision[int(i.thres*100)],'o',color=colors[j])
-    plt.axis([0,1,0,1])
-    plt.yticks(numpy.arange(0,1,0.1))
-    plt.xlabel('Recall')
-    plt.ylabel('Precision')
-    plt.legend(loc='best')
-    plt.title(title)
-    if title == None:
-        figurename = './plots/Combined_plot.png'
-    else:
-        figurename = './plots/'+title+'.png'
-    
-    plt.savefig(figurename,dpi=200)
-    plt.close()
 def typeConverter(oldType):
     if oldType=='type1':
         newType = 'NK'
@@ -135,9 +70,373 @@ def typeConverter(oldType):
 
 
 
-if __name__=='__main__':
-    
-    parser = argparse.ArgumentParser(description='Precision- Recall assessment for CAFA predictions.', )
+ONTOLOGIES = ['bpo','cco','mfo']
+
+#Read-only state of one run, set before the worker pool is created
+#forked workers inherit it, including the already propagated benchmarks,
+#instead of having it pickled with every task
+_shared = {}
+#the submission parsed last in this process, reused for its other ontologies
+_parsed = {}
+#key: path, value: bytes of the submission read ahead, see evaluate_serial()
+_prefetched = {}
+#key: (Ontology of a benchmark, -ia corpus), value: its information accretion
+_ia = {}
+
+
+def prediction_taxon(path):
+    '''
+    taxon field of a CAFA prediction filename, as GOPred.read() parses it
+    '''
+    return os.path.basename(path).split('.')[0].split('_')[2]
+
+
+def read_file(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+
+def read_prediction(path, obo_path, write_split, data=None, max_terms=None):
+    '''
+    data: the bytes of the file if already read, else it is read here
+    max_terms: most predictions kept per protein, see GOPred
+    '''
+    profiler = _shared.get('profiler', DISABLED)
+    all_pred = GOPred(max_terms)
+    with (open(path) if data is None else TextHandle(io.BytesIO(data), path)) as pred_path:
+        with profiler.stage('read', path):
+            all_pred.read(pred_path)
+    #the split is kept in memory and handed straight to PrecREC
+    #the _BPO/_MFO/_CCO files are only written with -w Y
+    with profiler.stage('split', path):
+        split_pred = all_pred.split(obo_path)
+        if write_split == 'Y':
+            for onto in split_pred:
+                split_pred[onto].write("%s_%s.txt" % (os.path.splitext(path)[0], onto.upper()))
+    profiler.count('predictions', len(all_pred), path)
+    profiler.count('proteins', len(all_pred.proteins), path)
+    profiler.count('terms', len(all_pred.terms), path)
+    profiler.count('dropped', all_pred.dropped, path)
+    return all_pred, split_pred
+
+
+def information_accretion(b):
+    '''
+    IA of the benchmark's ontology estimated from the -ia corpus, cached on disk by precrec.ia
+    '''
+    key = (b.ontology, _shared['args'].ia_corpus)
+    if key not in _ia:
+        with _shared.get('profiler', DISABLED).stage('ia'):
+            _ia[key] = load_ia(b.ontology, _shared['args'].ia_corpus)
+    return _ia[key]
+
+
+def weighted_metrics(res, c, b, ia, mode):
+    '''
+    weighted Fmax and Smin from res.counts of PrecREC c,
+    averaged over the same proteins as c.Fmax_output
+    '''
+    if mode == 'full':
+        nbench = len(b.true_terms)
+        missing = unpredicted_ia(b.true_terms,res.counts.proteins,ia)
+    else:
+        nbench = c.countb
+        missing = 0.0
+    set_weighted(res, res.counts.weighted_fmax(nbench), res.counts.smin(nbench,missing))
+
+
+def taxon_score(taxon, b, c, counts):
+    '''
+    what the scores of c on benchmark b add to the scores pooled over taxa, see pooled_report
+    counts: per-protein counts of c, None if it predicts nothing
+    '''
+    missing = 0.0
+    if _shared['args'].ia_corpus is not None:
+        missing = unpredicted_ia(b.true_terms,counts.proteins if counts is not None else (),information_accretion(b))
+    return TaxonScore(taxon, counts, len(b.true_terms), c.countb, missing)
+
+
+def set_weighted(res, wfm, sm):
+    res.wopt = wfm[2]
+    res.wthres = wfm[3]
+    res.smin = sm[2]
+    res.sthres = sm[3]
+
+
+def stream_prediction(path, args):
+    '''
+    score a prediction file one block of targets at a time, see precrec.stream
+    returns (GOPred with the header information, {ontology: StreamScore})
+    '''
+    benchmarks = {}
+    ias = {}
+    for onto in ONTOLOGIES:
+        b = _shared['benchmarks'].get(onto, taxon_name_converter(prediction_taxon(path)),args.type[0],args.bfolder,args.obo_path)
+        benchmarks[onto] = b
+        if args.ia_corpus is not None:
+            ias[onto] = information_accretion(b)
+    with open(path) as pred_path, _shared.get('profiler', DISABLED).stage('stream', path):
+        return stream_evaluate(pred_path, args.obo_path, benchmarks, threshold_grid(INTERVAL), ias, args.max_terms)
+
+
+def evaluate(task):
+    '''
+    task is (prediction file path, ontology)
+    returns ([author, model, keywords, taxon, dropped predictions], [result of every (benchmark type, mode)])
+    with several benchmark types, the predictions are propagated once for all of them
+    runs in the worker processes with -jobs, or in the main process
+    '''
+    path, onto = task
+    args = _shared['args']
+    profiler = _shared.get('profiler', DISABLED)
+    if path not in _parsed:
+        _parsed.clear()
+        if args.stream:
+            _parsed[path] = stream_prediction(path, args)
+        else:
+            _parsed[path] = read_prediction(path, args.obo_path, args.write_split, _prefetched.pop(path, None), args.max_terms)
+    all_pred, split_pred = _parsed[path]
+    info = [all_pred.author,all_pred.model,all_pred.keywords,all_pred.taxon,all_pred.dropped]
+    taxon = taxon_name_converter(all_pred.taxon)
+    benches = {}
+    with profiler.stage('benchmark', path, onto):
+        for TYPE in args.type:
+            benches[TYPE] = _shared['benchmarks'].get(onto,taxon,TYPE,args.bfolder,args.obo_path)
+    if args.stream:
+        #already scored while reading, split_pred holds a StreamScore per ontology
+        scores = {args.type[0]: split_pred[onto]}
+    elif len(args.type) == 1:
+        with profiler.stage('propagate', path, onto):
+            scores = {args.type[0]: PrecREC(benches[args.type[0]],split_pred[onto])}
+    else:
+        ia = information_accretion(benches[args.type[0]]) if args.ia_corpus is not None else None
+        with profiler.stage('propagate', path, onto):
+            scores = score_subsets(split_pred[onto],benches,threshold_grid(INTERVAL),ia)
+    results = []
+    for TYPE in args.type:
+        b = benches[TYPE]
+        c = scores[TYPE]
+        #per-protein counts, computed once for every mode
+        counts = c.counts if isinstance(c, SubsetScore) else None
+        for mode in args.mode:
+            res = result()
+            res.read_from_GOPred(all_pred)
+            res.mode = mode
+            res.TYPE = typeConverter(TYPE)
+            res.benchmark_type = TYPE
+            res.ontology = onto
+            res.exist = c.exist
+            if c.exist:
+                with profiler.stage('fmax', path, onto):
+                    fm = c.Fmax_output(mode)
+                res.precision = fm[0]
+                res.recall = fm[1]
+                res.opt = fm[2]
+                res.thres = fm[3]
+                res.coverage = fm[4]
+                if args.stream:
+                    if args.ia_corpus is not None:
+                        set_weighted(res, *c.weighted_output(mode)[1:])
+                elif args.bootstrap > 0 or args.ia_corpus is not None or args.pool is not None:
+                    #one more pass over the propagated predictions gives the per-protein counts
+                    #the resampling is done once for all files, see bootstrap_report
+                    ia = information_accretion(b) if args.ia_corpus is not None else None
+                    if counts is None:
+                        with profiler.stage('counts', path, onto):
+                            counts = count_predictions(c.predicted,b.true_terms,threshold_grid(INTERVAL),ia)
+                    res.counts = counts
+                    res.counted = c.counted
+                    if ia is not None:
+                        weighted_metrics(res,c,b,ia,mode)
+            results.append(res)
+        if args.pool is not None:
+            #the counts of every mode are the same, so is what they add to the pooled scores
+            pooled = taxon_score(all_pred.taxon, b, c, counts if c.exist else None)
+            for res in results[-len(args.mode):]:
+                res.taxon_score = pooled
+        if profiler.enabled:
+            label = onto if len(args.type) == 1 else '%s_%s' % (onto, typeConverter(TYPE))
+            count_scoring(profiler, path, label, None if args.stream else split_pred[onto], b, c, results[-1])
+    if profiler.enabled:
+        #handed back to the main process with the results when run by a worker
+        results[0].profile = profiler.drain()
+    return info, results
+
+
+def count_scoring(profiler, path, onto, pred, b, c, res):
+    '''
+    counters of one (prediction file, ontology): predictions and proteins of the ontology,
+    propagated terms, obsolete terms, benchmark proteins, countb and counta at the best threshold
+    pred is None with --stream, whose predictions are not kept
+    '''
+    profiler.count('benchmark_proteins', len(b.true_terms), path, onto)
+    profiler.count('obsolete_terms', len(c.obsolete), path, onto)
+    profiler.count('countb', c.countb, path, onto)
+    if pred is not None:
+        profiler.count('predictions', len(pred), path, onto)
+        profiler.count('proteins', len(set(pred.protein_ids)), path, onto)
+        profiler.count('propagated_terms', sum(len(terms) for terms in c.predicted.values() if terms), path, onto)
+        if c.exist:
+            profiler.count('counta', c.counta.get(res.thres), path, onto)
+
+
+def evaluate_all(args, benchmarks):
+    '''
+    generates (path, info, results) for every (prediction file, ontology),
+    in the order of args.file and ONTOLOGIES whatever the number of jobs
+    results holds one result per (benchmark type, mode), see evaluate()
+    '''
+    _shared['args'] = args
+    _shared['benchmarks'] = benchmarks
+    _shared.setdefault('profiler', DISABLED)
+    tasks = [(f.name, onto) for f in args.file for onto in ONTOLOGIES]
+    if args.jobs > 1:
+        #load every benchmark before forking, so workers share them
+        keys = set((onto, prediction_taxon(path), TYPE) for path, onto in tasks for TYPE in args.type)
+        benchmarks.maxsize = max(benchmarks.maxsize, len(keys))
+        for onto, taxon, TYPE in sorted(keys):
+            with _shared['profiler'].stage('benchmark', None, onto):
+                b = benchmarks.get(onto, taxon_name_converter(taxon),TYPE,args.bfolder,args.obo_path)
+            if args.ia_corpus is not None:
+                information_accretion(b)
+        pool = multiprocessing.get_context('fork').Pool(args.jobs, _worker_init)
+        #one chunk is the three ontologies of a file, parsed once by one worker
+        results = pool.imap(evaluate, tasks, chunksize=len(ONTOLOGIES))
+    elif args.stream:
+        #streamed files are never held in memory whole
+        pool = None
+        results = map(evaluate, tasks)
+    else:
+        pool = None
+        results = evaluate_serial(tasks, args.prefetch)
+    try:
+        for (path, onto), (info, res) in zip(tasks, results):
+            yield path, info, res
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def evaluate_serial(tasks, depth):
+    '''
+    map(evaluate, tasks) in this process, with the next depth prediction files
+    read by a thread while the current one is scored, see precrec.ingest.prefetch
+    '''
+    #consecutive tasks of a file are parsed once
+    starts = [i for i, (path, onto) in enumerate(tasks) if i == 0 or tasks[i-1][0] != path]
+    files = prefetch([tasks[i][0] for i in starts], read_file, depth)
+    starts = set(starts)
+    try:
+        for i, task in enumerate(tasks):
+            if i in starts:
+                path, data = next(files)
+                _prefetched.clear()
+                _prefetched[path] = data
+            yield evaluate(task)
+    finally:
+        files.close()
+        _prefetched.clear()
+
+
+def _worker_init():
+    #the records of the main process stay there, workers send back only their own
+    _shared['profiler'].drain()
+
+
+def bootstrap_report(out_path, results, args, benchmarks):
+    '''
+    bootstrap confidence interval of every file's Fmax,
+    and paired comparisons of the files scored on the same benchmark
+    every file of one (ontology, taxon, benchmark type, mode) is scored on the same resamples
+    '''
+    groups = {}
+    for res in results:
+        if res.exist:
+            groups.setdefault((res.ontology, res.taxon, res.benchmark_type, res.mode), []).append(res)
+    several = len(args.type) * len(args.mode) > 1
+    with open(out_path,'w') as out:
+        out.write('bootstrap resamples:%s\tseed:%s\tmode:%s\n' % (args.bootstrap,args.seed,','.join(args.mode)))
+        for onto, taxon, TYPE, mode in sorted(groups):
+            group = groups[(onto, taxon, TYPE, mode)]
+            b = benchmarks.get(onto, taxon_name_converter(taxon),TYPE,args.bfolder,args.obo_path)
+            boot = Bootstrap(benchmark_proteins(b.true_terms),args.bootstrap,args.seed)
+            samples = boot.fmax([res.counts for res in group],full=(mode=='full'),counted=[res.counted for res in group])
+            names = ['%s_%s_%s' % (res.author,res.model,res.taxon) for res in group]
+            if several:
+                out.write('\nontology:%s\ttaxon:%s\tbenchmark type:%s\tmode:%s\n' % (onto,taxon,typeConverter(TYPE),mode))
+            else:
+                out.write('\nontology:%s\ttaxon:%s\n' % (onto,taxon))
+            out.write('%s\t%s\t%s\t%s\n' % ('Prediction','Fmax','Lower','Upper'))
+            for name, res, s in zip(names, group, samples):
+                #countb: benchmark proteins with only obsolete predicted terms count too
+                nbench = len(b.true_terms) if mode == 'full' else len(res.counted)
+                lower, upper = confidence_interval(s)
+                out.write('%s\t%s\t%s\t%s\n' % (name,res.counts.fmax(nbench)[2],lower,upper))
+            if len(group) > 1:
+                out.write('%s\t%s\t%s\t%s\t%s\t%s\n' % ('A','B','Difference','Lower','Upper','P(A<=B)'))
+                for i in range(len(group)):
+                    for j in range(i+1,len(group)):
+                        diff, lower, upper, p = paired_test(samples[i],samples[j])
+                        out.write('%s\t%s\t%s\t%s\t%s\t%s\n' % (names[i],names[j],diff,lower,upper,p))
+
+
+def pooled_report(out_path, results, args, benchmarks):
+    '''
+    scores of every model pooled over the taxa of all the prediction files, or over the taxa of -pool,
+    summed from the per-taxon counts of the results
+    in full mode, the benchmark proteins of a taxon a model has no file for count as not predicted
+    '''
+    #key: (author, model), value: {(ontology, benchmark type): {taxon: TaxonScore}}
+    models = {}
+    #key: (ontology, benchmark type), value: taxa scored by any model
+    taxa = {}
+    for res in results:
+        if args.pool and res.taxon not in args.pool:
+            continue
+        key = (res.ontology, res.benchmark_type)
+        models.setdefault((res.author, res.model), {}).setdefault(key, {})[res.taxon] = res.taxon_score
+        taxa.setdefault(key, set()).add(res.taxon)
+    thresholds = threshold_grid(INTERVAL)
+    with open(out_path,'w') as out:
+        out.write('pooled taxa:%s\n' % ','.join(sorted(set(t for key in taxa for t in taxa[key]))))
+        for author, model in sorted(models, key=str):
+            scores = models[(author, model)]
+            out.write('\nAUTHOR:%s\n' % author)
+            out.write('MODEL: %s\n' % model)
+            out.write('Species:%s\n' % ','.join(sorted(set(t for key in scores for t in scores[key]))))
+            for i, (TYPE, mode) in enumerate([(TYPE, mode) for TYPE in args.type for mode in args.mode]):
+                if i > 0:
+                    out.write('\n')
+                out.write('benchmark type:%s\n' % typeConverter(TYPE))
+                out.write('mode:%s\n' % mode)
+                if args.ia_corpus is None:
+                    out.write('%s:\t%s\t%s\t%s\n' % ('Ontology','Fmax','Threshold','Coverage'))
+                else:
+                    out.write('%s:\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' % ('Ontology','Fmax','Threshold','Coverage','WFmax','WThreshold','Smin','SThreshold'))
+                for onto in ONTOLOGIES:
+                    key = (onto, TYPE)
+                    if key not in scores:
+                        continue
+                    per_taxon = dict(scores[key])
+                    for taxon in taxa[key]:
+                        if taxon not in per_taxon:
+                            b = benchmarks.get(onto,taxon_name_converter(taxon),TYPE,args.bfolder,args.obo_path)
+                            ia = information_accretion(b) if args.ia_corpus is not None else None
+                            per_taxon[taxon] = TaxonScore.unpredicted(taxon, b.true_terms, ia)
+                    p = pool(per_taxon, thresholds)
+                    if not p.exist:
+                        continue
+                    fm = p.Fmax_output(mode)
+                    if args.ia_corpus is None:
+                        out.write('%s:\t%s\t%s\t%s\n' % (onto,fm[2],fm[3],fm[4]))
+                    else:
+                        wfm, sm = p.weighted_output(mode)[1:]
+                        out.write('%s:\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' % (onto,fm[2],fm[3],fm[4],wfm[2],wfm[3],sm[2],sm[3]))
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Precision- Recall assessment for CAFA predictions.', )
     parser.add_argument('file',type=open,
                         help='Input prediction file. Filename should follow CAFA formats. Accepts more than one predictions.',
                         nargs = '+')
@@ -146,81 +445,151 @@ if __name__=='__main__':
     #If prediction file is already split by ontology it should follow Doegroup_1_9606_BPO.txt(or _MFO, _CCO)                  
     
     
-    parser.add_argument('-t','--t',dest='type',help = 'Input evaluation type: No Knowledge or Limited Knowledge', choices=['type1','type2','all'],required=True)    
+    parser.add_argument('-t','--t',dest='type',help = 'Input evaluation type: No Knowledge or Limited Knowledge. Accepts more than one type, the predictions are then propagated once for all of them', choices=['type1','type2','all'],required=True,nargs='+')
     parser.add_argument('-o','--o', dest= 'obo_path',help = 'Input the obo file path',default = './precrec/go_20130615-termdb.obo')
-    parser.add_argument('-m','--m',dest='mode', help = 'Input the evaluation mode: full or partial', choices = ['full','partial'],required = True)
+    parser.add_argument('-m','--m',dest='mode', help = 'Input the evaluation mode: full or partial. Accepts both', choices = ['full','partial'],required = True,nargs='+')
     parser.add_argument('-b','--b',dest='bfolder', help = 'Input the path to the benchmark folder, default CAFA2 benchmarks provided', default = './precrec/benchmark/')
     parser.add_argument('-title', dest='title',help = 'Input title of combined plot, if multiple prediction files are supplied',default = ' ')
+    parser.add_argument('-w', dest = 'write_split', help='Option to also write the prediction split by ontology to <file>_BPO.txt, _MFO.txt and _CCO.txt. Enter "Y" or "N". Default is "N"', default = 'N', choices=['Y','N'])
+    parser.add_argument('-cache', dest = 'cache_size', type=int, help='Number of propagated benchmarks kept in memory and shared by all prediction files. Default is 6', default = 6)
+    parser.add_argument('-j','--jobs', dest = 'jobs', type=int, help='Number of worker processes evaluating (file, ontology) pairs in parallel. Default is 1', default = 1)
+    parser.add_argument('-max-terms', dest = 'max_terms', type=int, nargs='?', const=CAFA_MAX_TERMS, help='Keep only the most confident predictions of every protein, dropping the others while reading. -max-terms alone keeps %s, the CAFA limit. The number of dropped predictions is reported. Default is no limit' % CAFA_MAX_TERMS, default = None)
+    parser.add_argument('-prefetch', dest = 'prefetch', type=int, help='Number of prediction files read into memory ahead of the one being scored, by a reader thread. 0 reads each file when its turn comes. Not used with -j above 1 or --stream. Default is 2', default = 2)
+    parser.add_argument('-bootstrap', dest = 'bootstrap', type=int, help='Number of bootstrap resamples of the benchmark proteins for Fmax confidence intervals and paired comparisons of the prediction files, written to ./results/<title>_bootstrap.txt. Default is 0 (no bootstrap)', default = 0)
+    parser.add_argument('-seed', dest = 'seed', type=int, help='Random seed of the bootstrap resamples. Default is 0', default = 0)
+    parser.add_argument('-ia', dest = 'ia_corpus', help='Annotation corpus (protein <tab> GO term per line) to estimate information accretion from, for weighted Fmax and Smin. The table is cached next to the corpus. Default is none (Fmax only)', default = None)
+    parser.add_argument('-pool', dest = 'pool', nargs='*', help='Also score every model on the benchmark proteins of several taxa pooled, summing the per-protein counts of its prediction files, written to ./results/<title>_pooled.txt. Taxon IDs to pool, e.g. -pool 9606 10090; with none, every taxon of the prediction files. Default is no pooling', default = None)
+    parser.add_argument('--stream', dest = 'stream', action='store_true', help='Score each prediction file one block of targets at a time, keeping only per-threshold sums in memory. Predictions of a target must be contiguous. Cannot be combined with -bootstrap, -pool or -w')
     parser.add_argument('-s', dest = 'smooth', help='Option to have the P-R curves smoothed. Enter "Y" or "N". Default is "N". Recommended if plotting multiple curves', default = 'N', choices=['Y','N'], action='store')
-    args = parser.parse_args()
-    mkdir_p('./plots/')
+    parser.add_argument('-plot-jobs', dest = 'plot_jobs', type=int, help='Number of background processes rendering the P-R plots while the evaluation goes on. 0 renders them in the main process. Default is 1', default = 1)
+    parser.add_argument('--no-plot', dest = 'no_plot', action='store_true', help='Do not draw P-R plots, only write the results files')
+    parser.add_argument('-profile', dest = 'profile', help='Write a JSON report of the wall time, CPU time and memory of every stage and input file, and of counters such as proteins, propagated terms and countb, to this path. Default is none', default = None)
+    parser.add_argument('--profile-memory', dest = 'profile_memory', action='store_true', help='With -profile, also trace Python allocations for the peak memory of every stage. Slows the run down')
+    return parser
+
+
+def parse_args(argv=None, prog=None):
+    '''
+    the checked command-line arguments, every benchmark type and mode once
+    argv: the arguments after the script name, by default those of this process
+    prog: the script name in usage and error messages, by default that of this process
+    '''
+    parser = build_parser(prog)
+    args = parser.parse_args(argv)
+    if args.stream and (args.bootstrap > 0 or args.pool is not None or args.write_split == 'Y'):
+        parser.error('--stream keeps no per-protein counts or split predictions, it cannot be combined with -bootstrap, -pool or -w Y')
+    #every (benchmark type, mode) once, in the order given
+    args.type = sorted(set(args.type), key=args.type.index)
+    args.mode = sorted(set(args.mode), key=args.mode.index)
+    if args.max_terms is not None and args.max_terms < 1:
+        parser.error('-max-terms should be at least 1')
+    if args.stream and len(args.type) > 1:
+        parser.error('--stream scores one benchmark type at a time')
+    for f in args.file:
+        f.close()
+    return args
+
+
+def main(args, benchmarks=None):
+    '''
+    evaluates the prediction files of args and writes the results, plots and reports
+    benchmarks: BenchmarkCache to reuse, e.g. kept warm by precrec_server.py
+    '''
+    #paths may name other files than in an earlier call
+    _parsed.clear()
+    combinations = [(TYPE, mode) for TYPE in args.type for mode in args.mode]
+    if not args.no_plot:
+        mkdir_p('./plots/')
     mkdir_p('./results/')
     
     num = len(args.file)
-    resultBPO = []
-    resultCCO = []
-    resultMFO = []
-    for f in args.file:
-        print('Evaluating %s.\n' % f.name)
-        resulthandle = open("./results/%s_results.txt" % os.path.basename(f.name),'w')
-        #first split the prediction file into three ontologies
-        all_pred = GOPred()
-        pred_path = f
-        obo_path = args.obo_path
-        benchmarkFolder = args.bfolder
-        all_pred.read_and_split_and_write(obo_path,pred_path)
-        info = [all_pred.author,all_pred.model,all_pred.keywords,all_pred.taxon]
-        print('AUTHOR: %s\n' % info[0])
-        resulthandle.write('AUTHOR:%s\n' % info[0])
-        print('MODEL: %s\n' % info[1])
-        resulthandle.write('MODEL: %s\n' % info[1])
-        print('KEYWORDS: %s\n' % info[2][0])
-        resulthandle.write('KEYWORDS: %s\n' % info[2][0])
-        print('Species:%s\n' % info[3])
-        resulthandle.write('Species:%s\n' % info[3])
-        print('benchmark type:%s\n' % typeConverter(args.type)) 
-        resulthandle.write('benchmark type:%s\n' % typeConverter(args.type))
-        print('mode:%s\n' % args.mode)
-        resulthandle.write('mode:%s\n' % args.mode)
-        resulthandle.write('%s:\t%s\t%s\t%s\n' % ('Ontology','Fmax','Threshold','Coverage'))
-        #parse file name 
-        #namefields = os.path.basename(pred_path.name).split('.')[0].split('_')
-            
-        #read benchmark for three ontologies
-        for onto in ['bpo','cco','mfo']:
-            res = result()
-            res.read_from_GOPred(all_pred)
-            res.mode = args.mode
-            res.TYPE = typeConverter(args.type)
-            print('ontology: %s\n' % onto)
-            res.ontology = onto
-            b = read_benchmark(onto, taxon_name_converter(res.taxon),args.type,benchmarkFolder,obo_path)
-            path = os.path.splitext(pred_path.name)[0]+'_'+onto.upper()+'.txt'
-            c = PrecREC(b,path)
-            if c.exist:
-                fm = c.Fmax_output(args.mode)
-                res.precision = fm[0]
-                res.recall = fm[1]
-                res.opt = fm[2]
-                res.thres = fm[3]
-                res.coverage = fm[4]
-                #fm.append(os.path.splitext(os.path.basename(pred_path.name))[0])
-                #print(fm)
+    #key: (ontology, benchmark type, mode), value: results of every file
+    combined = {}
+    #every PrecREC below reuses the benchmarks already read and propagated for earlier files
+    #and later runs map them from the artifacts compiled next to the ontology
+    if benchmarks is None:
+        benchmarks = BenchmarkCache(CompiledLoader(read_benchmark), args.cache_size)
+    resulthandle = None
+    #with -profile, stages run by the workers come back with their results
+    profiler = Profiler(args.profile is not None, args.profile_memory)
+    _shared['profiler'] = profiler
+    #plots are drawn by the plotter while the next files are evaluated
+    plotter = Plotter(None if args.no_plot else args.plot_jobs)
+    for path, info, results in evaluate_all(args, benchmarks):
+        profiler.extend(getattr(results[0], 'profile', None))
+        onto = results[0].ontology
+        if onto == ONTOLOGIES[0]:
+            print('Evaluating %s.\n' % path)
+            resulthandle = open("./results/%s_results.txt" % os.path.basename(path),'w')
+            print('AUTHOR: %s\n' % info[0])
+            resulthandle.write('AUTHOR:%s\n' % info[0])
+            print('MODEL: %s\n' % info[1])
+            resulthandle.write('MODEL: %s\n' % info[1])
+            print('KEYWORDS: %s\n' % info[2][0])
+            resulthandle.write('KEYWORDS: %s\n' % info[2][0])
+            print('Species:%s\n' % info[3])
+            resulthandle.write('Species:%s\n' % info[3])
+            if args.max_terms is not None:
+                print('Dropped: %s predictions beyond the %s most confident terms of a protein\n' % (info[4], args.max_terms))
+                resulthandle.write('Dropped:%s\n' % info[4])
+            if len(combinations) == 1:
+                print('benchmark type:%s\n' % typeConverter(args.type[0]))
+                print('mode:%s\n' % args.mode[0])
+            #the table of every (benchmark type, mode) is written once all ontologies are scored
+            tables = dict((key, []) for key in combinations)
+        print('ontology: %s\n' % onto)
+        for (TYPE, mode), res in zip(combinations, results):
+            if len(combinations) > 1:
+                print('benchmark type:%s\tmode:%s\n' % (res.TYPE, mode))
+            if res.exist:
                 print('fmax: %s\n' % res.opt)
                 print('threshold giving fmax: %s\n' % res.thres)
                 print('coverage: %s\n' % res.coverage)
-                plotSingle(res,args.smooth)
-                resulthandle.write('%s:\t%s\t%s\t%s\n' % (onto,res.opt,res.thres,res.coverage))
-            if onto=='bpo':
-                resultBPO.append(res)
-            elif onto=='cco':
-                resultCCO.append(res)
-            elif onto=='mfo':
-                resultMFO.append(res)
-
-        resulthandle.close()
-    print(num)
+                with profiler.stage('plot', path, onto):
+                    plotter.single(Curve.from_result(res,args.smooth))
+                if args.ia_corpus is None:
+                    tables[(TYPE, mode)].append('%s:\t%s\t%s\t%s\n' % (onto,res.opt,res.thres,res.coverage))
+                else:
+                    print('weighted fmax: %s\n' % res.wopt)
+                    print('smin: %s\n' % res.smin)
+                    tables[(TYPE, mode)].append('%s:\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' % (onto,res.opt,res.thres,res.coverage,res.wopt,res.wthres,res.smin,res.sthres))
+            combined.setdefault((onto, TYPE, mode), []).append(res)
+        if onto == ONTOLOGIES[-1]:
+            for i, (TYPE, mode) in enumerate(combinations):
+                if i > 0:
+                    resulthandle.write('\n')
+                resulthandle.write('benchmark type:%s\n' % typeConverter(TYPE))
+                resulthandle.write('mode:%s\n' % mode)
+                if args.ia_corpus is None:
+                    resulthandle.write('%s:\t%s\t%s\t%s\n' % ('Ontology','Fmax','Threshold','Coverage'))
+                else:
+                    resulthandle.write('%s:\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' % ('Ontology','Fmax','Threshold','Coverage','WFmax','WThreshold','Smin','SThreshold'))
+                resulthandle.writelines(tables[(TYPE, mode)])
+            resulthandle.close()
+    if args.bootstrap > 0:
+        with profiler.stage('bootstrap'):
+            bootstrap_report('./results/%s_bootstrap.txt' % (args.title.strip() or 'Combined'),
+                             [res for key in sorted(combined) for res in combined[key]],args,benchmarks)
+    if args.pool is not None:
+        with profiler.stage('pool'):
+            pooled_report('./results/%s_pooled.txt' % (args.title.strip() or 'Combined'),
+                          [res for key in sorted(combined) for res in combined[key]],args,benchmarks)
+    #combined plots, once every file has been evaluated
     if num>1:
-        plotMultiple(args.title+'_BPO', resultBPO,args.smooth)
-        plotMultiple(args.title+'_CCO', resultCCO,args.smooth)
-        plotMultiple(args.title+'_MFO', resultMFO,args.smooth)
+        for onto in ('bpo', 'cco', 'mfo'):
+            for TYPE, mode in combinations:
+                name = '_' + onto.upper()
+                if len(combinations) > 1:
+                    name += '_%s_%s' % (typeConverter(TYPE), mode)
+                curves = [Curve.from_result(r,args.smooth) for r in combined[(onto, TYPE, mode)] if r.exist]
+                if curves:
+                    with profiler.stage('plot'):
+                        plotter.multiple(args.title+name, curves)
+    with profiler.stage('plot_wait'):
+        plotter.close()
+    if args.profile is not None:
+        profiler.write(args.profile, {'argv': sys.argv, 'jobs': args.jobs, 'plot_jobs': args.plot_jobs})
+
+
+if __name__=='__main__':
+    main(parse_args())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Long-running evaluation server for precrec_main.py command lines
+
+The server loads the ontologies and benchmarks and imports the plotting
+libraries once, then forks a pool of worker processes that inherit them.
+Every job is a precrec_main.py command line, run by a worker with the same
+code as the command line, in the folder of the client, so it writes the
+same results files, plots and reports. The worker's output and exit status
+go back to the client, see precrec_client.py. A job may only write under
+its folder, and a job that does not finish in time is answered with an error.
+
+Requests, as JSON over a Unix socket or localhost HTTP with a token (see precrec.daemon):
+    POST /evaluate {"argv": [precrec_main.py arguments], "cwd": folder}
+        -> {"status": exit status, "stdout": output, "stderr": errors}
+    GET /status -> {"pid", "workers", "jobs", "uptime"}
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from precrec.precRec import read_benchmark
+from precrec.annotations import CompiledLoader
+from precrec.cache import BenchmarkCache
+from precrec.daemon import check_address, default_address, default_token, make_server
+from precrec.ontology import load_ontology
+from precrec_main import ONTOLOGIES, main, parse_args, taxon_name_converter
+
+#state loaded before the worker pool is forked, inherited by every worker
+_warm = {}
+
+
+def warm_up(args):
+    '''
+    loads what every job needs: the ontologies of args.obo_paths, the benchmarks
+    of args.taxa in every ontology and benchmark type, and matplotlib and seaborn
+    '''
+    for obo_path in args.obo_paths:
+        load_ontology(obo_path)
+    keys = [(onto, taxon_name_converter(taxon), TYPE, obo_path)
+            for obo_path in args.obo_paths for taxon in args.taxa for TYPE in args.type for onto in ONTOLOGIES]
+    benchmarks = BenchmarkCache(CompiledLoader(read_benchmark), max(args.cache_size, len(keys)))
+    for onto, taxon, TYPE, obo_path in keys:
+        benchmarks.get(onto, taxon, TYPE, args.bfolder, obo_path)
+    _warm['benchmarks'] = benchmarks
+    try:
+        from precrec.plotting import _pyplot
+        _pyplot()
+        import seaborn
+    except ImportError:
+        #jobs with --no-plot do not need them
+        pass
+    return len(keys)
+
+
+def output_paths(args):
+    '''
+    the files a precrec_main.py job writes outside ./results and ./plots,
+    or whose names come from its arguments
+    '''
+    paths = []
+    if args.profile is not None:
+        paths.append(args.profile)
+    if args.write_split == 'Y':
+        paths.extend(os.path.splitext(f.name)[0] for f in args.file)
+    title = args.title.strip() or 'Combined'
+    paths.extend([os.path.join('results', title), os.path.join('plots', args.title)])
+    return paths
+
+
+def outside(path, folder):
+    '''
+    True if path, relative to folder, resolves to a file outside folder
+    '''
+    folder = os.path.realpath(folder)
+    return os.path.commonpath([folder, os.path.realpath(os.path.join(folder, path))]) != folder
+
+
+def run_job(argv, cwd):
+    '''
+    runs one precrec_main.py command line in the folder cwd, in a worker process
+    the workers of the pool cannot start processes of their own, so -j and
+    -plot-jobs are ignored: the files of a job are evaluated one after the other
+    and its plots rendered in the worker
+    '''
+    out = io.StringIO()
+    err = io.StringIO()
+    status = 0
+    with redirect_stdout(out), redirect_stderr(err):
+        try:
+            os.chdir(cwd)
+            args = parse_args(argv, 'precrec_main.py')
+            rejected = [path for path in output_paths(args) if outside(path, cwd)]
+            if rejected:
+                raise SystemExit('the server only writes under %s, not %s' % (cwd, ', '.join(rejected)))
+            args.jobs = 1
+            args.plot_jobs = 0
+            main(args, _warm.get('benchmarks'))
+        except SystemExit as e:
+            #argparse errors, -h and rejected paths
+            if e.code is None or isinstance(e.code, int):
+                status = e.code or 0
+            else:
+                err.write('%s\n' % e.code)
+                status = 2
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    return {'status': status, 'stdout': out.getvalue(), 'stderr': err.getvalue()}
+
+
+class Jobs:
+    '''
+    answers the requests of precrec.daemon, running jobs on the worker pool
+    timeout: seconds a job may take, the job of a worker that died never finishes
+    '''
+    def __init__(self, pool, workers, timeout=3600):
+        self.pool = pool
+        self.workers = workers
+        self.timeout = timeout
+        self.started = time.time()
+        self.done = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, method, path, body):
+        if method == 'GET' and path == '/status':
+            return 200, {'pid': os.getpid(), 'workers': self.workers, 'jobs': self.done,
+                         'uptime': time.time() - self.started}
+        if method == 'POST' and path == '/evaluate':
+            argv = body.get('argv') if isinstance(body, dict) else None
+            cwd = body.get('cwd') if isinstance(body, dict) else None
+            if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv) or not isinstance(cwd, str):
+                return 400, {'error': 'expected {"argv": [arguments], "cwd": folder}'}
+            try:
+                reply = self.pool.apply_async(run_job, (argv, cwd)).get(self.timeout)
+            except multiprocessing.TimeoutError:
+                return 504, {'error': 'the job did not finish in %ss, or its worker died' % self.timeout}
+            with self.lock:
+                self.done += 1
+            return 200, reply
+        return 404, {'error': 'no such request: %s %s' % (method, path)}
+
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Server keeping ontologies and benchmarks loaded for precrec_main.py jobs sent by precrec_client.py.', )
+    parser.add_argument('-listen', dest='address', help='Path of a Unix socket, or host:port on localhost, which needs $PRECREC_TOKEN. Default is $PRECREC_SERVER or precrec.sock in the user cache', default=default_address())
+    parser.add_argument('-workers', dest='workers', type=int, help='Number of worker processes running jobs. Default is the number of CPUs', default=multiprocessing.cpu_count())
+    parser.add_argument('-timeout', dest='timeout', type=float, help='Seconds a job may run before the client gets an error. Default is 3600', default=3600)
+    parser.add_argument('-o','--o', dest='obo_paths', help='obo files to load before serving. Default is ./precrec/go_20130615-termdb.obo', nargs='+', default=['./precrec/go_20130615-termdb.obo'])
+    parser.add_argument('-b','--b', dest='bfolder', help='Benchmark folder of the benchmarks to load before serving, default CAFA2 benchmarks provided', default='./precrec/benchmark/')
+    parser.add_argument('-t','--t', dest='type', help='Benchmark types to load before serving. Default is all three', choices=['type1','type2','all'], nargs='+', default=['type1','type2','all'])
+    parser.add_argument('-taxa', dest='taxa', help='Taxon IDs whose benchmarks are loaded before serving, e.g. 9606 10090. Default is none, benchmarks are then loaded by the first job needing them', nargs='*', default=[])
+    parser.add_argument('-cache', dest='cache_size', type=int, help='Number of propagated benchmarks kept in memory by every worker. Default is 6, or the number loaded before serving', default=6)
+    args = parser.parse_args()
+    try:
+        check_address(args.address, default_token())
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.time()
+    loaded = warm_up(args)
+    sys.stderr.write('loaded %s ontologies and %s benchmarks in %.1fs\n' % (len(args.obo_paths), loaded, time.time() - start))
+    #forked after warm_up, so the workers share what it loaded
+    pool = multiprocessing.get_context('fork').Pool(args.workers)
+    server = make_server(args.address, Jobs(pool, args.workers, args.timeout), default_token())
+    sys.stderr.write('serving on %s with %s workers\n' % (args.address, args.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.terminate()
+        pool.join()
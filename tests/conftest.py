@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Small CAFA inputs shared by the tests
+
+A GO-like ontology with obsolete terms in two namespaces, a benchmark folder
+in the CAFA2 layout (leafonly_<ONTOLOGY>.txt and lists/<ontology>_<TAXON>_<type>.txt)
+and a submission predicting benchmark proteins, proteins outside the benchmark
+and a benchmark protein whose only BPO prediction is an obsolete term.
+"""
+
+import os
+import sys
+import pytest
+
+#the scripts and the precrec package live in the folder above
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#(term, namespace, parents, obsolete) of test.obo
+TERMS = [
+    ('GO:0008150', 'biological_process', [], False),
+    ('GO:0000001', 'biological_process', ['GO:0008150'], False),
+    ('GO:0000002', 'biological_process', ['GO:0000001'], False),
+    ('GO:0000003', 'biological_process', ['GO:0008150'], False),
+    ('GO:0000004', 'biological_process', ['GO:0000002', 'GO:0000003'], False),
+    ('GO:0000005', 'biological_process', ['GO:0000003'], False),
+    ('GO:0000009', 'biological_process', [], True),
+    ('GO:0003674', 'molecular_function', [], False),
+    ('GO:0000011', 'molecular_function', ['GO:0003674'], False),
+    ('GO:0000012', 'molecular_function', ['GO:0000011'], False),
+    ('GO:0000013', 'molecular_function', ['GO:0003674'], False),
+    ('GO:0000019', 'molecular_function', [], True),
+    ('GO:0005575', 'cellular_component', [], False),
+    ('GO:0000021', 'cellular_component', ['GO:0005575'], False),
+    ('GO:0000022', 'cellular_component', ['GO:0000021'], False),
+    ('GO:0000023', 'cellular_component', ['GO:0005575'], False),
+]
+
+#key: ontology, value: [(protein, leaf term)]
+BENCHMARK = {
+    'BPO': [('T96060000001', 'GO:0000004'), ('T96060000002', 'GO:0000005'),
+            ('T96060000003', 'GO:0000002'), ('T96060000004', 'GO:0000001'),
+            ('T96060000005', 'GO:0000004'), ('T96060000006', 'GO:0000005'),
+            ('T100900000001', 'GO:0000002'), ('T100900000002', 'GO:0000005')],
+    'MFO': [('T96060000001', 'GO:0000012'), ('T96060000002', 'GO:0000013'),
+            ('T96060000003', 'GO:0000011'), ('T100900000001', 'GO:0000012')],
+    'CCO': [('T96060000001', 'GO:0000022'), ('T96060000004', 'GO:0000023'),
+            ('T100900000002', 'GO:0000023')],
+}
+
+#key: list file, value: proteins
+LISTS = {
+    'bpo_HUMAN_type1': ['T96060000001', 'T96060000002', 'T96060000003', 'T96060000004'],
+    'bpo_HUMAN_type2': ['T96060000005', 'T96060000006'],
+    'mfo_HUMAN_type1': ['T96060000001', 'T96060000002', 'T96060000003'],
+    'cco_HUMAN_type1': ['T96060000001', 'T96060000004'],
+    'bpo_MOUSE_type1': ['T100900000001', 'T100900000002'],
+    'mfo_MOUSE_type1': ['T100900000001'],
+    'cco_MOUSE_type1': ['T100900000002'],
+}
+
+#(protein, term, confidence) of Testgroup_1_9606.txt
+#T96060000003 only has an obsolete BPO term, T96060000007 is not in the benchmark
+PREDICTIONS = [
+    ('T96060000001', 'GO:0000004', '0.80'),
+    ('T96060000001', 'GO:0000005', '0.40'),
+    ('T96060000001', 'GO:0000012', '0.70'),
+    ('T96060000001', 'GO:0000022', '0.60'),
+    ('T96060000002', 'GO:0000005', '0.90'),
+    ('T96060000002', 'GO:0000002', '0.30'),
+    ('T96060000002', 'GO:0000013', '0.50'),
+    ('T96060000003', 'GO:0000009', '0.70'),
+    ('T96060000003', 'GO:0000011', '0.20'),
+    ('T96060000005', 'GO:0000004', '0.55'),
+    ('T96060000007', 'GO:0000001', '0.90'),
+    ('T96060000007', 'GO:0000023', '0.40'),
+]
+
+
+def write_obo(path):
+    with open(path, 'w') as out:
+        out.write('format-version: 1.2\nontology: go\n')
+        for term, namespace, parents, obsolete in TERMS:
+            out.write('\n[Term]\nid: %s\nname: %s\nnamespace: %s\n' % (term, term, namespace))
+            for p in parents:
+                out.write('is_a: %s ! %s\n' % (p, p))
+            if obsolete:
+                out.write('is_obsolete: true\n')
+
+
+def write_benchmark_folder(folder):
+    os.makedirs(os.path.join(folder, 'lists'))
+    for onto in BENCHMARK:
+        with open(os.path.join(folder, 'leafonly_%s.txt' % onto), 'w') as out:
+            for protein, term in BENCHMARK[onto]:
+                out.write('%s\t%s\n' % (protein, term))
+    for name in LISTS:
+        with open(os.path.join(folder, 'lists', '%s.txt' % name), 'w') as out:
+            for protein in LISTS[name]:
+                out.write('%s\n' % protein)
+
+
+def write_submission(path, predictions, author='Testgroup', model=1):
+    with open(path, 'w') as out:
+        out.write('AUTHOR %s\nMODEL %s\nKEYWORDS sequence alignment.\n' % (author, model))
+        for protein, term, confidence in predictions:
+            out.write('%s\t%s\t%s\n' % (protein, term, confidence))
+        out.write('END\n')
+
+
+class CafaFiles:
+    '''
+    folder: where everything is written
+    obo: ontology file
+    bfolder: benchmark folder in the CAFA2 layout
+    submission: Testgroup_1_9606.txt
+    '''
+    def __init__(self, folder):
+        self.folder = str(folder)
+        self.obo = os.path.join(self.folder, 'test.obo')
+        write_obo(self.obo)
+        self.bfolder = os.path.join(self.folder, 'benchmark')
+        write_benchmark_folder(self.bfolder)
+        self.submission = self.add_submission('Testgroup', 1, '9606', PREDICTIONS)
+
+    def add_submission(self, author, model, taxon, predictions):
+        '''
+        writes <author>_<model>_<taxon>.txt, returns its path
+        '''
+        path = os.path.join(self.folder, '%s_%s_%s.txt' % (author, model, taxon))
+        write_submission(path, predictions, author, model)
+        return path
+
+    def leafonly(self, onto):
+        return os.path.join(self.bfolder, 'leafonly_%s.txt' % onto.upper())
+
+
+def unwritable_folder(tmp_path):
+    '''
+    a folder that cannot be created, whoever runs the tests: its parent is a file
+    '''
+    parent = os.path.join(str(tmp_path), 'not_a_folder')
+    open(parent, 'w').close()
+    return os.path.join(parent, 'cache')
+
+
+@pytest.fixture(autouse=True)
+def user_cache(tmp_path_factory, monkeypatch):
+    '''
+    the user cache of precrec.arrayfile, never the one in the home folder
+    '''
+    path = str(tmp_path_factory.mktemp('user_cache'))
+    monkeypatch.setenv('PRECREC_CACHE', path)
+    return path
+
+
+@pytest.fixture
+def cafa(tmp_path):
+    return CafaFiles(tmp_path)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+The resumable batch runner: manifests, checkpoints, restarts after a crash, retries and ranking
+"""
+
+import json
+import os
+import pytest
+import zipfile
+from conftest import PREDICTIONS, write_submission
+from precrec.batch import ONTOLOGIES, ResultStore, read_manifest, run, submission_files, write_leaderboard
+from precrec.ontology import file_checksum
+
+
+@pytest.fixture
+def teams(tmp_path):
+    '''
+    a manifest of two teams, three prediction files and a few files that are not predictions
+    '''
+    for team, names in (('team_a', ['Agroup_1_9606.txt', 'Agroup_2_9606.txt']),
+                        ('team_b', ['Bgroup_1_10090.txt'])):
+        folder = tmp_path / team
+        folder.mkdir()
+        for name in names:
+            author, model = name.split('_')[:2]
+            write_submission(str(folder / name), PREDICTIONS[:3], author, int(model))
+    for name in ('README.txt', 'Agroup_1_hpo_9606.txt', 'Agroup_x_9606.txt', 'Agroup_1_9606.csv'):
+        (tmp_path / 'team_a' / name).write_text('not a prediction\n')
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text('# team <tab> folder\nteam A\tteam_a\n\nteam_b\n')
+    return str(manifest)
+
+
+class Evaluator:
+    '''
+    an evaluate() for run(), recording its calls
+    fail: file names to fail with error, crash: file name to stop the run at
+    '''
+    def __init__(self, fail=(), crash=None, error=ValueError('bad file')):
+        self.calls = []
+        self.fail = fail
+        self.crash = crash
+        self.error = error
+
+    def __call__(self, team, handle, ontologies):
+        name = os.path.basename(handle.name)
+        self.calls.append((team, name, list(ontologies)))
+        if name == self.crash:
+            raise KeyboardInterrupt
+        if name in self.fail:
+            raise self.error
+        model = int(name.split('_')[1])
+        return [{'ontology': onto, 'author': name.split('_')[0], 'status': 'ok', 'exist': True,
+                 'fmax': 0.1 * model + 0.01 * ONTOLOGIES.index(onto), 'threshold': 0.5, 'coverage': 1.0}
+                for onto in ontologies]
+
+
+def test_manifest_and_prediction_files(teams, tmp_path):
+    entries = read_manifest(teams)
+    assert entries == [('team A', str(tmp_path / 'team_a')), ('team_b', str(tmp_path / 'team_b'))]
+    found = [(os.path.basename(name), model, taxon, checksum)
+             for name, model, taxon, opener, checksum in submission_files(entries[0][1])]
+    assert found == [('Agroup_1_9606.txt', 1, '9606', file_checksum(str(tmp_path / 'team_a' / 'Agroup_1_9606.txt'))),
+                     ('Agroup_2_9606.txt', 2, '9606', file_checksum(str(tmp_path / 'team_a' / 'Agroup_2_9606.txt')))]
+
+
+def test_zip_members_checksum(teams, tmp_path):
+    archive = str(tmp_path / 'team_a.zip')
+    with zipfile.ZipFile(archive, 'w') as obj:
+        for name in ('Agroup_1_9606.txt', 'Agroup_2_9606.txt'):
+            obj.write(str(tmp_path / 'team_a' / name), name)
+    checksums = [checksum for name, model, taxon, opener, checksum in submission_files(archive)]
+    with zipfile.ZipFile(archive) as obj:
+        assert checksums == ['crc32:%08x:%d' % (i.CRC, i.file_size) for i in obj.infolist()]
+    #the two files hold the same predictions under different model numbers
+    assert checksums[0] != checksums[1]
+
+
+def jobs(store, status=None):
+    '''
+    (team, model, taxon, ontology) of every job in the store
+    '''
+    return sorted((k[0], k[1], k[2], k[6]) for k, r in store.records.items() if status in (None, r['status']))
+
+
+def test_restart_after_a_crash(teams, tmp_path):
+    store_path = str(tmp_path / 'store.jsonl')
+    crashing = Evaluator(crash='Agroup_2_9606.txt')
+    with pytest.raises(KeyboardInterrupt):
+        run(read_manifest(teams), ResultStore(store_path), crashing)
+    assert [c[1] for c in crashing.calls] == ['Agroup_1_9606.txt', 'Agroup_2_9606.txt']
+    #a record cut short by the crash is skipped
+    with open(store_path, 'a') as out:
+        out.write('{"team": "team A", "mod')
+    store = ResultStore(store_path)
+    assert jobs(store) == [('team A', 1, '9606', onto) for onto in sorted(ONTOLOGIES)]
+    evaluator = Evaluator()
+    run(read_manifest(teams), store, evaluator)
+    assert [c[1] for c in evaluator.calls] == ['Agroup_2_9606.txt', 'Bgroup_1_10090.txt']
+    #and nothing is left for a third run
+    evaluator = Evaluator()
+    run(read_manifest(teams), ResultStore(store_path), evaluator)
+    assert evaluator.calls == []
+
+
+def test_only_missing_ontologies_are_evaluated(teams, tmp_path):
+    store = ResultStore(str(tmp_path / 'store.jsonl'))
+    checksum = file_checksum(str(tmp_path / 'team_b' / 'Bgroup_1_10090.txt'))
+    store.add({'team': 'team_b', 'model': 1, 'taxon': '10090', 'ontology': 'cco', 'checksum': checksum,
+               'status': 'ok', 'exist': False})
+    evaluator = Evaluator()
+    run(read_manifest(teams)[1:], store, evaluator)
+    assert evaluator.calls == [('team_b', 'Bgroup_1_10090.txt', ['bpo', 'mfo'])]
+    #refresh evaluates everything again
+    evaluator = Evaluator()
+    run(read_manifest(teams)[1:], store, evaluator, refresh=True)
+    assert evaluator.calls == [('team_b', 'Bgroup_1_10090.txt', ONTOLOGIES)]
+
+
+def test_failed_jobs_retried_on_request(teams, tmp_path):
+    store_path = str(tmp_path / 'store.jsonl')
+    run(read_manifest(teams), ResultStore(store_path), Evaluator(fail=['Agroup_2_9606.txt']))
+    store = ResultStore(store_path)
+    assert jobs(store, 'error') == [('team A', 2, '9606', onto) for onto in sorted(ONTOLOGIES)]
+    assert [r['error'] for r in store.records.values() if r['status'] == 'error'] == ["ValueError('bad file')"] * 3
+    evaluator = Evaluator()
+    run(read_manifest(teams), store, evaluator)
+    assert evaluator.calls == []
+    run(read_manifest(teams), store, evaluator, retry_failed=True)
+    assert [c[1] for c in evaluator.calls] == ['Agroup_2_9606.txt']
+    assert all(r['status'] == 'ok' for r in ResultStore(store_path).records.values())
+    #the failed records are still in the file until it is compacted
+    with open(store_path) as handle:
+        assert len(handle.readlines()) == 12
+    store.compact()
+    with open(store_path) as handle:
+        records = [json.loads(l) for l in handle]
+    assert len(records) == 9 and all(r['status'] == 'ok' for r in records)
+
+
+def test_any_error_is_checkpointed_and_the_batch_goes_on(teams, tmp_path):
+    store = ResultStore(str(tmp_path / 'store.jsonl'))
+    evaluator = Evaluator(fail=['Agroup_1_9606.txt'], error=IndexError('list index out of range'))
+    run(read_manifest(teams), store, evaluator)
+    assert [c[1] for c in evaluator.calls] == ['Agroup_1_9606.txt', 'Agroup_2_9606.txt', 'Bgroup_1_10090.txt']
+    assert jobs(store, 'error') == [('team A', 1, '9606', onto) for onto in sorted(ONTOLOGIES)]
+    assert len(jobs(store, 'ok')) == 6
+
+
+def test_replaced_file_is_evaluated_again(teams, tmp_path):
+    store_path = str(tmp_path / 'store.jsonl')
+    run(read_manifest(teams), ResultStore(store_path), Evaluator())
+    write_submission(str(tmp_path / 'team_b' / 'Bgroup_1_10090.txt'), PREDICTIONS[:4], 'Bgroup', 1)
+    store = ResultStore(store_path)
+    evaluator = Evaluator()
+    run(read_manifest(teams), store, evaluator)
+    assert evaluator.calls == [('team_b', 'Bgroup_1_10090.txt', ONTOLOGIES)]
+    #only the last evaluation of the file is ranked, and kept by compact()
+    assert len(store.current()) == 9
+    assert write_leaderboard(store, str(tmp_path / 'leaderboard.txt')) == 9
+    store.compact()
+    assert len(ResultStore(store_path).records) == 9
+
+
+def test_types_and_modes_share_a_store(teams, tmp_path):
+    store_path = str(tmp_path / 'store.jsonl')
+    run(read_manifest(teams), ResultStore(store_path, 'type1', 'full'), Evaluator())
+    evaluator = Evaluator()
+    store = ResultStore(store_path, 'type1', 'partial')
+    run(read_manifest(teams), store, evaluator)
+    assert len(evaluator.calls) == 3
+    assert len(store.records) == 18 and len(store.current()) == 9
+    assert set((r['type'], r['mode']) for r in store.current()) == set([('type1', 'partial')])
+    evaluator = Evaluator()
+    run(read_manifest(teams), ResultStore(store_path, 'type1', 'full'), evaluator)
+    assert evaluator.calls == []
+
+
+def test_leaderboard_ranks(teams, tmp_path):
+    store = ResultStore(str(tmp_path / 'store.jsonl'))
+    run(read_manifest(teams), store, Evaluator())
+    store.add({'team': 'team_c', 'model': 1, 'taxon': '9606', 'ontology': 'bpo', 'status': 'ok', 'exist': False,
+               'author': 'Cgroup', 'fmax': None, 'threshold': None, 'coverage': None})
+    out_path = str(tmp_path / 'leaderboard.txt')
+    assert write_leaderboard(store, out_path) == 9
+    with open(out_path) as handle:
+        rows = [l.rstrip('\n').split('\t') for l in handle][1:]
+    assert [r[:6] for r in rows if r[0] == 'bpo'] == [['bpo', '10090', '1', 'team_b', 'Bgroup', '1'],
+                                                    ['bpo', '9606', '1', 'team A', 'Agroup', '2'],
+                                                    ['bpo', '9606', '2', 'team A', 'Agroup', '1']]
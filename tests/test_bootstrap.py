@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Bootstrap resamples of the benchmark proteins, against Fmax recomputed on every resample
+"""
+
+import numpy
+import pytest
+import precrec_main
+from precrec.bootstrap import Bootstrap, benchmark_proteins, confidence_interval, counted_proteins, paired_test
+from precrec.GOPred import GOPred
+from precrec.fmax import INTERVAL, threshold_grid
+from precrec.precRec import PrecREC, read_benchmark
+
+
+def bpo_scores(cafa):
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    return PrecREC(read_benchmark('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo), parts['bpo'])
+
+
+def resampled_fmax(c, counts, proteins, weights, full):
+    '''
+    Fmax of one resample, every protein repeated as many times as it was drawn
+    '''
+    rows = dict((p, i) for i, p in enumerate(counts.proteins))
+    precision = numpy.zeros(len(counts.thresholds))
+    counta = numpy.zeros(len(counts.thresholds))
+    recall = numpy.zeros(len(counts.thresholds))
+    nbench = 0
+    for p, w in zip(proteins, weights):
+        if full or p in c.counted:
+            nbench += w
+        if p in rows:
+            i = rows[p]
+            predicted = counts.count[i] > 0
+            precision += w * numpy.where(predicted, counts.tp[i] / numpy.maximum(counts.count[i], 1), 0.0)
+            counta += w * predicted
+            recall += w * counts.tp[i] / counts.ntrue[i]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        pr = precision / counta
+        rc = recall / nbench
+        f = 2 * pr * rc / (pr + rc)
+    f[~numpy.isfinite(f)] = 0.0
+    return f.max()
+
+
+def test_counted_proteins_include_obsolete_only_ones(cafa):
+    c = bpo_scores(cafa)
+    assert c.counted == ['T96060000001', 'T96060000002', 'T96060000003']
+    assert len(c.counted) == c.countb
+    assert 'T96060000003' not in c.counts(threshold_grid(INTERVAL)).proteins
+
+
+@pytest.mark.parametrize('full', [False, True])
+def test_resamples_match_fmax_recomputed(cafa, full):
+    c = bpo_scores(cafa)
+    counts = c.counts(threshold_grid(INTERVAL))
+    boot = Bootstrap(benchmark_proteins(c.true_terms), 30, seed=3, batch=7)
+    samples = boot.fmax([counts], full=full, counted=[c.counted])[0]
+    weights = numpy.concatenate(list(boot.resamples()))
+    assert len(samples) == 30
+    for sample, w in zip(samples, weights):
+        assert sample == pytest.approx(resampled_fmax(c, counts, boot.proteins, w, full))
+    #the same seed gives the same resamples
+    assert (boot.fmax([counts], full=full, counted=[c.counted])[0] == samples).all()
+
+
+def test_fmax_bootstrap_point_estimate(cafa):
+    c = bpo_scores(cafa)
+    fmax, lower, upper, samples = c.Fmax_bootstrap('partial', n=200)
+    assert fmax == c.Fmax_output('partial')[2]
+    assert (lower, upper) == confidence_interval(samples)
+    assert lower <= upper
+    diff, lower, upper, p = paired_test(samples, samples)
+    assert (diff, lower, upper, p) == (0.0, 0.0, 0.0, 1.0)
+
+
+def test_report_matches_results(cafa, monkeypatch):
+    monkeypatch.chdir(cafa.folder)
+    precrec_main.main(precrec_main.parse_args(
+        [cafa.submission, '-o', cafa.obo, '-b', cafa.bfolder, '--no-plot',
+         '-t', 'type1', '-m', 'partial', 'full', '-bootstrap', '50', '-title', 'boot']))
+    with open('results/Testgroup_1_9606.txt_results.txt') as handle:
+        blocks = handle.read().split('\n\n')
+    expected = {}
+    for block, mode in zip(blocks, ('partial', 'full')):
+        for line in block.split('\n'):
+            if line[:4] in ('bpo:', 'mfo:', 'cco:'):
+                expected[(line[:3], mode)] = float(line.split('\t')[1])
+    with open('results/boot_bootstrap.txt') as handle:
+        report = handle.read().split('\n\n')[1:]
+    assert len(report) == 6
+    for block in report:
+        lines = block.strip().split('\n')
+        onto = lines[0].split('\t')[0].split(':')[1]
+        mode = lines[0].split('\t')[3].split(':')[1]
+        name, fmax, lower, upper = lines[2].split('\t')
+        assert name == 'Testgroup_1_9606'
+        #the point estimate is the Fmax of the results file,
+        #in partial mode too, where T96060000003 has only an obsolete BPO term
+        assert float(fmax) == expected[(onto, mode)]
+        assert float(lower) <= float(upper)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Propagated benchmarks memoized across prediction files
+"""
+
+import pytest
+import precrec_main
+from precrec.cache import BenchmarkCache
+from precrec.precRec import read_benchmark
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, onto, taxon, TYPE, folder, obo_path):
+        self.calls.append((onto, taxon, TYPE))
+        return read_benchmark(onto, taxon, TYPE, folder, obo_path)
+
+
+def test_hits_and_least_recently_used_eviction(cafa):
+    loader = CountingLoader()
+    cache = BenchmarkCache(loader, 2)
+    bpo = cache.get('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    #any case of the ontology, the same benchmark
+    assert cache.get('BPO', 'HUMAN', 'type1', cafa.bfolder, cafa.obo) is bpo
+    assert sorted(bpo.true_terms) == sorted(read_benchmark('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo).true_terms)
+    cache.get('mfo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    cache.get('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    #mfo is the least recently used
+    cache.get('cco', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert cache.get('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo) is bpo
+    cache.get('mfo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert loader.calls == [('bpo', 'HUMAN', 'type1'), ('mfo', 'HUMAN', 'type1'),
+                            ('cco', 'HUMAN', 'type1'), ('mfo', 'HUMAN', 'type1')]
+    assert (cache.hits, cache.misses) == (3, 4)
+    assert len(cache.benchmarks) == 2
+
+
+def test_keyed_by_taxon_type_and_ontology_file(cafa):
+    loader = CountingLoader()
+    cache = BenchmarkCache(loader)
+    cache.get('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    cache.get('bpo', 'MOUSE', 'type1', cafa.bfolder, cafa.obo)
+    cache.get('bpo', 'HUMAN', 'type2', cafa.bfolder, cafa.obo)
+    assert cache.misses == 3
+    #an edited ontology file gives new benchmarks
+    with open(cafa.obo, 'a') as out:
+        out.write('\n[Term]\nid: GO:0000006\nnamespace: biological_process\nis_a: GO:0000005\n')
+    cache.get('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert (cache.hits, cache.misses) == (0, 4)
+
+
+def test_size_at_least_one():
+    with pytest.raises(ValueError):
+        BenchmarkCache(read_benchmark, 0)
+
+
+def test_files_of_one_taxon_share_the_benchmarks(cafa, monkeypatch):
+    monkeypatch.chdir(cafa.folder)
+    other = cafa.add_submission('Othergroup', 1, '9606', [('T96060000001', 'GO:0000004', '0.50')])
+    loader = CountingLoader()
+    cache = BenchmarkCache(loader)
+    precrec_main.main(precrec_main.parse_args(
+        [cafa.submission, other, '-o', cafa.obo, '-b', cafa.bfolder, '--no-plot', '-t', 'type1', '-m', 'partial']), cache)
+    #the second file reuses the three benchmarks of the first
+    assert sorted(loader.calls) == [('bpo', 'HUMAN', 'type1'), ('cco', 'HUMAN', 'type1'), ('mfo', 'HUMAN', 'type1')]
+    assert cache.hits == 3
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Propagated benchmarks compiled to an artifact and mapped back, against the dictionaries of sets
+"""
+
+import os
+import pytest
+import precrec.annotations
+import precrec.ontology
+from conftest import TERMS, unwritable_folder
+from test_ontology import ancestor_sets, write_ancestors
+from precrec.annotations import CompiledBenchmark, CompiledLoader, TrueTerms, annotated_proteins, \
+    benchmark_artifact_path, term_array, true_sizes
+from precrec.GOPred import GOPred
+from precrec.ontology import ONTOLOGIES, load_ontology
+from precrec.precRec import PrecREC, benchmark, read_benchmark
+
+
+class CountingLoader:
+    '''
+    read_benchmark, counting its calls
+    '''
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, onto, taxon, TYPE, folder, obo_path):
+        self.calls += 1
+        return read_benchmark(onto, taxon, TYPE, folder, obo_path)
+
+
+def artifacts(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith('.benchmark'))
+
+
+@pytest.mark.parametrize('onto', ONTOLOGIES)
+@pytest.mark.parametrize('TYPE', ['type1', 'type2', 'all'])
+def test_round_trip(cafa, tmp_path, onto, TYPE):
+    expected = read_benchmark(onto, 'HUMAN', TYPE, cafa.bfolder, cafa.obo)
+    compiled = CompiledLoader(read_benchmark, str(tmp_path))(onto, 'HUMAN', TYPE, cafa.bfolder, cafa.obo)
+    assert isinstance(compiled, CompiledBenchmark) and isinstance(compiled.true_terms, TrueTerms)
+    true_terms = compiled.true_terms
+    #same proteins in the same order, same propagated terms
+    assert list(true_terms) == list(expected.true_terms)
+    assert dict(true_terms) == dict(expected.true_terms)
+    assert len(true_terms) == len(expected.true_terms)
+    assert compiled.ontology.checksum == expected.ontology.checksum
+    proteins = list(expected.true_terms) + ['T96060000007']
+    assert true_sizes(true_terms, proteins).tolist() == true_sizes(expected.true_terms, proteins).tolist()
+    assert annotated_proteins(true_terms) == annotated_proteins(expected.true_terms)
+    for p in proteins:
+        assert term_array(true_terms, p).tolist() == sorted(term_array(expected.true_terms, p).tolist())
+    assert 'T96060000007' not in true_terms
+    assert true_terms['T96060000007'] == frozenset()
+
+
+@pytest.mark.parametrize('engine', ['sparse', 'loop'])
+def test_same_scores(cafa, tmp_path, engine):
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    loader = CompiledLoader(read_benchmark, str(tmp_path))
+    for onto in ONTOLOGIES:
+        c = PrecREC(read_benchmark(onto, 'HUMAN', 'all', cafa.bfolder, cafa.obo), parts[onto], engine)
+        compiled = PrecREC(loader(onto, 'HUMAN', 'all', cafa.bfolder, cafa.obo), parts[onto], engine)
+        assert (compiled.countb, compiled.obsolete, compiled.counted) == (c.countb, c.obsolete, c.counted)
+        for mode in ('partial', 'full'):
+            #repr, so that the nan precision of empty thresholds compares equal
+            assert repr(compiled.Fmax_output(mode)) == repr(c.Fmax_output(mode))
+
+
+def test_compiled_once(cafa, tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    os.mkdir(cache_dir)
+    loader = CountingLoader()
+    for _ in range(2):
+        #a new CompiledLoader, as in the next run
+        CompiledLoader(loader, cache_dir)('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert loader.calls == 1
+    assert capsys.readouterr().err.count('compiling benchmark') == 1
+    assert len(artifacts(cache_dir)) == 1
+    #another benchmark type is another artifact
+    CompiledLoader(loader, cache_dir)('bpo', 'HUMAN', 'type2', cafa.bfolder, cafa.obo)
+    assert loader.calls == 2 and len(artifacts(cache_dir)) == 2
+    #next to the OBO file by default
+    path = benchmark_artifact_path(cafa.obo, 'bpo_HUMAN_type1', '0123456789abcdef0123')
+    assert os.path.dirname(path) == os.path.dirname(os.path.abspath(cafa.obo))
+    assert os.path.basename(path) == 'test.obo.bpo_HUMAN_type1.0123456789abcdef.benchmark'
+
+
+def test_obo_file_checksummed_once(cafa, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    os.mkdir(cache_dir)
+    CompiledLoader(read_benchmark, cache_dir)('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    checksummed = []
+    file_checksum = precrec.ontology.file_checksum
+    counting = lambda path: checksummed.append(path) or file_checksum(path)
+    for module in (precrec.ontology, precrec.annotations):
+        monkeypatch.setattr(module, 'file_checksum', counting, raising=False)
+    #misses of other benchmarks reuse the checksum of the loaded ontology
+    for TYPE in ('type2', 'all'):
+        CompiledLoader(read_benchmark, cache_dir)('bpo', 'HUMAN', TYPE, cafa.bfolder, cafa.obo)
+    assert checksummed == [] and len(artifacts(cache_dir)) == 3
+
+
+def test_rebuilt_when_inputs_change(cafa, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    os.mkdir(cache_dir)
+    loader = CountingLoader()
+    compiled = CompiledLoader(loader, cache_dir)('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert 'GO:0000003' not in [compiled.ontology.terms[i] for i in compiled.true_terms['T96060000004']]
+    #a new annotation in the benchmark folder
+    with open(cafa.leafonly('bpo'), 'a') as out:
+        out.write('T96060000004\tGO:0000005\n')
+    compiled = CompiledLoader(loader, cache_dir)('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert loader.calls == 2
+    assert 'GO:0000003' in [compiled.ontology.terms[i] for i in compiled.true_terms['T96060000004']]
+    #a new term in the OBO file
+    with open(cafa.obo, 'a') as out:
+        out.write('\n[Term]\nid: GO:0000006\nname: GO:0000006\nnamespace: biological_process\nis_a: GO:0000005 ! GO:0000005\n')
+    compiled = CompiledLoader(loader, cache_dir)('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert loader.calls == 3
+    assert len(compiled.ontology) == len(TERMS) + 1
+    assert dict(compiled.true_terms) == dict(read_benchmark('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo).true_terms)
+    assert len(artifacts(cache_dir)) == 3
+
+
+def test_unwritable_folder_falls_back_to_the_user_cache(cafa, tmp_path, user_cache, monkeypatch):
+    cache_dir = unwritable_folder(tmp_path)
+    loader = CountingLoader()
+    for _ in range(2):
+        compiled = CompiledLoader(loader, cache_dir)('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert loader.calls == 1 and isinstance(compiled, CompiledBenchmark)
+    assert len(artifacts(user_cache)) == 1
+    #nowhere to write: the propagated benchmark is used as it is
+    monkeypatch.setenv('PRECREC_CACHE', cache_dir)
+    bench = CompiledLoader(loader, cache_dir)('bpo', 'HUMAN', 'type2', cafa.bfolder, cafa.obo)
+    assert loader.calls == 2 and not isinstance(bench, CompiledBenchmark)
+    assert dict(bench.true_terms) == dict(read_benchmark('bpo', 'HUMAN', 'type2', cafa.bfolder, cafa.obo).true_terms)
+
+
+def test_ancestors_file_benchmark_is_not_compiled(cafa, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    os.mkdir(cache_dir)
+    path = str(tmp_path / 'test.obo_ancestors_bpo.txt')
+    write_ancestors(path, ancestor_sets())
+
+    def from_ancestors(onto, taxon, TYPE, folder, obo_path):
+        b = benchmark(path, cafa.leafonly(onto))
+        b.propagate()
+        return b
+    b = CompiledLoader(from_ancestors, cache_dir)('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    #its term indices are not those of the compiled ontology
+    assert not isinstance(b, CompiledBenchmark)
+    assert artifacts(cache_dir) == []
+    assert load_ontology(cafa.obo).checksum != getattr(b.ontology, 'checksum', None)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+The ontology artifact compiled from the OBO file: built once, reused, rebuilt when the OBO file changes
+"""
+
+import io
+import os
+import numpy
+import pytest
+from conftest import unwritable_folder
+from precrec.arrayfile import read_arrays, read_meta, write_arrays
+from precrec.obo import read_obo
+from precrec.ontology import ARTIFACT_VERSION, artifact_path, file_checksum, load_ontology
+
+
+def artifacts(folder):
+    return sorted(f for f in os.listdir(folder) if f.endswith('.ontology'))
+
+
+def test_read_obo_keeps_is_a_part_of_and_obsolete():
+    obo = io.StringIO(u'format-version: 1.2\n\n[Term]\nid: GO:0000002\nnamespace: biological_process\n'
+                      u'is_a: GO:0000001 ! parent\nrelationship: part_of GO:0000003 ! whole\n'
+                      u'relationship: regulates GO:0000004\n\n[Typedef]\nid: part_of\n\n'
+                      u'[Term]\nid: GO:0000009\nis_obsolete: true\n')
+    terms = read_obo(obo)
+    assert [t.id for t in terms] == ['GO:0000002', 'GO:0000009']
+    assert terms[0].parents == ['GO:0000001', 'GO:0000003']
+    assert terms[0].namespace == 'biological_process'
+    assert (terms[0].obsolete, terms[1].obsolete) == (False, True)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_array_file_round_trip(tmp_path, compress):
+    path = str(tmp_path / 'arrays.bin')
+    a = numpy.arange(10, dtype=numpy.int64)
+    b = numpy.array(['GO:1', 'GO:22'], dtype='S5')
+    c = numpy.zeros((0,), dtype=numpy.float32)
+    write_arrays(path, [('a', a), ('b', b), ('c', c)], {'key': 'value'}, compress=compress)
+    assert read_meta(path) == {'key': 'value'}
+    meta, arrays = read_arrays(path)
+    assert meta == {'key': 'value'}
+    assert (arrays['a'] == a).all() and (arrays['b'] == b).all() and len(arrays['c']) == 0
+    assert arrays['b'].dtype == b.dtype
+    assert not arrays['a'].flags.writeable
+    with open(str(tmp_path / 'other.bin'), 'wb') as out:
+        out.write(b'something else')
+    with pytest.raises(ValueError):
+        read_meta(str(tmp_path / 'other.bin'))
+
+
+def test_compiled_once_and_reused(cafa):
+    onto = load_ontology(cafa.obo)
+    path = artifact_path(cafa.obo, file_checksum(cafa.obo))
+    assert artifacts(cafa.folder) == [os.path.basename(path)]
+    meta = read_meta(path)
+    assert meta['checksum'] == onto.checksum == file_checksum(cafa.obo)
+    assert meta['version'] == ARTIFACT_VERSION
+    #the same process gets the same Ontology back
+    assert load_ontology(cafa.obo) is onto
+    #a new load maps the artifact instead of compiling it again
+    mtime = os.stat(path).st_mtime
+    again = load_ontology(cafa.obo, reuse=False)
+    assert again is not onto and os.stat(path).st_mtime == mtime
+    assert again.terms == onto.terms
+    assert (again.offsets == onto.offsets).all() and (again.ancestors == onto.ancestors).all()
+    assert (again.namespaces == onto.namespaces).all() and again.roots == onto.roots
+    assert (again.parents == onto.parents).all()
+
+
+def test_recompiled_when_the_obo_file_changes(cafa):
+    onto = load_ontology(cafa.obo)
+    with open(cafa.obo, 'a') as out:
+        out.write('\n[Term]\nid: GO:0000006\nnamespace: biological_process\nis_a: GO:0000005\n')
+    #a different size, the stamp no longer matches
+    changed = load_ontology(cafa.obo)
+    assert changed is not onto
+    assert 'GO:0000006' in changed and 'GO:0000006' not in onto
+    i = changed.term_id('GO:0000006')
+    assert set(changed.terms[j] for j in changed.get_ancestors(i)) == set(['GO:0000005', 'GO:0000003', 'GO:0008150'])
+    #one artifact per version of the OBO file
+    assert len(artifacts(cafa.folder)) == 2
+
+
+def test_stale_artifact_is_rebuilt(cafa, tmp_path):
+    cache = str(tmp_path / 'cache')
+    os.makedirs(cache)
+    path = artifact_path(cafa.obo, file_checksum(cafa.obo), cache)
+    write_arrays(path, [('terms', numpy.array([b'GO:1']))], {'version': ARTIFACT_VERSION - 1,
+                                                             'checksum': file_checksum(cafa.obo)})
+    onto = load_ontology(cafa.obo, cache_dir=cache)
+    assert len(onto) == 16
+    assert read_meta(path)['version'] == ARTIFACT_VERSION
+    assert artifacts(cafa.folder) == []
+
+
+def test_unwritable_folder_falls_back_to_the_user_cache(cafa, tmp_path, user_cache, capsys):
+    cache_dir = unwritable_folder(tmp_path)
+    onto = load_ontology(cafa.obo, cache_dir)
+    path = artifact_path(cafa.obo, onto.checksum, cache_dir)
+    assert os.listdir(user_cache) == [os.path.basename(path)]
+    capsys.readouterr()
+    again = load_ontology(cafa.obo, cache_dir, reuse=False)
+    assert 'compiling' not in capsys.readouterr().err
+    assert again.terms == onto.terms and (again.ancestors == onto.ancestors).all()
+
+
+def test_compiled_in_memory_when_nothing_can_be_written(cafa, tmp_path, monkeypatch, capsys):
+    cache_dir = unwritable_folder(tmp_path)
+    monkeypatch.setenv('PRECREC_CACHE', cache_dir)
+    onto = load_ontology(cafa.obo, cache_dir)
+    assert 'not cached' in capsys.readouterr().err
+    mapped = load_ontology(cafa.obo)
+    assert onto.terms == mapped.terms and onto.roots == mapped.roots
+    assert (onto.offsets == mapped.offsets).all() and (onto.ancestors == mapped.ancestors).all()
+    assert (onto.parents == mapped.parents).all()
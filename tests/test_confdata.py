@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Binary printConfidence output read back, against the text output
+"""
+
+import pytest
+from precrec.arrayfile import write_arrays
+from precrec.confdata import read_confidence
+from precrec.GOPred import GOPred
+from precrec.precRec import PrecREC, read_benchmark
+
+
+def scores(cafa, onto):
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    return PrecREC(read_benchmark(onto, 'HUMAN', 'all', cafa.bfolder, cafa.obo), parts[onto])
+
+
+def text_rows(path):
+    rows = []
+    with open(path) as handle:
+        for inline in handle:
+            protindex, confidence, truth = inline.rstrip('\n').split('\t')
+            rows.append((int(protindex), float(confidence), truth == 'True'))
+    return rows
+
+
+@pytest.mark.parametrize('onto', ['bpo', 'mfo', 'cco'])
+@pytest.mark.parametrize('compress', [False, True])
+def test_binary_matches_text(cafa, tmp_path, onto, compress):
+    c = scores(cafa, onto)
+    text = str(tmp_path / 'confdata.txt')
+    binary = str(tmp_path / 'confdata.bin')
+    c.printConfidence(text)
+    c.printConfidence(binary, 'binary', compress)
+    meta, arrays = read_confidence(binary)
+    assert meta['version'] == 1
+    assert list(zip(arrays['protein'].tolist(), (arrays['confidence'] / 100.0).tolist(), arrays['truth'].tolist())) == text_rows(text)
+    #protein IDs in protindex order, those outside the benchmark included
+    assert arrays['proteins'].astype(str).tolist() == list(c.predicted)
+    #and every row names its protein and term
+    for p, t, conf, truth in zip(arrays['protein'].tolist(), arrays['term'].tolist(),
+                                 arrays['confidence'].tolist(), arrays['truth'].tolist()):
+        prot = list(c.predicted)[p - 1]
+        assert c.predicted[prot][t] == [conf / 100.0, truth]
+
+
+def test_nothing_predicted(cafa, tmp_path):
+    path = cafa.add_submission('Testgroup', 2, '9606', [('T96060000007', 'GO:0000001', '0.50')])
+    pred = GOPred()
+    with open(path) as handle:
+        c = PrecREC(read_benchmark('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo), pred.read_and_split(cafa.obo, handle)['bpo'])
+    binary = str(tmp_path / 'confdata.bin')
+    c.printConfidence(binary, 'binary')
+    arrays = read_confidence(binary)[1]
+    assert arrays['proteins'].astype(str).tolist() == ['T96060000007']
+    assert len(arrays['protein']) == len(arrays['term']) == len(arrays['confidence']) == len(arrays['truth']) == 0
+
+
+def test_other_files_are_refused(cafa, tmp_path):
+    path = str(tmp_path / 'other.bin')
+    #an array file without the confidence data version
+    write_arrays(path, [('ia', [0.0])], {'corpus': 'x'})
+    with pytest.raises(ValueError):
+        read_confidence(path)
+    with pytest.raises(ValueError):
+        scores(cafa, 'bpo').printConfidence(path, 'csv')
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+The single-pass threshold sweep against the per-threshold precision_recall loop
+"""
+
+import math
+import pytest
+from precrec.precRec import PrecREC, benchmark
+from precrec.GOPred import GOPred
+from precrec.fmax import INTERVAL, count_predictions, threshold_grid
+from precrec.ontology import load_ontology
+
+
+def scores(cafa, onto, **kwargs):
+    ontology = load_ontology(cafa.obo)
+    bench = benchmark(ontology, cafa.leafonly(onto))
+    bench.propagate()
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        pred.read(handle)
+    return PrecREC(bench, pred.split(ontology)[onto], **kwargs)
+
+
+def loop_curve(c, nbench):
+    '''
+    precision and recall of every threshold from precision_recall(threshold)
+    '''
+    precision = []
+    recall = []
+    for t in threshold_grid(INTERVAL):
+        try:
+            p, r = c.precision_recall(t)
+        except ZeroDivisionError:
+            #no protein above the threshold
+            p, r = float('nan'), None
+        if r is None or nbench != c.countb:
+            r = sum(c.term_precision_recall(t, prot)[1] or 0.0 for prot in c.predicted) / nbench
+        precision.append(p)
+        recall.append(r)
+    return precision, recall
+
+
+def same(a, b):
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return a == pytest.approx(b, abs=1e-12)
+
+
+@pytest.mark.parametrize('onto', ['bpo', 'mfo', 'cco'])
+@pytest.mark.parametrize('mode', ['partial', 'full'])
+def test_sweep_matches_precision_recall(cafa, onto, mode):
+    c = scores(cafa, onto)
+    precision, recall, fmax, threshold, coverage = c.Fmax_output(mode)
+    nbench = c.countb if mode == 'partial' else len(c.true_terms)
+    expected_precision, expected_recall = loop_curve(c, nbench)
+    assert len(precision) == INTERVAL
+    assert all(same(a, b) for a, b in zip(precision, expected_precision))
+    assert all(same(a, b) for a, b in zip(recall, expected_recall))
+    f = [2 * p * r / (p + r) if p == p and p + r > 0 else -1.0 for p, r in zip(expected_precision, expected_recall)]
+    assert fmax == pytest.approx(max(f))
+    #the largest threshold reaching fmax
+    best = max(i for i, v in enumerate(f) if v == pytest.approx(max(f)))
+    assert threshold == pytest.approx(threshold_grid(INTERVAL)[best])
+    assert coverage == pytest.approx(c.counta[threshold_grid(INTERVAL)[best]] / float(nbench))
+
+
+def test_obsolete_only_protein_counts_in_partial_mode(cafa):
+    c = scores(cafa, 'bpo')
+    #T96060000001, T96060000002 and T96060000005 have propagated terms,
+    #T96060000003 only an obsolete one
+    assert c.countb == 4
+    assert 'T96060000003' not in c.predicted
+    assert c.getObsolete() == set(['GO:0000009'])
+    recall = c.Fmax_output('partial')[1]
+    #at 0.01, T96060000001, T96060000002 and T96060000005 find all their true terms
+    #and T96060000003 none
+    assert recall[0] == pytest.approx(3 / 4.0)
+
+
+def test_weighted_output_uses_the_constructor_ia(cafa):
+    c = scores(cafa, 'mfo')
+    with pytest.raises(ValueError):
+        c.weighted_output('partial')
+    ia = [1.0] * len(c.ontology)
+    c = scores(cafa, 'mfo', ia=ia)
+    fm, wfm, sm = c.weighted_output('full')
+    assert fm[2:] == c.Fmax_output('full')[2:]
+    #every term weighs the same, so the weighted curve is the plain one
+    assert wfm[2] == pytest.approx(fm[2])
+    counts = count_predictions(c.predicted, c.true_terms, threshold_grid(INTERVAL), ia)
+    #T100900000001 has no prediction, it misses its 3 true terms
+    assert sm == counts.smin(len(c.true_terms), 3.0)
+
+
+def test_invalid_mode(cafa):
+    c = scores(cafa, 'cco')
+    with pytest.raises(ValueError):
+        c.Fmax_output('some')
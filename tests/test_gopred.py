@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar GOPred storage and the block fast path, against checking every line with prediction_check
+"""
+
+import gzip
+import io
+import pytest
+import precrec.GOPred
+from conftest import PREDICTIONS
+from precrec.GOPred import GOPred, prediction_check
+
+#spacing the fast path regex accepts: tabs, spaces, leading blanks and CRLF line ends
+LINES = ['AUTHOR Testgroup\n', 'MODEL 1\n', 'KEYWORDS sequence alignment, machine learning.\n',
+         'T96060000001\tGO:0000004\t0.80\n',
+         'T96060000001 GO:0000005 0.40\r\n',
+         '  T96060000002\t GO:0000005\t0.90  \n',
+         'EFI96060000001\tHP:0000118\t1.00\n',
+         'T96060000001\tGO:0000012\t0.07\n',
+         'T96060000002\tGO:0000004\t0.00\n',
+         'END\n']
+
+
+def handle(lines, name='Testgroup_1_9606.txt'):
+    h = io.StringIO(u''.join(lines))
+    h.name = name
+    return h
+
+
+def line_by_line(lines):
+    '''
+    (protein, term, confidence in hundredths) of every prediction line, in file order
+    '''
+    records = []
+    for inline in lines:
+        if inline.split()[0] in ('AUTHOR', 'MODEL', 'KEYWORDS', 'ACCURACY', 'END'):
+            continue
+        correct, errmsg, fields = prediction_check(inline)
+        assert correct, errmsg
+        records.append((fields[0], fields[1], int(round(float(fields[2]) * 100))))
+    return records
+
+
+def columns(pred):
+    protein_ids, term_ids, confidences = pred.columns()
+    return [(pred.proteins[p], pred.terms[t], c) for p, t, c in
+            zip(protein_ids.tolist(), term_ids.tolist(), confidences.tolist())]
+
+
+@pytest.mark.parametrize('block_lines', [1, 2, 3, 10000])
+def test_blocks_match_line_by_line(monkeypatch, block_lines):
+    monkeypatch.setattr(precrec.GOPred, 'BLOCK_LINES', block_lines)
+    pred = GOPred()
+    pred.read(handle(LINES))
+    assert columns(pred) == line_by_line(LINES)
+    assert (pred.author, pred.model, pred.taxon) == ('Testgroup', 1, '9606')
+    assert pred.keywords == ['sequence alignment', 'machine learning']
+    #proteins and terms are interned in order of appearance
+    assert pred.proteins == ['T96060000001', 'T96060000002', 'EFI96060000001']
+    assert pred.terms == ['GO:0000004', 'GO:0000005', 'HP:0000118', 'GO:0000012']
+
+
+def test_predictions_only_file_takes_the_fast_path(monkeypatch):
+    lines = ['%s\t%s\t%s\n' % p for p in PREDICTIONS]
+    calls = []
+    monkeypatch.setattr(GOPred, '_read_line', lambda self, inline, st: calls.append(inline))
+    pred = GOPred()
+    pred.read(handle(lines))
+    assert calls == []
+    assert columns(pred) == line_by_line(lines)
+
+
+def test_gzipped_lines(tmp_path):
+    path = str(tmp_path / 'Testgroup_1_9606.txt.gz')
+    with gzip.open(path, 'wt') as out:
+        out.write(''.join(LINES))
+    pred = GOPred()
+    with gzip.open(path) as h:
+        pred.read(h)
+    assert columns(pred) == line_by_line(LINES)
+
+
+def test_data_and_by_protein():
+    pred = GOPred()
+    pred.read(handle(LINES))
+    grouped = list(pred.by_protein())
+    assert [g[0] for g in grouped] == ['T96060000001', 'T96060000002', 'EFI96060000001']
+    assert grouped[0][1:] == (['GO:0000004', 'GO:0000005', 'GO:0000012'], [0.8, 0.4, 0.07])
+    assert pred.data['T96060000002'] == [{'term': 'GO:0000005', 'confidence': 0.9},
+                                        {'term': 'GO:0000004', 'confidence': 0.0}]
+    assert len(pred) == 6
+    #data is rebuilt once predictions are added
+    pred._add('T96060000009', 'GO:0000001', 50)
+    assert pred.data['T96060000009'] == [{'term': 'GO:0000001', 'confidence': 0.5}]
+
+
+@pytest.mark.parametrize('line', ['T96060000001\tGO:0000004\t1.50\n',
+                                  'T96060000001\tGO:0000004\n',
+                                  'X96060000001\tGO:0000004\t0.50\n',
+                                  'T96060000001\tGO:000000A\t0.50\n',
+                                  'T96060000001\tGO:0000004\t0.5\n'])
+@pytest.mark.parametrize('block_lines', [1, 10000])
+def test_errors_fall_back_to_the_line_checks(monkeypatch, line, block_lines):
+    monkeypatch.setattr(precrec.GOPred, 'BLOCK_LINES', block_lines)
+    pred = GOPred()
+    with pytest.raises(ValueError):
+        pred.read(handle(LINES[:4] + [line] + LINES[4:]))
+
+
+def test_record_order():
+    pred = GOPred()
+    with pytest.raises(ValueError):
+        pred.read(handle(LINES[1:2] + LINES[:1] + LINES[2:]))
+    pred = GOPred()
+    with pytest.raises(ValueError):
+        pred.read(handle(LINES[:-1]))
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Information accretion, its cached table, and weighted Fmax and Smin against a per-threshold recomputation
+"""
+
+import math
+import os
+import pytest
+import precrec.ia
+import precrec_main
+from conftest import TERMS, unwritable_folder
+from precrec.GOPred import GOPred
+from precrec.fmax import INTERVAL, threshold_grid
+from precrec.ia import information_accretion, load_ia, parent_lists, read_annotations
+from precrec.ontology import load_ontology, read_ancestors
+from precrec.precRec import PrecREC, read_benchmark
+
+CORPUS = [('P1', 'GO:0000004'), ('P2', 'GO:0000002'), ('P3', 'GO:0000005'), ('P4', 'GO:0000001'),
+          ('P5', 'GO:0000012'), ('P5', 'GO:0999999')]
+
+
+def write_corpus(cafa, annotations=CORPUS):
+    path = os.path.join(cafa.folder, 'corpus.txt')
+    with open(path, 'w') as out:
+        for protein, term in annotations:
+            out.write('%s\t%s\n' % (protein, term))
+    return path
+
+
+def test_information_accretion(cafa):
+    onto = load_ontology(cafa.obo)
+    annotations = read_annotations(write_corpus(cafa), onto)
+    #GO:0999999 is not in the ontology
+    assert len(annotations) == 5
+    ia = dict(zip(onto.terms, information_accretion(onto, annotations)))
+    #P(GO:0000001 | root): 3 of the 4 BPO proteins
+    assert ia['GO:0000001'] == pytest.approx(math.log(4 / 3.0, 2))
+    assert ia['GO:0000002'] == pytest.approx(math.log(3 / 2.0, 2))
+    assert ia['GO:0000003'] == pytest.approx(1.0)
+    #P1 is the only protein with both parents of GO:0000004
+    assert ia['GO:0000004'] == 0.0
+    assert ia['GO:0000005'] == pytest.approx(1.0)
+    assert ia['GO:0008150'] == 0.0 and ia['GO:0003674'] == 0.0
+    #nobody has GO:0000013
+    assert ia['GO:0000013'] == 0.0
+    assert ia['GO:0000012'] == 0.0 and ia['GO:0000011'] == 0.0
+
+
+def test_parents_of_an_ancestors_file(cafa, tmp_path):
+    onto = load_ontology(cafa.obo)
+    path = str(tmp_path / 'ancestors.txt')
+    with open(path, 'w') as out:
+        for i, term in enumerate(onto.terms):
+            out.write('%s\t%s\n' % (term, ','.join(onto.terms[a] for a in onto.get_ancestors(i))))
+    from_file = read_ancestors(path)
+    #the transitive reduction of the closure gives back the parents of the obo file
+    parents = dict((t, sorted(p)) for t, namespace, p, obsolete in TERMS)
+    assert dict((t, sorted(from_file.terms[p] for p in ps)) for t, ps in zip(from_file.terms, parent_lists(from_file))) == parents
+    assert dict((t, sorted(onto.terms[p] for p in ps)) for t, ps in zip(onto.terms, parent_lists(onto))) == parents
+
+
+def test_table_is_cached(cafa, tmp_path, monkeypatch):
+    onto = load_ontology(cafa.obo)
+    corpus = write_corpus(cafa)
+    ia = load_ia(onto, corpus)
+    assert len([f for f in os.listdir(cafa.folder) if f.endswith('.ia')]) == 1
+
+    def fail(*args):
+        raise AssertionError('information accretion computed again')
+    monkeypatch.setattr(precrec.ia, 'information_accretion', fail)
+    assert (load_ia(onto, corpus) == ia).all()
+    #a new corpus, a new table
+    monkeypatch.undo()
+    write_corpus(cafa, CORPUS[:3])
+    assert not (load_ia(onto, corpus) == ia).all()
+    cache = str(tmp_path / 'cache')
+    os.makedirs(cache)
+    load_ia(onto, corpus, cache)
+    assert len(os.listdir(cache)) == 1
+
+
+def test_unwritable_folder_falls_back_to_the_user_cache(cafa, tmp_path, user_cache, monkeypatch):
+    onto = load_ontology(cafa.obo)
+    corpus = write_corpus(cafa)
+    cache = unwritable_folder(tmp_path)
+    ia = load_ia(onto, corpus, cache)
+    assert len([f for f in os.listdir(user_cache) if f.endswith('.ia')]) == 1
+
+    def fail(*args):
+        raise AssertionError('information accretion computed again')
+    monkeypatch.setattr(precrec.ia, 'information_accretion', fail)
+    assert (load_ia(onto, corpus, cache) == ia).all()
+    #nowhere to write: computed in every run
+    monkeypatch.undo()
+    monkeypatch.setenv('PRECREC_CACHE', cache)
+    assert (load_ia(onto, corpus, cache) == ia).all()
+
+
+def weighted_curve(c, ia, nbench, missing):
+    '''
+    weighted precision, recall, ru and mi of every threshold, protein by protein
+    '''
+    curve = []
+    for t in threshold_grid(INTERVAL):
+        precision = recall = ru = mi = 0.0
+        counta = 0
+        for prot in c.predicted:
+            if c.predicted[prot] is None:
+                continue
+            above = set(term for term in c.predicted[prot] if c.predicted[prot][term][0] >= t)
+            true = c.true_terms[prot]
+            tp = sum(ia[term] for term in above & true)
+            count = sum(ia[term] for term in above)
+            wtrue = sum(ia[term] for term in true)
+            if count > 0:
+                precision += tp / count
+                counta += 1
+            if wtrue > 0:
+                recall += tp / wtrue
+            ru += sum(ia[term] for term in true - above)
+            mi += sum(ia[term] for term in above - true)
+        curve.append((precision / counta if counta else float('nan'), recall / nbench,
+                      (ru + missing) / nbench, mi / nbench))
+    return curve
+
+
+@pytest.mark.parametrize('mode', ['partial', 'full'])
+def test_weighted_fmax_and_smin(cafa, mode):
+    onto = load_ontology(cafa.obo)
+    ia = load_ia(onto, write_corpus(cafa))
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    b = read_benchmark('bpo', 'HUMAN', 'all', cafa.bfolder, cafa.obo)
+    c = PrecREC(b, parts['bpo'], ia=ia)
+    fm, wfm, sm = c.weighted_output(mode)
+    assert fm[1:] == c.Fmax_output(mode)[1:]
+    if mode == 'full':
+        nbench = len(b.true_terms)
+        #T96060000004 and T96060000006 are not predicted,
+        #T96060000003 only with an obsolete term: they miss all their true terms
+        missing = sum(ia[t] for p in ('T96060000003', 'T96060000004', 'T96060000006') for t in b.true_terms[p])
+    else:
+        nbench = c.countb
+        missing = 0.0
+    curve = weighted_curve(c, ia, nbench, missing)
+    assert [p for p in wfm[0] if p == p] == pytest.approx([p for p, r, u, m in curve if p == p])
+    assert wfm[1] == pytest.approx([r for p, r, u, m in curve])
+    f = [2 * p * r / (p + r) for p, r, u, m in curve if p == p and p + r > 0]
+    assert wfm[2] == pytest.approx(max(f))
+    assert sm[0] == pytest.approx([u for p, r, u, m in curve])
+    assert sm[1] == pytest.approx([m for p, r, u, m in curve])
+    s = [math.sqrt(u * u + m * m) for p, r, u, m in curve]
+    assert sm[2] == pytest.approx(min(s))
+    assert sm[3] == pytest.approx(threshold_grid(INTERVAL)[s.index(min(s))])
+
+
+def test_precrec_main_reports_weighted_scores(cafa, monkeypatch):
+    monkeypatch.chdir(cafa.folder)
+    corpus = write_corpus(cafa)
+    precrec_main.main(precrec_main.parse_args(
+        [cafa.submission, '-o', cafa.obo, '-b', cafa.bfolder, '--no-plot', '-t', 'type1', '-m', 'full', '-ia', corpus]))
+    with open('results/Testgroup_1_9606.txt_results.txt') as handle:
+        rows = dict((l.split('\t')[0][:-1], l.rstrip('\n').split('\t')[1:]) for l in handle if l[:4] in ('bpo:', 'mfo:', 'cco:'))
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    ia = load_ia(load_ontology(cafa.obo), corpus)
+    for onto in rows:
+        fm, wfm, sm = PrecREC(read_benchmark(onto, 'HUMAN', 'type1', cafa.bfolder, cafa.obo), parts[onto], ia=ia).weighted_output('full')
+        assert float(rows[onto][0]) == fm[2]
+        assert float(rows[onto][3]) == pytest.approx(wfm[2])
+        assert float(rows[onto][5]) == pytest.approx(sm[2])
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental re-evaluation against scoring from scratch, as submissions and benchmarks change
+"""
+
+import os
+import random
+import pytest
+from conftest import PREDICTIONS, write_submission
+from precrec.fmax import INTERVAL, threshold_grid
+from precrec.GOPred import GOPred
+from precrec.ia import information_accretion, read_annotations
+from precrec.incremental import score_incremental
+from precrec.ontology import ONTOLOGIES, load_ontology
+from precrec.precRec import PrecREC, benchmark
+from precrec.synthetic import make_inputs
+
+
+def split(path, ontology):
+    pred = GOPred()
+    with open(path) as handle:
+        return pred.read_and_split(ontology, handle)
+
+
+def propagated(ontology, leafonly):
+    b = benchmark(ontology, leafonly)
+    b.propagate()
+    return b
+
+
+def assert_same_as_scratch(score, b, GoPred, ia=None):
+    c = PrecREC(b, GoPred, ia=ia)
+    assert score.exist == c.exist
+    assert score.countb == c.countb
+    if not c.exist:
+        return
+    for mode in ('partial', 'full'):
+        #repr, so that the nan precision of empty thresholds compares equal
+        assert repr(score.Fmax_output(mode)) == repr(c.Fmax_output(mode))
+        if ia is not None:
+            assert repr(score.weighted_output(mode)) == repr(c.weighted_output(mode))
+
+
+@pytest.mark.parametrize('onto', ONTOLOGIES)
+def test_resubmission(cafa, tmp_path, onto):
+    ontology = load_ontology(cafa.obo)
+    b = propagated(ontology, cafa.leafonly(onto))
+    store = str(tmp_path / 'scores')
+    thresholds = threshold_grid(INTERVAL)
+    parts = split(cafa.submission, ontology)
+    first = score_incremental(store, parts[onto], b, thresholds)
+    assert first.rescored == first.countb
+    assert_same_as_scratch(first, b, parts[onto])
+    #nothing changed, nothing propagated again
+    again = score_incremental(store, parts[onto], b, thresholds)
+    assert again.rescored == 0
+    assert repr(again.Fmax_output('full')) == repr(first.Fmax_output('full'))
+    #T96060000001 gets another confidence, T96060000005 is not predicted anymore
+    changed = [(p, t, '0.35' if (p, t) == ('T96060000001', 'GO:0000004') else c) for p, t, c in PREDICTIONS]
+    changed = [(p, t, c) for p, t, c in changed if p != 'T96060000005']
+    write_submission(cafa.submission, changed)
+    parts = split(cafa.submission, ontology)
+    resubmitted = score_incremental(store, parts[onto], b, thresholds)
+    assert resubmitted.rescored == (1 if onto == 'bpo' else 0)
+    assert_same_as_scratch(resubmitted, b, parts[onto])
+
+
+def test_new_annotations(cafa, tmp_path):
+    ontology = load_ontology(cafa.obo)
+    store = str(tmp_path / 'scores')
+    thresholds = threshold_grid(INTERVAL)
+    parts = split(cafa.submission, ontology)
+    score_incremental(store, parts['bpo'], propagated(ontology, cafa.leafonly('bpo')), thresholds)
+    leafonly = str(tmp_path / 'leafonly_BPO.txt')
+    with open(cafa.leafonly('bpo')) as handle, open(leafonly, 'w') as out:
+        out.write(handle.read())
+        #an ancestor of a term T96060000001 already has changes nothing once propagated
+        out.write('T96060000001\tGO:0000001\n')
+        #a new term for T96060000002
+        out.write('T96060000002\tGO:0000002\n')
+    b = propagated(ontology, leafonly)
+    score = score_incremental(store, parts['bpo'], b, thresholds)
+    assert score.rescored == 1
+    assert_same_as_scratch(score, b, parts['bpo'])
+
+
+def test_obsolete_only_protein(cafa, tmp_path):
+    ontology = load_ontology(cafa.obo)
+    b = propagated(ontology, cafa.leafonly('bpo'))
+    parts = split(cafa.submission, ontology)
+    store = str(tmp_path / 'scores')
+    for rescored in (4, 0):
+        score = score_incremental(store, parts['bpo'], b, threshold_grid(INTERVAL))
+        assert score.rescored == rescored
+        #T96060000003 counts in partial mode without a row of counts
+        assert score.countb == 4
+        assert dict(zip(score.rows.proteins, score.rows.counted.tolist()))['T96060000003'] is False
+        assert_same_as_scratch(score, b, parts['bpo'])
+
+
+def test_store_discarded(cafa, tmp_path):
+    ontology = load_ontology(cafa.obo)
+    b = propagated(ontology, cafa.leafonly('bpo'))
+    parts = split(cafa.submission, ontology)
+    ia = information_accretion(ontology, read_annotations(cafa.leafonly('bpo'), ontology))
+    store = str(tmp_path / 'scores')
+    assert score_incremental(store, parts['bpo'], b, threshold_grid(INTERVAL)).rescored == 4
+    #another threshold grid, then an IA table, then another IA table
+    assert score_incremental(store, parts['bpo'], b, threshold_grid(50)).rescored == 4
+    score = score_incremental(store, parts['bpo'], b, threshold_grid(INTERVAL), ia)
+    assert score.rescored == 4
+    assert_same_as_scratch(score, b, parts['bpo'], ia)
+    assert score_incremental(store, parts['bpo'], b, threshold_grid(INTERVAL), ia).rescored == 0
+    assert score_incremental(store, parts['bpo'], b, threshold_grid(INTERVAL), ia * 2).rescored == 4
+    #a file that is not a store
+    with open(store, 'w') as out:
+        out.write('not scores\n')
+    assert score_incremental(store, parts['bpo'], b, threshold_grid(INTERVAL)).rescored == 4
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_changes(tmp_path, seed):
+    obo_path, benchmark_paths, pred_path = make_inputs(str(tmp_path), n_proteins=120, n_terms=6, n_true=3,
+                                                       depth=4, width=25, n_obsolete=3, seed=seed)
+    ontology = load_ontology(obo_path)
+    rng = random.Random(seed)
+    with open(pred_path) as handle:
+        lines = handle.read().split('\n')
+    thresholds = threshold_grid(INTERVAL)
+    for onto in ONTOLOGIES:
+        ia = information_accretion(ontology, read_annotations(benchmark_paths[onto], ontology))
+        b = propagated(ontology, benchmark_paths[onto])
+        store = str(tmp_path / ('%s.scores' % onto))
+        score_incremental(store, split(pred_path, ontology)[onto], b, thresholds, ia)
+    for _ in range(3):
+        #new confidences for some predictions, some others dropped
+        edited = []
+        for line in lines:
+            fields = line.split('\t')
+            if len(fields) == 3 and rng.random() < 0.05:
+                continue
+            if len(fields) == 3 and rng.random() < 0.05:
+                line = '%s\t%s\t%.2f' % (fields[0], fields[1], rng.randint(1, 100) / 100.0)
+            edited.append(line)
+        changed = str(tmp_path / os.path.basename(pred_path))
+        with open(changed, 'w') as out:
+            out.write('\n'.join(edited))
+        parts = split(changed, ontology)
+        for onto in ONTOLOGIES:
+            ia = information_accretion(ontology, read_annotations(benchmark_paths[onto], ontology))
+            b = propagated(ontology, benchmark_paths[onto])
+            score = score_incremental(str(tmp_path / ('%s.scores' % onto)), parts[onto], b, thresholds, ia)
+            assert score.rescored < score.countb
+            assert_same_as_scratch(score, b, parts[onto], ia)
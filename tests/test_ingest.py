@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Prediction files read straight out of folders, zip, tar(.gz) and gz archives
+"""
+
+import gzip
+import os
+import tarfile
+import zipfile
+import pytest
+from conftest import PREDICTIONS, write_submission
+from precrec.GOPred import GOPred
+from precrec.ingest import iter_members, map_members, members, open_member
+
+#(author, model, taxon, predictions) of every submission file
+FILES = [('Agroup', 1, '9606', PREDICTIONS),
+         ('Bgroup', 2, '9606', PREDICTIONS[:5]),
+         ('Cgroup', 1, '10090', [('T100900000001', 'GO:0000002', '0.60')])]
+
+
+def parse(handle):
+    '''
+    what the tests compare: header fields and predictions of a member
+    '''
+    pred = GOPred()
+    pred.read(handle)
+    return (pred.author, pred.model, pred.taxon, sorted((p, t, c) for p, terms, cs in pred.by_protein()
+                                                       for t, c in zip(terms, cs)))
+
+
+def expected():
+    return [(author, model, taxon, sorted((p, t, float(c)) for p, t, c in predictions))
+            for author, model, taxon, predictions in FILES]
+
+
+@pytest.fixture
+def plain(tmp_path):
+    '''
+    a folder holding the files of FILES
+    '''
+    folder = tmp_path / 'plain'
+    folder.mkdir()
+    for author, model, taxon, predictions in FILES:
+        write_submission(str(folder / ('%s_%s_%s.txt' % (author, model, taxon))), predictions, author, model)
+    return str(folder)
+
+
+def archives(plain, tmp_path):
+    '''
+    the same files as a zip, a tar.gz, a plain tar, and a folder of gz files
+    '''
+    names = sorted(os.listdir(plain))
+    zipped = str(tmp_path / 'sub.zip')
+    with zipfile.ZipFile(zipped, 'w', zipfile.ZIP_DEFLATED) as obj:
+        for name in names:
+            obj.write(os.path.join(plain, name), 'sub/' + name)
+    paths = {'zip': zipped}
+    for kind, mode in (('tar.gz', 'w:gz'), ('tar', 'w')):
+        paths[kind] = str(tmp_path / ('sub.' + kind))
+        with tarfile.open(paths[kind], mode) as obj:
+            for name in names:
+                obj.add(os.path.join(plain, name), 'sub/' + name)
+    gzipped = tmp_path / 'gz'
+    gzipped.mkdir()
+    for name in names:
+        with open(os.path.join(plain, name), 'rb') as raw, gzip.open(str(gzipped / (name + '.gz')), 'wb') as out:
+            out.write(raw.read())
+    paths['gz'] = str(gzipped)
+    return paths
+
+
+def test_members_of_every_kind(plain, tmp_path):
+    paths = archives(plain, tmp_path)
+    names = ['%s_%s_%s.txt' % f[:3] for f in FILES]
+    assert [(m.kind, os.path.basename(m.name)) for m in members(plain)] == [('file', n) for n in names]
+    assert [(m.kind, m.name) for m in members(paths['zip'])] == [('zip', 'sub/' + n) for n in names]
+    assert [(m.kind, m.name) for m in members(paths['tar.gz'])] == [('tar', 'sub/' + n) for n in names]
+    assert [(m.kind, os.path.basename(m.name)) for m in members(paths['gz'])] == [('gz', n + '.gz') for n in names]
+    #a folder holding archives goes through them, but not through its subfolders
+    assert len(list(members(str(tmp_path)))) == 3 * len(FILES)
+    only = list(members(paths['zip'], lambda name: name.endswith('_10090.txt')))
+    assert [m.name for m in only] == ['sub/Cgroup_1_10090.txt']
+
+
+@pytest.mark.parametrize('kind', ['plain', 'zip', 'tar.gz', 'tar', 'gz'])
+def test_every_kind_parses_the_same(plain, tmp_path, kind):
+    path = plain if kind == 'plain' else archives(plain, tmp_path)[kind]
+    parsed = []
+    #tar members are streamed, each opened before the next one
+    for member, opener in iter_members(path):
+        with opener() as handle:
+            parsed.append(parse(handle))
+    assert parsed == expected()
+    #members opened one by one, tar members looked up by name
+    assert [parse(open_member(m)) for m in members(path)] == expected()
+
+
+@pytest.mark.parametrize('kind', ['plain', 'zip', 'tar.gz', 'gz'])
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_map_members(plain, tmp_path, kind, jobs):
+    path = plain if kind == 'plain' else archives(plain, tmp_path)[kind]
+    done = list(map_members(path, parse, jobs))
+    assert [r for m, r in done] == expected()
+    assert [m.name for m, r in done] == [m.name for m in members(path)]
+
+
+def test_errors_come_back_from_the_workers(plain):
+    with open(os.path.join(plain, 'Dgroup_1_9606.txt'), 'w') as out:
+        out.write('AUTHOR Dgroup\nMODEL 1\nT96060000001\tGO:0000004\t1.50\nEND\n')
+    with pytest.raises(ValueError):
+        list(map_members(plain, parse, 2))
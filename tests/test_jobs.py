@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+(file, ontology) pairs evaluated by a process pool, against the same run in one process
+"""
+
+import os
+import pytest
+import precrec_main
+from precrec.annotations import CompiledLoader
+from precrec.cache import BenchmarkCache
+from precrec.precRec import read_benchmark
+
+
+@pytest.fixture
+def files(cafa, monkeypatch):
+    monkeypatch.chdir(cafa.folder)
+    return [cafa.submission,
+            cafa.add_submission('Othergroup', 2, '9606', [('T96060000004', 'GO:0000001', '0.45'),
+                                                          ('T96060000004', 'GO:0000023', '0.65'),
+                                                          ('T96060000002', 'GO:0000013', '0.35')]),
+            cafa.add_submission('Testgroup', 1, '10090', [('T100900000001', 'GO:0000002', '0.60'),
+                                                          ('T100900000002', 'GO:0000023', '0.25')])]
+
+
+def outputs(cafa, files, *options):
+    argv = files + ['-o', cafa.obo, '-b', cafa.bfolder, '--no-plot', '-t', 'type1', 'all',
+                    '-m', 'partial', 'full', '-bootstrap', '10', '-pool'] + list(options)
+    precrec_main.main(precrec_main.parse_args(argv))
+    texts = {}
+    for name in sorted(os.listdir('results')):
+        with open(os.path.join('results', name)) as handle:
+            texts[name] = handle.read()
+    return texts
+
+
+@pytest.mark.parametrize('jobs', ['2', '3'])
+def test_pool_writes_what_one_process_writes(cafa, files, jobs):
+    serial = outputs(cafa, files, '-j', '1')
+    assert len(serial) == 5
+    assert outputs(cafa, files, '-j', jobs) == serial
+
+
+def test_results_come_back_in_file_and_ontology_order(cafa, files):
+    args = precrec_main.parse_args(files + ['-o', cafa.obo, '-b', cafa.bfolder, '-t', 'type1', '-m', 'partial', '-j', '3'])
+    benchmarks = BenchmarkCache(CompiledLoader(read_benchmark), 1)
+    done = [(path, res[0].ontology, info[0]) for path, info, res in precrec_main.evaluate_all(args, benchmarks)]
+    assert done == [(path, onto, author) for path, author in zip(files, ['Testgroup', 'Othergroup', 'Testgroup'])
+                    for onto in precrec_main.ONTOLOGIES]
+    #every benchmark was loaded once before forking, whatever the cache size
+    assert benchmarks.maxsize == 6 and benchmarks.misses == 6
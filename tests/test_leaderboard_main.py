@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+leaderboard_main.py end to end on one manifest
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+from precrec.GOPred import GOPred
+from precrec.precRec import PrecREC, read_benchmark
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'leaderboard_main.py')
+
+
+def leaderboard(cafa, *options):
+    argv = [sys.executable, SCRIPT, 'manifest.txt', '-t', 'type1', '-m', 'partial',
+            '-o', cafa.obo, '-b', cafa.bfolder] + list(options)
+    done = subprocess.run(argv, cwd=cafa.folder, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert done.returncode == 0, done.stderr
+    with open(os.path.join(cafa.folder, 'results', 'leaderboard_type1_partial.txt')) as handle:
+        rows = [l.rstrip('\n').split('\t') for l in handle][1:]
+    return done.stdout, dict((r[0], r) for r in rows)
+
+
+def test_one_manifest_end_to_end(cafa):
+    team = os.path.join(cafa.folder, 'team_a')
+    os.makedirs(team)
+    shutil.copy(cafa.submission, team)
+    with open(os.path.join(cafa.folder, 'manifest.txt'), 'w') as manifest:
+        manifest.write('Testgroup\tteam_a\n')
+    out, rows = leaderboard(cafa)
+    assert 'Testgroup_1_9606.txt (bpo,cco,mfo)' in out
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    for onto in ('bpo', 'cco', 'mfo'):
+        fm = PrecREC(read_benchmark(onto, 'HUMAN', 'type1', cafa.bfolder, cafa.obo), parts[onto]).Fmax_output('partial')
+        assert rows[onto][1:6] == ['9606', '1', 'Testgroup', 'Testgroup', '1']
+        assert float(rows[onto][6]) == fm[2]
+        assert float(rows[onto][7]) == fm[3]
+
+    #every job is checkpointed, a second run has nothing left to do
+    out, again = leaderboard(cafa)
+    assert '3 jobs already done' in out and 'Evaluating' not in out
+    assert again == rows
+
+    #incremental rescoring gives the same leaderboard
+    os.remove(os.path.join(cafa.folder, 'results', 'leaderboard_type1_partial.jsonl'))
+    out, rescored = leaderboard(cafa, '-scores', 'scores')
+    assert rescored == rows
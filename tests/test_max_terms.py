@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+The -max-terms cap of GOPred: the bound while reading, and ties at the cutoff
+"""
+
+import io
+import random
+import pytest
+from conftest import TERMS
+from precrec import GOPred as gopred
+from precrec.GOPred import GOPred
+
+
+def submission(rows):
+    text = 'AUTHOR Testgroup\nMODEL 1\nKEYWORDS sequence alignment.\n'
+    text += ''.join('%s\t%s\t%s\n' % row for row in rows) + 'END\n'
+    handle = io.StringIO(text)
+    handle.name = 'Testgroup_1_9606.txt'
+    return handle
+
+
+def random_rows(seed, proteins=4, per_protein=60, grouped=True):
+    '''
+    predictions with few distinct confidences, so the cutoff falls within ties
+    '''
+    rng = random.Random(seed)
+    rows = [('T9606%07d' % p, 'GO:%07d' % t, rng.choice(['0.10', '0.50', '0.50', '0.90']))
+            for p in range(proteins) for t in range(per_protein)]
+    if not grouped:
+        rng.shuffle(rows)
+    return rows
+
+
+def expected(rows, max_terms):
+    '''
+    the max_terms most confident predictions of every protein, the first read among equal confidences
+    '''
+    kept = []
+    by_protein = {}
+    for i, row in enumerate(rows):
+        by_protein.setdefault(row[0], []).append((-float(row[2]), i))
+    for protein in by_protein:
+        kept.extend(i for c, i in sorted(by_protein[protein])[:max_terms])
+    return sorted((rows[i][0], rows[i][1], int(rows[i][2][0] + rows[i][2][2:])) for i in kept)
+
+
+def kept(pred):
+    protein_ids, term_ids, confidences = pred.columns()
+    return sorted((pred.proteins[p], pred.terms[t], c) for p, t, c in
+                  zip(protein_ids.tolist(), term_ids.tolist(), confidences.tolist()))
+
+
+@pytest.mark.parametrize('block', [7, 64, 10000])
+@pytest.mark.parametrize('grouped', [True, False])
+def test_ties_keep_the_first_read(monkeypatch, block, grouped):
+    monkeypatch.setattr(gopred, 'BLOCK_LINES', block)
+    rows = random_rows(block, grouped=grouped)
+    for max_terms in (1, 5, 13):
+        pred = GOPred(max_terms)
+        pred.read(submission(rows))
+        assert kept(pred) == expected(rows, max_terms)
+        assert pred.dropped == len(rows) - len(expected(rows, max_terms))
+
+
+@pytest.mark.parametrize('block', [4, 1000])
+@pytest.mark.parametrize('max_terms', [3, 10])
+def test_bound_between_blocks(monkeypatch, block, max_terms):
+    #the cap is checked after every block, whatever the block size
+    monkeypatch.setattr(gopred, 'BLOCK_LINES', block)
+    rows = random_rows(1, proteins=2, per_protein=3000)
+    pred = GOPred(max_terms)
+    largest = 0
+    for _ in pred._read(submission(rows)):
+        protein_ids = pred.columns()[0].tolist()
+        counts = [protein_ids.count(p) for p in set(protein_ids)]
+        largest = max(largest, max(counts))
+        assert sum(max(c - max_terms, 0) for c in counts) < block
+    assert max_terms <= largest < 2 * max_terms
+    assert kept(pred) == expected(rows, max_terms)
+
+
+def test_streaming_blocks_keep_the_same_predictions(cafa, monkeypatch):
+    monkeypatch.setattr(gopred, 'BLOCK_LINES', 5)
+    rows = random_rows(2, proteins=6, per_protein=20)
+    streamed = []
+    pred = GOPred(4)
+    for parts in pred.read_split_blocks(cafa.obo, submission(rows)):
+        for part in parts.values():
+            streamed.extend(kept(part))
+    #terms outside the ontology are left out of every part
+    terms = set(term for term, namespace, parents, obsolete in TERMS)
+    assert sorted(streamed) == [r for r in expected(rows, 4) if r[1] in terms]
+    assert pred.dropped == len(rows) - len(expected(rows, 4))
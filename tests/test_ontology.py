@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+The CSR ancestor closure against the ancestor sets of the ancestors files
+"""
+
+import numpy
+from conftest import TERMS
+from precrec.ontology import ROOT_TERMS, load_ontology, read_ancestors
+from precrec.precRec import benchmark
+
+
+def ancestor_sets():
+    '''
+    key: GO ID, value: set of its ancestors, walked from the parents of conftest
+    '''
+    parents = dict((t, p) for t, namespace, p, obsolete in TERMS)
+    closure = {}
+    for term in parents:
+        seen = set()
+        stack = list(parents[term])
+        while stack:
+            p = stack.pop()
+            if p not in seen:
+                seen.add(p)
+                stack.extend(parents[p])
+        closure[term] = seen
+    return closure
+
+
+def write_ancestors(path, closure):
+    '''
+    go_term <tab> ancestor_1,ancestor_2,..,ancestor_n
+    '''
+    with open(path, 'w') as out:
+        for term in sorted(closure):
+            out.write('%s\t%s\n' % (term, ','.join(sorted(closure[term]))))
+
+
+def test_read_ancestors(tmp_path):
+    closure = ancestor_sets()
+    path = str(tmp_path / 'test.obo_ancestors.txt')
+    write_ancestors(path, closure)
+    onto = read_ancestors(path)
+    assert sorted(onto.terms) == sorted(closure)
+    assert len(onto.offsets) == len(onto) + 1
+    for term in closure:
+        i = onto.term_id(term)
+        a = onto.get_ancestors(i)
+        assert (numpy.diff(a) > 0).all()
+        assert set(onto.terms[j] for j in a) == closure[term]
+    assert onto.term_id('GO:9999999') is None
+    #roots and obsolete terms both have no ancestors
+    assert [t for t in closure if onto.is_obsolete(onto.term_id(t))] == ['GO:0000009', 'GO:0000019']
+
+
+def test_compiled_ontology_has_the_same_closure(cafa):
+    closure = ancestor_sets()
+    onto = load_ontology(cafa.obo)
+    assert sorted(onto.terms) == sorted(closure)
+    for term in closure:
+        assert set(onto.terms[j] for j in onto.get_ancestors(onto.term_id(term))) == closure[term]
+    assert onto.namespace('GO:0000012') == 'mfo'
+    assert onto.namespace('GO:9999999') is None
+    assert sorted(onto.terms[i] for i in onto.roots) == ['GO:0003674', 'GO:0005575', 'GO:0008150']
+    #the roots an ancestors file cannot tell from obsolete terms
+    assert sorted(ROOT_TERMS) == ['GO:0003674', 'GO:0005575', 'GO:0008150']
+    assert sorted(t for t in closure if onto.is_obsolete(onto.term_id(t))) == ['GO:0000009', 'GO:0000019']
+
+
+def test_closure_of_several_terms(cafa):
+    onto = load_ontology(cafa.obo)
+    ids = [onto.term_id('GO:0000004'), onto.term_id('GO:0000005'), onto.term_id('GO:0000004')]
+    c = onto.closure(ids)
+    assert c.tolist() == sorted(set(c.tolist()))
+    assert set(onto.terms[i] for i in c) == set(['GO:0000004', 'GO:0000005', 'GO:0000002', 'GO:0000003',
+                                                'GO:0000001', 'GO:0008150'])
+    assert onto.closure([]).tolist() == []
+
+
+def test_benchmark_propagation_from_either_ontology(cafa, tmp_path):
+    closure = ancestor_sets()
+    path = str(tmp_path / 'test.obo_ancestors_bpo.txt')
+    write_ancestors(path, closure)
+    from_file = benchmark(path, cafa.leafonly('bpo'))
+    from_file.propagate()
+    compiled = benchmark(load_ontology(cafa.obo), cafa.leafonly('bpo'))
+    compiled.propagate()
+    assert sorted(from_file.true_terms) == sorted(compiled.true_terms)
+    for protein in from_file.true_terms:
+        expected = set()
+        for term in from_file.true_base_terms[protein]:
+            expected.add(term)
+            expected.update(closure[term])
+        assert set(from_file.ontology.terms[i] for i in from_file.true_terms[protein]) == expected
+        assert set(compiled.ontology.terms[i] for i in compiled.true_terms[protein]) == expected
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+The synthetic inputs and perf_main.py: timings, baselines and --check
+"""
+
+import json
+import os
+import subprocess
+import sys
+import perf_main
+from precrec.GOPred import GOPred
+from precrec.ontology import ROOT_TERMS, load_ontology
+from precrec.profiling import Profiler
+from precrec.synthetic import make_inputs
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'perf_main.py')
+SMALL = ['-proteins', '60', '-terms', '5', '-true', '3', '-depth', '4', '-width', '20']
+
+
+def small_inputs(folder, **kwargs):
+    return make_inputs(str(folder), n_proteins=60, n_terms=5, n_true=3, depth=4, width=20, **kwargs)
+
+
+def contents(inputs):
+    '''
+    text of the obo, benchmark and submission files of make_inputs
+    '''
+    obo_path, benchmark_paths, pred_path = inputs
+    texts = []
+    for path in [obo_path] + [benchmark_paths[o] for o in sorted(benchmark_paths)] + [pred_path]:
+        with open(path) as handle:
+            texts.append(handle.read())
+    return texts
+
+
+def test_same_seed_same_files(tmp_path):
+    a = small_inputs(tmp_path / 'a')
+    b = small_inputs(tmp_path / 'b')
+    c = small_inputs(tmp_path / 'c', seed=1)
+    assert contents(a) == contents(b)
+    assert contents(a) != contents(c)
+
+
+def test_synthetic_sizes(tmp_path):
+    obo_path, benchmark_paths, pred_path = small_inputs(tmp_path, n_obsolete=2)
+    onto = load_ontology(obo_path)
+    #a root, depth levels of width terms and the obsolete terms, per namespace
+    assert len(onto) == 3 * (1 + 4 * 20 + 2)
+    assert len([i for i in range(len(onto)) if onto.is_obsolete(i)]) == 6
+    assert sorted(onto.terms[i] for i in onto.roots) == sorted(ROOT_TERMS)
+    pred = GOPred()
+    with open(pred_path) as handle:
+        pred.read(handle)
+    assert len(pred.proteins) == 60
+    #at most 5 terms per protein and namespace, fewer for proteins with only obsolete ones
+    assert 3 * 60 * 2 <= len(pred) <= 3 * 60 * 5
+    with open(benchmark_paths['bpo']) as handle:
+        assert len(set(l.split('\t')[0] for l in handle)) == 30
+
+
+def test_stages(tmp_path):
+    inputs = small_inputs(tmp_path)
+    best = perf_main.time_stages(Profiler(), inputs, str(tmp_path), 2, 'partial')
+    assert sorted(best) == sorted(['compile', 'load_ontology', 'benchmark', 'read', 'split', 'propagate', 'fmax', 'stream'])
+    assert all(wall >= 0 and cpu >= 0 for wall, cpu in best.values())
+
+
+def test_baseline_comparison(capsys):
+    best = {'read': (0.5, 0.5), 'split': (0.004, 0.004), 'fmax': (0.2, 0.2), 'stream': (1.0, 1.0)}
+    baseline = {'config': {'proteins': 10},
+                #read is twice as slow, split too but by less than the timer noise,
+                #fmax got faster and stream has no baseline
+                'stages': {'read': 0.25, 'split': 0.002, 'fmax': 0.3}}
+    assert perf_main.compare_baseline(best, baseline, {'proteins': 10}, 0.25) == ['read']
+    out, err = capsys.readouterr()
+    assert out.count('REGRESSION') == 1 and err == ''
+    assert perf_main.compare_baseline(best, baseline, {'proteins': 20}, 1.5) == []
+    assert 'other inputs' in capsys.readouterr().err
+
+
+def test_check_finds_no_mismatch_and_catches_one(tmp_path, monkeypatch):
+    inputs = small_inputs(tmp_path)
+    assert perf_main.check(inputs, 'partial') == []
+    #a sweep that is off by one threshold
+    original = perf_main.PrecREC.Fmax_output
+
+    def shifted(self, mode='partial'):
+        precision, recall, fmax, threshold, coverage = original(self, mode)
+        return (precision[1:] + precision[:1], recall, fmax, threshold, coverage)
+    monkeypatch.setattr(perf_main.PrecREC, 'Fmax_output', shifted)
+    assert len(perf_main.check(inputs, 'partial')) > 0
+
+
+def test_command_line(tmp_path):
+    work = str(tmp_path / 'perf')
+    base = str(tmp_path / 'base.json')
+
+    def perf(*options):
+        return subprocess.run([sys.executable, SCRIPT, '-dir', work, '-repeat', '1'] + SMALL + list(options),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    done = perf('--check')
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.strip().endswith('0 mismatches')
+    done = perf('-baseline', base, '--save-baseline')
+    assert done.returncode == 0, done.stderr
+    with open(base) as handle:
+        saved = json.load(handle)
+    assert saved['config']['proteins'] == 60 and saved['config']['obsolete'] == 5
+    assert 'propagate' in saved['stages']
+    done = perf('-baseline', base, '-tolerance', '1000')
+    assert done.returncode == 0, done.stderr
+    assert 'baseline' in done.stdout.split('\n')[0]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+O(n log n) curve smoothing against the pairwise comparison, and plots rendered in the background
+"""
+
+import os
+import random
+import pytest
+import precrec_main
+from precrec.plotting import Curve, Plotter, best_index, pareto_frontier
+
+
+def pairwise_frontier(precision, recall):
+    '''
+    removes a p-r pair if an earlier p-r pair is greater in both precision and recall
+    '''
+    kept_precision = []
+    kept_recall = []
+    for i, (p, r) in enumerate(zip(precision, recall)):
+        if not any(precision[j] > p and recall[j] > r for j in range(i)):
+            kept_precision.append(p)
+            kept_recall.append(r)
+    return [kept_precision, kept_recall]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_frontier_matches_pairwise(seed):
+    rng = random.Random(seed)
+    n = rng.randint(0, 120)
+    #few distinct values, so ties in precision and in recall are common
+    precision = [rng.randint(0, 10) / 10.0 for _ in range(n)]
+    recall = [rng.randint(0, 10) / 10.0 for _ in range(n)]
+    for i in range(n):
+        if rng.random() < 0.05:
+            precision[i] = float('nan')
+    expected = pairwise_frontier(precision, recall)
+    got = pareto_frontier(precision, recall)
+    assert len(got[0]) == len(expected[0])
+    assert all(a == b or (a != a and b != b) for a, b in zip(got[0], expected[0]))
+    assert got[1] == expected[1]
+
+
+def test_frontier_of_a_curve():
+    #recall falls as the threshold grows; the dip at 0.5 is beaten by the point before
+    precision = [0.4, 0.6, 0.5, 0.7, 0.9]
+    recall = [0.9, 0.8, 0.7, 0.6, 0.2]
+    assert pareto_frontier(precision, recall) == [[0.4, 0.6, 0.7, 0.9], [0.9, 0.8, 0.6, 0.2]]
+
+
+def test_best_index():
+    assert best_index([0.5, 0.8, 0.8], [0.8, 0.5, 0.5]) == 2
+    assert best_index([0.0, 0.0], [0.0, 0.0]) is None
+    curve = Curve('A', 1, '9606', 'bpo', 'partial', 'NK', [0.4, 0.6, 0.5], [0.9, 0.8, 0.7], 0.69, 0.02, smooth=True)
+    #the marker stays on the unsmoothed curve
+    assert curve.best == (0.8, 0.6)
+    assert (curve.precision, curve.recall) == ([0.4, 0.6], [0.9, 0.8])
+    assert curve.label() == 'A: fmax=0.690'
+
+
+@pytest.mark.parametrize('jobs', [0, 1])
+def test_plotter_renders_every_figure(tmp_path, jobs):
+    curves = [Curve(author, 1, '9606', 'bpo', 'partial', 'NK', [0.4, 0.6, 0.7], [0.9, 0.8, 0.6], 0.69, 0.02)
+              for author in ('A', 'B')]
+    plotter = Plotter(jobs)
+    for curve in curves:
+        plotter.single(curve, str(tmp_path))
+    plotter.multiple('both', curves, str(tmp_path))
+    plotter.close()
+    assert sorted(os.listdir(str(tmp_path))) == ['A_1_9606_bpo_partial_NK.png', 'B_1_9606_bpo_partial_NK.png', 'both.png']
+
+
+def test_rendering_errors_are_raised(tmp_path):
+    plotter = Plotter(1)
+    plotter.single(Curve('A', 1, '9606', 'bpo', 'partial', 'NK', [0.5], [0.5], 0.5, 0.5), str(tmp_path / 'missing'))
+    with pytest.raises(Exception):
+        plotter.close()
+
+
+def test_no_plot_draws_nothing(tmp_path):
+    plotter = Plotter(None)
+    plotter.single(Curve('A', 1, '9606', 'bpo', 'partial', 'NK', [0.5], [0.5], 0.5, 0.5), str(tmp_path))
+    plotter.close()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_precrec_main_plots(cafa, monkeypatch):
+    monkeypatch.chdir(cafa.folder)
+    other = cafa.add_submission('Othergroup', 1, '9606', [('T96060000001', 'GO:0000004', '0.50')])
+    precrec_main.main(precrec_main.parse_args(
+        [cafa.submission, other, '-o', cafa.obo, '-b', cafa.bfolder, '-t', 'type1', '-m', 'partial',
+         '-s', 'Y', '-title', 'run']))
+    plots = sorted(os.listdir('plots'))
+    assert 'Testgroup_1_9606_bpo_partial_NK.png' in plots and 'Othergroup_1_9606_bpo_partial_NK.png' in plots
+    assert 'run_BPO.png' in plots
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Scores pooled over taxa from the per-taxon counts, against PrecREC on the merged benchmark
+"""
+
+import os
+import pytest
+import precrec_main
+from conftest import LISTS, PREDICTIONS
+from precrec.fmax import INTERVAL, count_predictions, threshold_grid
+from precrec.GOPred import GOPred
+from precrec.ia import information_accretion, read_annotations
+from precrec.ontology import ONTOLOGIES, load_ontology
+from precrec.pooling import TaxonScore, pool, unpredicted_ia
+from precrec.precRec import PrecREC, benchmark
+
+MOUSE = [('T100900000001', 'GO:0000002', '0.60'), ('T100900000001', 'GO:0000011', '0.35'),
+         ('T100900000002', 'GO:0000003', '0.45'), ('T100900000002', 'GO:0000021', '0.75')]
+SPECIES = {'9606': 'HUMAN', '10090': 'MOUSE'}
+
+
+@pytest.fixture
+def taxa(cafa):
+    '''
+    the taxon files, and one file holding the predictions of both
+    '''
+    cafa.mouse = cafa.add_submission('Testgroup', 1, '10090', MOUSE)
+    cafa.merged = cafa.add_submission('Testgroup', 2, '9606', PREDICTIONS + MOUSE)
+    cafa.ontology = load_ontology(cafa.obo)
+    return cafa
+
+
+def type1(cafa, onto, species):
+    b = benchmark(cafa.ontology, cafa.leafonly(onto), [p for s in species for p in LISTS['%s_%s_type1' % (onto, s)]])
+    b.propagate()
+    return b
+
+
+def scored(cafa, path, onto, b, ia):
+    pred = GOPred()
+    with open(path) as handle:
+        return PrecREC(b, pred.read_and_split(cafa.ontology, handle)[onto], ia=ia)
+
+
+def taxon_score(taxon, b, c, ia):
+    '''
+    as precrec_main.taxon_score
+    '''
+    counts = count_predictions(c.predicted, c.true_terms, threshold_grid(INTERVAL), ia) if c.exist else None
+    missing = unpredicted_ia(b.true_terms, counts.proteins if counts is not None else (), ia)
+    return TaxonScore(taxon, counts, len(b.true_terms), c.countb, missing)
+
+
+def assert_same(pooled, c, mode):
+    assert pooled.exist == c.exist
+    fm = pooled.Fmax_output(mode)
+    expected = c.Fmax_output(mode)
+    assert fm[0] == pytest.approx(expected[0], nan_ok=True)
+    assert fm[1:] == pytest.approx(expected[1:])
+    weighted = pooled.weighted_output(mode)
+    expected = c.weighted_output(mode)
+    for got, e in zip(weighted, expected):
+        assert got[0] == pytest.approx(e[0], nan_ok=True)
+        assert got[1:] == pytest.approx(e[1:])
+
+
+@pytest.mark.parametrize('onto', ONTOLOGIES)
+@pytest.mark.parametrize('mode', ['partial', 'full'])
+def test_pooled_matches_merged_benchmark(taxa, onto, mode):
+    ia = information_accretion(taxa.ontology, read_annotations(taxa.leafonly(onto), taxa.ontology))
+    scores = {}
+    for taxon, path in (('9606', taxa.submission), ('10090', taxa.mouse)):
+        b = type1(taxa, onto, [SPECIES[taxon]])
+        scores[taxon] = taxon_score(taxon, b, scored(taxa, path, onto, b, ia), ia)
+    pooled = pool(scores, threshold_grid(INTERVAL))
+    assert pooled.taxa == ['10090', '9606']
+    merged = scored(taxa, taxa.merged, onto, type1(taxa, onto, ['HUMAN', 'MOUSE']), ia)
+    assert pooled.nbench(mode) == (len(merged.true_terms) if mode == 'full' else merged.countb)
+    assert_same(pooled, merged, mode)
+    #one taxon pooled alone is that taxon's own score
+    human = scored(taxa, taxa.submission, onto, type1(taxa, onto, ['HUMAN']), ia)
+    assert_same(pool(scores, threshold_grid(INTERVAL), ['9606', '7227']), human, mode)
+
+
+@pytest.mark.parametrize('onto', ONTOLOGIES)
+def test_taxon_without_a_file(taxa, onto):
+    ia = information_accretion(taxa.ontology, read_annotations(taxa.leafonly(onto), taxa.ontology))
+    b = type1(taxa, onto, ['HUMAN'])
+    scores = {'9606': taxon_score('9606', b, scored(taxa, taxa.submission, onto, b, ia), ia),
+              '10090': TaxonScore.unpredicted('10090', type1(taxa, onto, ['MOUSE']).true_terms, ia)}
+    pooled = pool(scores, threshold_grid(INTERVAL))
+    #the human predictions on the merged benchmark: mouse proteins are all missed in full mode
+    merged = scored(taxa, taxa.submission, onto, type1(taxa, onto, ['HUMAN', 'MOUSE']), ia)
+    for mode in ('partial', 'full'):
+        assert_same(pooled, merged, mode)
+    with pytest.raises(ValueError):
+        pooled.Fmax_output('some')
+
+
+def test_precrec_main_pooled_report(taxa, monkeypatch):
+    monkeypatch.chdir(taxa.folder)
+    precrec_main.main(precrec_main.parse_args(
+        [taxa.submission, taxa.mouse, '-o', taxa.obo, '-b', taxa.bfolder, '--no-plot', '-t', 'type1',
+         '-m', 'full', '-title', 'run', '-pool']))
+    with open(os.path.join('results', 'run_pooled.txt')) as handle:
+        lines = handle.read().split('\n')
+    assert lines[0] == 'pooled taxa:10090,9606'
+    found = dict(l.split(':\t')[0:2] for l in lines if ':\t' in l and not l.startswith('Ontology'))
+    for onto in ONTOLOGIES:
+        merged = scored(taxa, taxa.merged, onto, type1(taxa, onto, ['HUMAN', 'MOUSE']), None)
+        assert float(found[onto].split('\t')[0]) == pytest.approx(merged.Fmax_output('full')[2])
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+precrec_main.py end to end, on the CAFA2-layout benchmark folder of conftest
+"""
+
+import json
+import os
+import pytest
+import precrec_main
+from precrec.GOPred import GOPred
+from precrec.ontology import load_ontology
+from precrec.precRec import PrecREC, read_benchmark
+
+
+def run(cafa, *options):
+    argv = [cafa.submission, '-o', cafa.obo, '-b', cafa.bfolder, '--no-plot'] + list(options)
+    precrec_main.main(precrec_main.parse_args(argv))
+
+
+def results(name='Testgroup_1_9606.txt'):
+    with open(os.path.join('results', '%s_results.txt' % name)) as handle:
+        return handle.read()
+
+
+def table(text):
+    '''
+    {(benchmark type, mode): {ontology: [fmax, threshold, coverage]}} of a results file
+    the threshold is None when no threshold gives a precision and a recall
+    '''
+    tables = {}
+    for block in text.split('\n\n'):
+        lines = block.strip().split('\n')
+        TYPE = [l.split(':')[1] for l in lines if l.startswith('benchmark type:')][0]
+        mode = [l.split(':')[1] for l in lines if l.startswith('mode:')][0]
+        rows = [l.split('\t') for l in lines if l[:4] in ('bpo:', 'mfo:', 'cco:')]
+        tables[(TYPE, mode)] = dict((r[0][:-1], [None if v == 'None' else float(v) for v in r[1:]]) for r in rows)
+    return tables
+
+
+@pytest.fixture
+def cafa_dir(cafa, monkeypatch):
+    monkeypatch.chdir(cafa.folder)
+    return cafa
+
+
+def test_read_benchmark_per_taxon_and_type(cafa):
+    b = read_benchmark('BPO', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+    assert sorted(b.true_terms) == ['T96060000001', 'T96060000002', 'T96060000003', 'T96060000004']
+    onto = load_ontology(cafa.obo)
+    assert sorted(onto.terms[i] for i in b.true_terms['T96060000002']) == ['GO:0000003', 'GO:0000005', 'GO:0008150']
+    both = read_benchmark('bpo', 'HUMAN', 'all', cafa.bfolder, cafa.obo)
+    assert len(both.true_terms) == 6
+    #no list file, no benchmark proteins
+    assert len(read_benchmark('cco', 'HUMAN', 'type2', cafa.bfolder, cafa.obo).true_terms) == 0
+    with pytest.raises(ValueError):
+        read_benchmark('hpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)
+
+
+def test_scores_match_precrec(cafa_dir):
+    run(cafa_dir, '-t', 'type1', '-m', 'partial', 'full')
+    scores = table(results())
+    pred = GOPred()
+    with open(cafa_dir.submission) as handle:
+        parts = pred.read_and_split(cafa_dir.obo, handle)
+    for onto in ('bpo', 'mfo', 'cco'):
+        c = PrecREC(read_benchmark(onto, 'HUMAN', 'type1', cafa_dir.bfolder, cafa_dir.obo), parts[onto])
+        for mode in ('partial', 'full'):
+            fm = c.Fmax_output(mode)
+            assert scores[('NK', mode)][onto] == pytest.approx(list(fm[2:]))
+    #T96060000003 only predicts an obsolete BPO term, it counts in partial mode
+    assert scores[('NK', 'partial')]['bpo'] == pytest.approx([0.8, 0.8, 2 / 3.0])
+
+
+def test_jobs_and_prefetch_give_the_same_results(cafa_dir):
+    run(cafa_dir, '-t', 'type1', '-m', 'partial')
+    expected = results()
+    run(cafa_dir, '-t', 'type1', '-m', 'partial', '-j', '2')
+    assert results() == expected
+    run(cafa_dir, '-t', 'type1', '-m', 'partial', '-prefetch', '0')
+    assert results() == expected
+    run(cafa_dir, '-t', 'type1', '-m', 'partial', '--stream')
+    assert results() == expected
+
+
+def test_several_types_and_modes(cafa_dir):
+    run(cafa_dir, '-t', 'type1', '-m', 'full')
+    single = table(results())
+    run(cafa_dir, '-t', 'type1', 'type2', 'all', '-m', 'partial', 'full')
+    several = table(results())
+    assert sorted(several) == sorted((TYPE, mode) for TYPE in ('NK', 'LK', 'All') for mode in ('partial', 'full'))
+    assert several[('NK', 'full')] == single[('NK', 'full')]
+    #T96060000005 is a type2 BPO benchmark protein
+    assert 'bpo' in several[('LK', 'partial')]
+
+
+def test_bootstrap_pool_profile_and_max_terms(cafa_dir):
+    cafa_dir.add_submission('Testgroup', 1, '10090', [('T100900000001', 'GO:0000002', '0.60'),
+                                                     ('T100900000001', 'GO:0000012', '0.30')])
+    mouse = os.path.join(cafa_dir.folder, 'Testgroup_1_10090.txt')
+    precrec_main.main(precrec_main.parse_args(
+        [cafa_dir.submission, mouse, '-o', cafa_dir.obo, '-b', cafa_dir.bfolder, '--no-plot',
+         '-t', 'type1', '-m', 'partial', '-bootstrap', '20', '-pool', '-profile', 'profile.json',
+         '-max-terms', '1', '-title', 'run']))
+    #all but the most confident prediction of each of the five proteins, whatever its ontology
+    assert 'Dropped:7\n' in results()
+    with open('results/run_bootstrap.txt') as handle:
+        report = handle.read()
+    assert 'bootstrap resamples:20' in report
+    assert 'Testgroup_1_9606' in report and 'Testgroup_1_10090' in report
+    with open('results/run_pooled.txt') as handle:
+        assert handle.readline() == 'pooled taxa:10090,9606\n'
+    with open('profile.json') as handle:
+        profile = json.load(handle)
+    assert 'read' in json.dumps(profile) and 'propagate' in json.dumps(profile)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+precrec_server.py jobs over a Unix socket, as precrec_client.py sends them
+"""
+
+import argparse
+import multiprocessing
+import os
+import threading
+import pytest
+import precrec_main
+import precrec_server
+from precrec.arrayfile import user_cache_dir
+from precrec.daemon import default_address, make_server, request
+
+
+@pytest.fixture
+def server(cafa):
+    args = argparse.Namespace(obo_paths=[cafa.obo], taxa=['9606'], type=['type1'],
+                              bfolder=cafa.bfolder, cache_size=6)
+    #bpo, cco and mfo of HUMAN type1
+    assert precrec_server.warm_up(args) == 3
+    pool = multiprocessing.get_context('fork').Pool(1)
+    address = os.path.join(cafa.folder, 'precrec.sock')
+    httpd = make_server(address, precrec_server.Jobs(pool, 1))
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+    yield address
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+    pool.terminate()
+    pool.join()
+    precrec_server._warm.clear()
+
+
+def test_one_job(cafa, server, monkeypatch):
+    assert oct(os.stat(server).st_mode & 0o777) == oct(0o600)
+    argv = [os.path.basename(cafa.submission), '-o', cafa.obo, '-b', cafa.bfolder,
+            '-t', 'type1', '-m', 'partial', 'full', '--no-plot', '-j', '4']
+    reply = request(server, 'POST', '/evaluate', {'argv': argv, 'cwd': cafa.folder})
+    assert reply['status'] == 0, reply['stderr']
+    assert 'fmax: 0.8' in reply['stdout']
+    results = os.path.join(cafa.folder, 'results', 'Testgroup_1_9606.txt_results.txt')
+    with open(results) as handle:
+        served = handle.read()
+    #the same command line run here writes the same file
+    os.remove(results)
+    monkeypatch.chdir(cafa.folder)
+    precrec_main.main(precrec_main.parse_args(argv))
+    with open(results) as handle:
+        assert handle.read() == served
+    assert request(server, 'GET', '/status')['jobs'] == 1
+
+
+def test_errors_come_back(cafa, server):
+    #argparse errors are the job's exit status, not the server's
+    reply = request(server, 'POST', '/evaluate', {'argv': ['-m', 'partial'], 'cwd': cafa.folder})
+    assert reply['status'] == 2 and 'required' in reply['stderr']
+    with pytest.raises(IOError):
+        request(server, 'POST', '/evaluate', {'argv': 'not a list', 'cwd': cafa.folder})
+    with pytest.raises(IOError):
+        request(server, 'GET', '/nothing')
+
+
+def test_outputs_outside_the_folder_are_refused(cafa, server):
+    argv = [os.path.basename(cafa.submission), '-o', cafa.obo, '-b', cafa.bfolder, '-t', 'type1', '-m', 'full', '--no-plot']
+    profile = os.path.join(os.path.dirname(cafa.folder), 'profile.json')
+    for extra in (['-profile', '../profile.json'], ['-profile', profile], ['-title', '../../x']):
+        reply = request(server, 'POST', '/evaluate', {'argv': argv + extra, 'cwd': cafa.folder})
+        assert reply['status'] == 2 and 'only writes under' in reply['stderr']
+    assert not os.path.exists(profile)
+    assert not os.path.exists(os.path.join(cafa.folder, 'results'))
+    #inside the folder is fine
+    reply = request(server, 'POST', '/evaluate', {'argv': argv + ['-profile', 'profile.json'], 'cwd': cafa.folder})
+    assert reply['status'] == 0, reply['stderr']
+    assert os.path.exists(os.path.join(cafa.folder, 'profile.json'))
+
+
+def test_default_address_is_a_private_socket(tmp_path, monkeypatch):
+    monkeypatch.delenv('PRECREC_SERVER', raising=False)
+    monkeypatch.setenv('PRECREC_CACHE', str(tmp_path / 'cache'))
+    address = default_address()
+    assert address == os.path.join(user_cache_dir(), 'precrec.sock')
+    httpd = make_server(address, lambda method, path, body: (200, {}))
+    try:
+        assert oct(os.stat(address).st_mode & 0o777) == oct(0o600)
+    finally:
+        httpd.server_close()
+    monkeypatch.setenv('PRECREC_SERVER', '/tmp/other.sock')
+    assert default_address() == '/tmp/other.sock'
+
+
+def test_tcp_needs_the_token(tmp_path):
+    app = lambda method, path, body: (200, {'path': path})
+    with pytest.raises(ValueError):
+        make_server('127.0.0.1:0', app)
+    httpd = make_server('127.0.0.1:0', app, 'secret')
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+    try:
+        address = '127.0.0.1:%s' % httpd.server_address[1]
+        for token in (None, 'wrong'):
+            with pytest.raises(IOError) as e:
+                request(address, 'GET', '/status', token=token)
+            assert '403' in str(e.value)
+        assert request(address, 'GET', '/status', token='secret') == {'path': '/status'}
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+
+def die(argv, cwd):
+    os._exit(1)
+
+
+def test_job_of_a_dead_worker_is_an_error(cafa, monkeypatch):
+    monkeypatch.setattr(precrec_server, 'run_job', die)
+    pool = multiprocessing.get_context('fork').Pool(1)
+    try:
+        code, reply = precrec_server.Jobs(pool, 1, timeout=1)('POST', '/evaluate', {'argv': [], 'cwd': cafa.folder})
+    finally:
+        pool.terminate()
+        pool.join()
+    assert code == 504 and 'worker died' in reply['error']
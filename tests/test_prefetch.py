@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Prediction files read ahead by a thread: order, bounded look-ahead, errors and early stops
+"""
+
+import os
+import random
+import threading
+import time
+import pytest
+import precrec_main
+from precrec.ingest import prefetch
+
+
+class Recorder:
+    '''
+    a load() recording how far ahead of the consumer it was called, and from which thread
+    '''
+    def __init__(self, seed=0, fail=None):
+        self.rng = random.Random(seed)
+        self.loaded = 0
+        self.consumed = 0
+        self.ahead = 0
+        self.threads = set()
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, item):
+        time.sleep(self.rng.random() * 0.002)
+        if item == self.fail:
+            raise ValueError('cannot load %s' % item)
+        with self.lock:
+            self.loaded += 1
+            self.ahead = max(self.ahead, self.loaded - self.consumed)
+            self.threads.add(threading.current_thread().name)
+        return item * item
+
+
+@pytest.mark.parametrize('depth', [0, 1, 2, 5])
+def test_order_and_look_ahead(depth):
+    load = Recorder(depth)
+    done = []
+    for item, value in prefetch(range(40), load, depth):
+        with load.lock:
+            load.consumed += 1
+        done.append((item, value))
+        #a slow consumer lets the reader run ahead as far as it may
+        time.sleep(0.003)
+    assert done == [(i, i * i) for i in range(40)]
+    #depth items wait in the queue, one more is loaded and waiting for room,
+    #and the item just taken from the queue may not be counted as consumed yet
+    assert load.ahead <= depth + 2
+    if depth == 0:
+        assert load.threads == set([threading.current_thread().name])
+    else:
+        assert load.threads == set(['prefetch'])
+        assert load.ahead > 1
+
+
+@pytest.mark.parametrize('depth', [0, 2])
+def test_load_error_where_the_item_would_be(depth):
+    done = []
+    with pytest.raises(ValueError) as error:
+        for item, value in prefetch(range(10), Recorder(fail=4), depth):
+            done.append(item)
+    assert done == [0, 1, 2, 3]
+    assert str(error.value) == 'cannot load 4'
+
+
+def test_items_error():
+    def items():
+        yield 1
+        yield 2
+        raise KeyError('no more items')
+    done = []
+    with pytest.raises(KeyError):
+        for item, value in prefetch(items(), Recorder(), 2):
+            done.append(item)
+    assert done == [1, 2]
+
+
+def test_early_close_stops_the_reader():
+    load = Recorder()
+    before = set(threading.enumerate())
+    files = prefetch(range(1000), load, 2)
+    assert next(files) == (0, 0)
+    files.close()
+    assert set(threading.enumerate()) == before
+    loaded = load.loaded
+    time.sleep(0.05)
+    assert load.loaded == loaded <= 4
+
+
+@pytest.fixture
+def files(cafa, monkeypatch):
+    monkeypatch.chdir(cafa.folder)
+    return [cafa.submission,
+            cafa.add_submission('Othergroup', 1, '9606', [('T96060000004', 'GO:0000001', '0.45'),
+                                                          ('T96060000002', 'GO:0000013', '0.35')]),
+            cafa.add_submission('Testgroup', 1, '10090', [('T100900000001', 'GO:0000002', '0.60')])]
+
+
+def outputs(cafa, files, depth):
+    precrec_main.main(precrec_main.parse_args(files + ['-o', cafa.obo, '-b', cafa.bfolder, '--no-plot', '-t', 'type1',
+                                                       '-m', 'partial', '-prefetch', depth]))
+    texts = {}
+    for name in sorted(os.listdir('results')):
+        with open(os.path.join('results', name)) as handle:
+            texts[name] = handle.read()
+    return texts
+
+
+def test_precrec_main_reads_every_file_once(cafa, files, monkeypatch):
+    read = []
+    original = precrec_main.read_file
+
+    def read_file(path):
+        read.append(path)
+        return original(path)
+    monkeypatch.setattr(precrec_main, 'read_file', read_file)
+    without = outputs(cafa, files, '0')
+    assert read == files
+    del read[:]
+    assert outputs(cafa, files, '2') == without
+    assert read == files
+    assert precrec_main._prefetched == {}
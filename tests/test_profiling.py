@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+The per-stage profiling report, on its own and from precrec_main -profile
+"""
+
+import json
+import precrec_main
+from precrec.profiling import DISABLED, Profiler
+
+
+def test_nested_stages_and_counters():
+    profiler = Profiler()
+    with profiler.stage('outer', 'a.txt'):
+        with profiler.stage('inner', 'a.txt', 'bpo'):
+            sum(range(1000))
+    profiler.count('countb', 3, 'a.txt', 'bpo')
+    profiler.count('unknown', None)
+    report = profiler.report({'argv': []})
+    assert [s['stage'] for s in report['stages']] == ['inner', 'outer']
+    inner, outer = report['stages']
+    assert outer['wall'] >= inner['wall'] >= 0
+    assert (inner['file'], inner['ontology']) == ('a.txt', 'bpo')
+    assert report['totals']['outer']['calls'] == 1
+    assert [(c['counter'], c['value']) for c in report['counters']] == [('countb', 3)]
+    #drained records leave the profiler, as workers send them back
+    assert len(profiler.drain()) == 3 and profiler.records == []
+
+
+def test_disabled_profiler_records_nothing():
+    with DISABLED.stage('read'):
+        DISABLED.count('predictions', 12)
+    assert DISABLED.records == []
+
+
+def test_report_of_a_run(cafa, monkeypatch, capsys):
+    monkeypatch.chdir(cafa.folder)
+    precrec_main.main(precrec_main.parse_args(
+        [cafa.submission, '-o', cafa.obo, '-b', cafa.bfolder, '--no-plot',
+         '-t', 'type1', '-m', 'partial', '-j', '2', '-profile', 'profile.json']))
+    #nothing but the results is printed
+    assert '\n1\n' not in capsys.readouterr().out
+    with open('profile.json') as handle:
+        report = json.load(handle)
+    stages = set(s['stage'] for s in report['stages'])
+    assert set(['read', 'split', 'benchmark', 'propagate', 'fmax']) <= stages
+    counters = dict(((c['counter'], c['ontology']), c['value']) for c in report['counters'])
+    assert counters[('predictions', None)] == 12
+    assert counters[('proteins', None)] == 5
+    #T96060000003 counts in countb with its obsolete term only
+    assert counters[('countb', 'bpo')] == 3
+    assert counters[('obsolete_terms', 'bpo')] == 1
+    assert counters[('benchmark_proteins', 'cco')] == 2
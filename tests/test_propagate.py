@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Sparse propagation of predicted terms against the term-by-term loop engine, obsolete terms included
+"""
+
+import pytest
+import perf_main
+from precrec.GOPred import GOPred
+from precrec.ontology import ONTOLOGIES, load_ontology
+from precrec.precRec import PrecREC, benchmark, read_benchmark
+from precrec.propagate import label_predictions, propagate_confidences, propagate_predictions
+from precrec.synthetic import make_inputs
+
+
+def assert_same_engines(bench, pred):
+    fast = PrecREC(bench, pred)
+    reference = PrecREC(bench, pred, engine='loop')
+    assert fast.countb == reference.countb
+    assert fast.obsolete == reference.obsolete
+    assert fast.counted == reference.counted
+    #same proteins and terms, in the same order, with the same confidence and truth
+    assert list(fast.predicted) == list(reference.predicted)
+    for prot in reference.predicted:
+        if reference.predicted[prot] is None:
+            assert fast.predicted[prot] is None
+        else:
+            assert list(fast.predicted[prot].items()) == list(reference.predicted[prot].items())
+    return fast
+
+
+def read(path):
+    pred = GOPred()
+    with open(path) as handle:
+        pred.read(handle)
+    return pred
+
+
+@pytest.mark.parametrize('onto', ['bpo', 'mfo', 'cco'])
+def test_engines_agree_on_the_split_submission(cafa, onto):
+    ontology = load_ontology(cafa.obo)
+    bench = benchmark(ontology, cafa.leafonly(onto))
+    bench.propagate()
+    c = assert_same_engines(bench, read(cafa.submission).split(ontology)[onto])
+    if onto == 'bpo':
+        #T96060000003 only predicts the obsolete GO:0000009: counted, but not predicted
+        assert c.obsolete == set(['GO:0000009'])
+        assert 'T96060000003' in c.counted and 'T96060000003' not in c.predicted
+
+
+def test_engines_agree_on_maxima_and_unknown_terms(cafa):
+    #a descendant read after its ancestors with a higher confidence, repeated terms,
+    #obsolete terms of both namespaces and a term missing from the ontology
+    path = cafa.add_submission('Testgroup', 2, '9606', [
+        ('T96060000001', 'GO:0000001', '0.20'), ('T96060000001', 'GO:0000003', '0.30'),
+        ('T96060000001', 'GO:0000004', '0.90'), ('T96060000001', 'GO:0000004', '0.10'),
+        ('T96060000001', 'GO:0000009', '0.50'), ('T96060000001', 'GO:0000019', '0.50'),
+        ('T96060000002', 'GO:0999999', '0.40'), ('T96060000002', 'GO:0000002', '0.60'),
+        ('T96060000006', 'GO:0000009', '0.70'), ('T96060000007', 'GO:0000004', '0.80')])
+    bench = benchmark(load_ontology(cafa.obo), cafa.leafonly('bpo'))
+    bench.propagate()
+    #unsplit, so the ontology sees every term
+    c = assert_same_engines(bench, read(path))
+    onto = bench.ontology
+    assert c.predicted['T96060000001'][onto.term_id('GO:0000001')] == [0.9, True]
+    assert c.predicted['T96060000001'][onto.term_id('GO:0008150')] == [0.9, True]
+    assert c.obsolete == set(['GO:0000009', 'GO:0000019', 'GO:0999999'])
+    assert c.counted == ['T96060000001', 'T96060000002', 'T96060000006']
+    assert c.predicted['T96060000007'] is None
+
+
+def test_one_propagation_labelled_by_several_benchmarks(cafa):
+    ontology = load_ontology(cafa.obo)
+    bpo = read(cafa.submission).split(ontology)['bpo']
+    benchmarks = [read_benchmark('bpo', 'HUMAN', TYPE, cafa.bfolder, cafa.obo) for TYPE in ('type1', 'type2', 'all')]
+    propagated = propagate_confidences(bpo, ontology)
+    for b in benchmarks:
+        predicted, obsolete, countb = label_predictions(propagated, b.true_terms)
+        expected = propagate_predictions(bpo, ontology, b.true_terms)
+        assert (obsolete, countb) == expected[1:]
+        assert list(predicted) == list(expected[0])
+        for prot in predicted:
+            assert (predicted[prot] is None) == (expected[0][prot] is None)
+            if predicted[prot] is not None:
+                assert list(predicted[prot].items()) == list(expected[0][prot].items())
+
+
+def test_engines_agree_on_synthetic_inputs(tmp_path):
+    obo_path, benchmark_paths, pred_path = make_inputs(str(tmp_path), n_proteins=200, n_terms=8, n_true=3,
+                                                       depth=5, width=30, n_obsolete=4, seed=7)
+    ontology = load_ontology(obo_path)
+    parts = read(pred_path).split(ontology)
+    obsolete_only = 0
+    for onto in ONTOLOGIES:
+        bench = benchmark(ontology, benchmark_paths[onto])
+        bench.propagate()
+        c = assert_same_engines(bench, parts[onto])
+        assert c.obsolete and all(ontology.is_obsolete(ontology.term_id(t)) for t in c.obsolete)
+        obsolete_only += len([p for p in c.counted if p not in c.predicted])
+    #some benchmark proteins only predict obsolete terms
+    assert obsolete_only > 0
+    assert perf_main.check((obo_path, benchmark_paths, pred_path), 'partial') == []
+    assert perf_main.check((obo_path, benchmark_paths, pred_path), 'full') == []
+
+
+def test_invalid_engine(cafa):
+    bench = benchmark(load_ontology(cafa.obo), cafa.leafonly('bpo'))
+    bench.propagate()
+    with pytest.raises(ValueError):
+        PrecREC(bench, read(cafa.submission), engine='dense')
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Predictions split by ontology in memory, against the _BPO/_MFO/_CCO files written from them
+"""
+
+import os
+import pickle
+import pytest
+from conftest import PREDICTIONS, TERMS
+from precrec.GOPred import GOPred
+from precrec.ontology import Ontology, load_ontology
+
+NAMESPACES = {'biological_process': 'bpo', 'molecular_function': 'mfo', 'cellular_component': 'cco'}
+
+
+def expected_parts(predictions):
+    '''
+    key: ontology, value: sorted (protein, term, confidence) of its predictions
+    '''
+    namespace = dict((t, NAMESPACES[n]) for t, n, parents, obsolete in TERMS)
+    parts = {'bpo': [], 'mfo': [], 'cco': []}
+    for protein, term, confidence in predictions:
+        if term in namespace:
+            parts[namespace[term]].append((protein, term, confidence))
+    return dict((o, sorted(parts[o])) for o in parts)
+
+
+def rows(pred):
+    return sorted((p, t, '%.2f' % c) for p in pred.data for t, c in
+                  [(d['term'], d['confidence']) for d in pred.data[p]])
+
+
+def test_split_in_memory(cafa):
+    #a term missing from the obo file is left out of every partition
+    path = cafa.add_submission('Testgroup', 2, '9606', PREDICTIONS + [('T96060000001', 'GO:0999999', '0.50')])
+    pred = GOPred()
+    with open(path) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    assert sorted(parts) == ['bpo', 'cco', 'mfo']
+    expected = expected_parts(PREDICTIONS)
+    for onto in parts:
+        assert parts[onto].ontology == onto
+        assert (parts[onto].author, parts[onto].model, parts[onto].taxon) == ('Testgroup', 2, '9606')
+        assert rows(parts[onto]) == expected[onto]
+    assert len(pred) == len(PREDICTIONS) + 1
+    #no file is written
+    assert not [f for f in os.listdir(cafa.folder) if f.endswith(('_BPO.txt', '_MFO.txt', '_CCO.txt'))]
+
+
+def test_split_from_a_loaded_ontology(cafa):
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        pred.read(handle)
+    by_path = pred.split(cafa.obo)
+    by_ontology = pred.split(load_ontology(cafa.obo))
+    for onto in by_path:
+        assert rows(by_path[onto]) == rows(by_ontology[onto])
+
+
+def test_partitions_do_not_carry_the_ontology(cafa):
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    assert isinstance(pred._codes[0], Ontology)
+    for onto in parts:
+        assert parts[onto]._codes is None
+        back = pickle.loads(pickle.dumps(parts[onto]))
+        assert rows(back) == rows(parts[onto])
+    #the streaming reader keeps its codes between blocks, its partitions do not
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        for parts in pred.read_split_blocks(cafa.obo, handle):
+            assert [p._codes for p in parts.values()] == [None] * 3
+    assert isinstance(pred._codes[0], Ontology)
+
+
+def test_written_partitions_match_memory(cafa):
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split_and_write(cafa.obo, handle)
+    for onto in parts:
+        path = os.path.join(cafa.folder, 'Testgroup_1_9606_%s.txt' % onto.upper())
+        with open(path) as handle:
+            written = sorted(tuple(l.rstrip('\n').split('\t')) for l in handle)
+        assert written == rows(parts[onto])
+        #read back without header, the partition gives the same split
+        back = GOPred()
+        with open(path) as handle:
+            back.read(handle)
+        assert rows(back.split(cafa.obo)[onto]) == written
+
+
+def test_term_in_no_namespace(cafa):
+    with open(cafa.obo, 'a') as out:
+        out.write('\n[Term]\nid: GO:0000030\nname: nowhere\nis_a: GO:0008150\n')
+    path = cafa.add_submission('Testgroup', 2, '9606', [('T96060000001', 'GO:0000030', '0.50')])
+    pred = GOPred()
+    with open(path) as handle:
+        with pytest.raises(ValueError):
+            pred.read_and_split(cafa.obo, handle)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming evaluation one block of targets at a time, against the in-memory PrecREC
+"""
+
+import pytest
+import precrec.GOPred
+from precrec.fmax import INTERVAL, threshold_grid
+from precrec.GOPred import GOPred
+from precrec.ia import information_accretion, read_annotations
+from precrec.ontology import ONTOLOGIES, load_ontology
+from precrec.precRec import PrecREC, benchmark
+from precrec.stream import stream_evaluate
+from precrec.synthetic import make_inputs
+
+
+def assert_same_scores(streamed, in_memory, mode, weighted):
+    assert streamed.exist == in_memory.exist
+    assert streamed.countb == in_memory.countb
+    assert streamed.obsolete == in_memory.obsolete
+    if not in_memory.exist:
+        return
+    expected = in_memory.weighted_output(mode) if weighted else [in_memory.Fmax_output(mode)]
+    got = streamed.weighted_output(mode) if weighted else [streamed.Fmax_output(mode)]
+    #blocks are summed in another order, so the last bits may differ
+    for e, g in zip(expected, got):
+        assert g[0] == pytest.approx(e[0], abs=1e-12, nan_ok=True)
+        assert g[1] == pytest.approx(e[1], abs=1e-12)
+        assert g[2:] == pytest.approx(e[2:], abs=1e-12)
+
+
+@pytest.fixture(params=[3, 50, 10000])
+def block_lines(request, monkeypatch):
+    monkeypatch.setattr(precrec.GOPred, 'BLOCK_LINES', request.param)
+    return request.param
+
+
+@pytest.mark.parametrize('mode', ['partial', 'full'])
+def test_synthetic_submission(tmp_path, block_lines, mode):
+    obo_path, benchmark_paths, pred_path = make_inputs(str(tmp_path), n_proteins=120, n_terms=6, n_true=3,
+                                                       depth=4, width=25, n_obsolete=3, seed=5)
+    ontology = load_ontology(obo_path)
+    benchmarks = {}
+    for onto in ONTOLOGIES:
+        benchmarks[onto] = benchmark(ontology, benchmark_paths[onto])
+        benchmarks[onto].propagate()
+    ias = dict((onto, information_accretion(ontology, read_annotations(benchmark_paths[onto], ontology)))
+               for onto in ONTOLOGIES)
+    pred = GOPred()
+    with open(pred_path) as handle:
+        parts = pred.read_and_split(ontology, handle)
+    with open(pred_path) as handle:
+        header, streamed = stream_evaluate(handle, obo_path, benchmarks, threshold_grid(INTERVAL), ias)
+    assert (header.author, header.model, header.taxon) == (pred.author, pred.model, pred.taxon)
+    for onto in ONTOLOGIES:
+        assert_same_scores(streamed[onto], PrecREC(benchmarks[onto], parts[onto], ia=ias[onto]), mode, True)
+
+
+def test_cafa_submission(cafa, block_lines):
+    ontology = load_ontology(cafa.obo)
+    benchmarks = {}
+    for onto in ONTOLOGIES:
+        benchmarks[onto] = benchmark(ontology, cafa.leafonly(onto))
+        benchmarks[onto].propagate()
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    with open(cafa.submission) as handle:
+        streamed = stream_evaluate(handle, cafa.obo, benchmarks, threshold_grid(INTERVAL))[1]
+    for onto in ONTOLOGIES:
+        for mode in ('partial', 'full'):
+            assert_same_scores(streamed[onto], PrecREC(benchmarks[onto], parts[onto]), mode, False)
+    #T96060000003 only has an obsolete BPO term, it still counts
+    assert streamed['bpo'].countb == 4
+
+
+def test_only_the_current_target_is_kept(cafa, monkeypatch):
+    monkeypatch.setattr(precrec.GOPred, 'BLOCK_LINES', 2)
+    pred = GOPred()
+    held = []
+    with open(cafa.submission) as handle:
+        for parts in pred.read_split_blocks(cafa.obo, handle):
+            held.append(len(set(pred.protein_ids)))
+            assert len(set(p for o in parts for p in parts[o].protein_ids)) >= 1
+    assert max(held) <= 1
+    assert len(pred) == 0
+    assert len(pred.proteins) == 5
+
+
+def test_targets_must_be_grouped(cafa, block_lines):
+    path = cafa.add_submission('Testgroup', 2, '9606', [('T96060000001', 'GO:0000004', '0.80'),
+                                                        ('T96060000002', 'GO:0000005', '0.90'),
+                                                        ('T96060000001', 'GO:0000012', '0.70'),
+                                                        ('T96060000004', 'GO:0000001', '0.50')])
+    benchmarks = {'bpo': benchmark(load_ontology(cafa.obo), cafa.leafonly('bpo'))}
+    benchmarks['bpo'].propagate()
+    with open(path) as handle:
+        with pytest.raises(ValueError):
+            stream_evaluate(handle, cafa.obo, benchmarks, threshold_grid(INTERVAL))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Several benchmark types scored from one propagation, against one PrecREC per type
+"""
+
+import pytest
+import precrec_main
+from precrec.annotations import CompiledLoader
+from precrec.cache import BenchmarkCache
+from precrec.fmax import INTERVAL, threshold_grid
+from precrec.GOPred import GOPred
+from precrec.ia import information_accretion, read_annotations
+from precrec.ontology import ONTOLOGIES, load_ontology
+from precrec.precRec import PrecREC, benchmark, read_benchmark
+from precrec.subsets import score_subsets
+from precrec.synthetic import make_inputs
+
+#benchmark types with a list file for HUMAN in every ontology, type2 only in BPO
+TYPES = {'bpo': ['type1', 'type2', 'all'], 'mfo': ['type1', 'all'], 'cco': ['type1', 'all']}
+
+
+def plain(predicted):
+    '''
+    predicted as plain dicts, None for proteins outside the benchmark
+    '''
+    return dict((p, None if terms is None else dict(terms)) for p, terms in predicted.items())
+
+
+def assert_same_as_precrec(score, b, GoPred, ia):
+    c = PrecREC(b, GoPred, ia=ia)
+    assert score.exist == c.exist
+    assert score.countb == c.countb
+    assert score.obsolete == c.obsolete
+    assert score.counted == c.counted
+    assert plain(score.predicted) == plain(c.predicted)
+    if not c.exist:
+        return
+    for mode in ('partial', 'full'):
+        #repr, so that the nan precision of empty thresholds compares equal
+        assert repr(score.Fmax_output(mode)) == repr(c.Fmax_output(mode))
+        assert score.counta == c.counta
+        if ia is not None:
+            fmax, weighted, smin = c.weighted_output(mode)
+            nbench = score.nbench(mode)
+            assert score.counts.weighted_fmax(nbench) == weighted
+            if mode == 'partial':
+                assert score.counts.smin(nbench) == smin
+
+
+@pytest.mark.parametrize('onto', ONTOLOGIES)
+def test_cafa_types(cafa, onto):
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    benchmarks = dict((TYPE, read_benchmark(onto, 'HUMAN', TYPE, cafa.bfolder, cafa.obo)) for TYPE in TYPES[onto])
+    scores = score_subsets(parts[onto], benchmarks, threshold_grid(INTERVAL))
+    assert sorted(scores) == sorted(TYPES[onto])
+    for TYPE in TYPES[onto]:
+        assert_same_as_precrec(scores[TYPE], benchmarks[TYPE], parts[onto], None)
+    if onto == 'bpo':
+        #T96060000003 only has an obsolete term, counted in type1 and all but not in type2
+        assert [scores[TYPE].countb for TYPE in TYPES[onto]] == [3, 1, 4]
+
+
+def test_synthetic_subsets_with_ia(tmp_path):
+    obo_path, benchmark_paths, pred_path = make_inputs(str(tmp_path), n_proteins=150, n_terms=6, n_true=3,
+                                                       depth=4, width=25, n_obsolete=3, seed=7)
+    ontology = load_ontology(obo_path)
+    pred = GOPred()
+    with open(pred_path) as handle:
+        parts = pred.read_and_split(ontology, handle)
+    for onto in ONTOLOGIES:
+        with open(benchmark_paths[onto]) as handle:
+            proteins = sorted(set(l.split('\t')[0] for l in handle))
+        #two overlapping subsets and the whole benchmark
+        subsets = {'odd': proteins[1::2], 'first': proteins[:len(proteins) * 2 // 3], 'all': None}
+        benchmarks = {}
+        for key in subsets:
+            benchmarks[key] = benchmark(ontology, benchmark_paths[onto], subsets[key])
+            benchmarks[key].propagate()
+        ia = information_accretion(ontology, read_annotations(benchmark_paths[onto], ontology))
+        scores = score_subsets(parts[onto], benchmarks, threshold_grid(INTERVAL), ia)
+        for key in subsets:
+            assert_same_as_precrec(scores[key], benchmarks[key], parts[onto], ia)
+
+
+def test_invalid_mode(cafa):
+    pred = GOPred()
+    with open(cafa.submission) as handle:
+        parts = pred.read_and_split(cafa.obo, handle)
+    scores = score_subsets(parts['bpo'], {'type1': read_benchmark('bpo', 'HUMAN', 'type1', cafa.bfolder, cafa.obo)},
+                           threshold_grid(INTERVAL))
+    with pytest.raises(ValueError):
+        scores['type1'].Fmax_output('some')
+
+
+def scored(cafa, types, modes):
+    args = precrec_main.parse_args([cafa.submission, '-o', cafa.obo, '-b', cafa.bfolder, '--no-plot',
+                                    '-t'] + types + ['-m'] + modes)
+    found = {}
+    for path, info, results in precrec_main.evaluate_all(args, BenchmarkCache(CompiledLoader(read_benchmark), 6)):
+        for res in results:
+            found[(res.ontology, res.benchmark_type, res.mode)] = (res.exist, res.precision, res.recall, res.opt,
+                                                                  res.thres, res.coverage)
+    return found
+
+
+def test_precrec_main_types_at_once(cafa, monkeypatch):
+    monkeypatch.chdir(cafa.folder)
+    together = scored(cafa, ['type1', 'type2', 'all'], ['partial', 'full'])
+    assert len(together) == 3 * 3 * 2
+    one_by_one = {}
+    for TYPE in ('type1', 'type2', 'all'):
+        for mode in ('partial', 'full'):
+            one_by_one.update(scored(cafa, [TYPE], [mode]))
+    assert together.keys() == one_by_one.keys()
+    for key in together:
+        assert repr(together[key]) == repr(one_by_one[key])
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+The parallel format check: every error at its line number, whatever the chunks and jobs
+"""
+
+import gzip
+import os
+import subprocess
+import sys
+import pytest
+from conftest import PREDICTIONS
+from precrec.GOPred import GOPred
+from precrec.validate import chunk_ranges, validate
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'validate_main.py')
+#AUTHOR, MODEL and KEYWORDS come before the first prediction
+HEADER = 3
+#(index in PREDICTIONS, broken line, error message)
+BROKEN = [(1, 'T96060000001\tGO:0000005\t1.50', "GO prediction: error in third (confidence) field. Cannot be > 1.0"),
+          (4, 'T96060000002\tGO0000005\t0.90', "GO prediction: error in second (GO ID) field"),
+          (7, 'T96060000003\tGO:0000009', "GO prediction: wrong number of fields. Should be 3"),
+          (10, 'X96060000007\tGO:0000001\t0.90', "GO prediction: error in first (Target ID) field"),
+          (11, 'T96060000007\tGO:0000023\t0.4', "GO prediction: error in third (confidence) field")]
+
+
+def lines(path):
+    with open(path) as handle:
+        return handle.read().split('\n')[:-1]
+
+
+def write_lines(path, text):
+    with open(path, 'w') as out:
+        out.write('\n'.join(text) + '\n')
+
+
+def broken_submission(cafa, repeat=1):
+    '''
+    the predictions repeated, with the lines of BROKEN in every copy
+    returns the path and the expected (line number, error message)
+    '''
+    path = os.path.join(cafa.folder, 'Testgroup_2_9606.txt')
+    text = lines(cafa.add_submission('Testgroup', 2, '9606', PREDICTIONS * repeat))
+    expected = []
+    for copy in range(repeat):
+        for index, line, errmsg in BROKEN:
+            n = HEADER + copy * len(PREDICTIONS) + index
+            text[n] = line
+            expected.append((n + 1, errmsg))
+    write_lines(path, text)
+    return path, expected
+
+
+def test_valid_file(cafa):
+    report = validate(cafa.submission)
+    assert report.valid and report.errors == [] and report.nerrors == 0
+    assert report.lines == HEADER + len(PREDICTIONS) + 1
+
+
+def test_chunks_start_on_line_boundaries(cafa):
+    path = broken_submission(cafa, 20)[0]
+    with open(path, 'rb') as handle:
+        data = handle.read()
+    for chunk_size in (1, 50, 333, len(data)):
+        ranges = chunk_ranges(path, chunk_size)
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+        assert all(end == start for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]))
+        assert all(data[start - 1:start] == b'\n' for start, _ in ranges[1:])
+
+
+@pytest.mark.parametrize('jobs', [1, 3])
+@pytest.mark.parametrize('chunk_size', [None, 1, 64, 1000])
+def test_errors_at_their_line_numbers(cafa, jobs, chunk_size):
+    path, expected = broken_submission(cafa, 20)
+    report = validate(path, jobs, chunk_size)
+    assert not report.valid
+    assert report.errors == expected
+    assert report.nerrors == len(expected)
+    assert report.lines == HEADER + 20 * len(PREDICTIONS) + 1
+
+
+@pytest.mark.parametrize('index, line, errmsg', BROKEN)
+def test_same_error_as_read(cafa, index, line, errmsg):
+    text = lines(cafa.submission)
+    text[HEADER + index] = line
+    path = os.path.join(cafa.folder, 'Testgroup_1_9606.txt')
+    write_lines(path, text)
+    assert validate(path, 2, 64).errors == [(HEADER + index + 1, errmsg)]
+    #GOPred.read() stops at the same error
+    with pytest.raises(ValueError) as error:
+        with open(path) as handle:
+            GOPred().read(handle)
+    assert str(error.value) == errmsg
+
+
+def test_record_errors(cafa):
+    text = lines(cafa.submission)
+    #an author that is not the one of the filename, an illegal keyword and no END
+    text[0] = 'AUTHOR Othergroup'
+    text[2] = 'KEYWORDS sequence alignment, tea leaves.'
+    text = text[:-1] + ['']
+    path = os.path.join(cafa.folder, 'Testgroup_1_9606.txt')
+    write_lines(path, text)
+    with open(path, 'ab') as out:
+        out.write(b'\xff\xfe\n')
+    n = len(text)
+    report = validate(path, 2, 64)
+    assert [line for line, errmsg in report.errors] == [0, 1, 3, n, n + 1]
+    assert report.errors[1][1] == "AUTHOR: author name different from teamID in filename"
+    assert report.errors[2][1] == "KEYWORDS: illegal keyword tea leaves"
+    assert report.errors[3][1] == "empty line"
+    assert report.errors[4][1] == "line is not UTF-8 text"
+    assert 'records should be' in report.errors[0][1]
+
+
+def test_gz_and_max_errors(cafa):
+    path, expected = broken_submission(cafa, 20)
+    with open(path, 'rb') as raw, gzip.open(path + '.gz', 'wb') as out:
+        out.write(raw.read())
+    assert validate(path + '.gz', 3).errors == expected
+    report = validate(path, 3, 64, max_errors=7)
+    assert report.errors == expected[:7]
+    assert report.nerrors == len(expected)
+
+
+def test_command_line(cafa):
+    path, expected = broken_submission(cafa, 2)
+    done = subprocess.run([sys.executable, SCRIPT, cafa.submission, path, '-j', '2', '-max-errors', '3'],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert done.returncode == 1, done.stderr
+    out = done.stdout.split('\n')
+    assert out[0] == '%s: OK, %s lines' % (cafa.submission, HEADER + len(PREDICTIONS) + 1)
+    assert out[1:4] == ['%s:%s: %s' % (path, line, errmsg) for line, errmsg in expected[:3]]
+    assert out[4] == '%s: %s more errors' % (path, len(expected) - 3)
+    assert out[5].startswith('%s: INVALID, %s errors' % (path, len(expected)))
+    done = subprocess.run([sys.executable, SCRIPT, cafa.submission], stdout=subprocess.PIPE, universal_newlines=True)
+    assert done.returncode == 0
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line interface of the CAFA prediction file format check
+Checks every file in parallel chunks and lists all errors with their line
+numbers, without reading the predictions into memory, see precrec.validate
+"""
+
+import argparse
+import os
+import sys
+from precrec.validate import MAX_ERRORS, validate
+
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Format check of CAFA prediction files.', )
+    parser.add_argument('file', help='Prediction file to check. Filename should follow CAFA formats. Accepts more than one file.', nargs='+')
+    parser.add_argument('-j','--jobs', dest='jobs', type=int, help='Number of worker processes checking chunks of a file in parallel. Default is the number of CPUs', default=os.cpu_count() or 1)
+    parser.add_argument('-chunk', dest='chunk', type=int, help='Megabytes of a file checked by one task. Default depends on the file size and the number of jobs', default=None)
+    parser.add_argument('-max-errors', dest='max_errors', type=int, help='Errors listed per file, the others are only counted. Default is %d' % MAX_ERRORS, default=MAX_ERRORS)
+    args = parser.parse_args()
+    chunk_size = None if args.chunk is None else args.chunk << 20
+    invalid = 0
+    for path in args.file:
+        report = validate(path, args.jobs, chunk_size, args.max_errors)
+        if report.valid:
+            print('%s: OK, %s lines' % (path, report.lines))
+            continue
+        invalid += 1
+        for line, errmsg in report.errors:
+            if line:
+                print('%s:%s: %s' % (path, line, errmsg))
+            else:
+                print('%s: %s' % (path, errmsg))
+        if report.nerrors > len(report.errors):
+            print('%s: %s more errors' % (path, report.nerrors - len(report.errors)))
+        print('%s: INVALID, %s errors in %s lines' % (path, report.nerrors, report.lines))
+    sys.exit(1 if invalid else 0)